@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+
+        # A single value larger than the whole budget is never stored
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+            self._data[key] = value
+            self.bytes += size
+
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        value = self._data.pop(key)
+        if self.max_bytes is not None:
+            self.bytes -= self.sizeof(value)
+
+    def invalidate(self, predicate=None):
+
+        with self._lock:
+            if predicate is None:
+                removed = len(self._data)
+                self._data.clear()
+                self.bytes = 0
+                return removed
+
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                self._remove(k)
+            return len(stale)
+
+    def rekey(self, rename):
+
+        # rename(key) -> new key, or None to drop the entry; recency order
+        # is kept
+        with self._lock:
+            entries = list(self._data.items())
+            self._data.clear()
+            self.bytes = 0
+            removed = 0
+
+            for key, value in entries:
+                key = rename(key)
+                if key is None or key in self._data:
+                    removed += 1
+                    continue
+                self._data[key] = value
+                if self.max_bytes is not None:
+                    self.bytes += self.sizeof(value)
+
+            return removed
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def stats(self):
+
+        lookups = self.hits + self.misses
+
+        stats = {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+        if self.max_bytes is not None:
+            stats["bytes"] = self.bytes
+            stats["max_bytes"] = self.max_bytes
+
+        return stats
@@ -3,5 +3,115 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# Source dataset (CSV or Parquet) and its columnar memory-mapped cache
+DATASET_PATH = os.getenv("DATASET_PATH", os.path.join(BASE_DIR, "data", "titanic.csv"))
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(BASE_DIR, "cache", "columns"))
+
+# Deterministic engine: "memory" (indexes built in RAM), "chunked" (streams
+# the columnar cache in CHUNK_ROWS slices across CHUNK_WORKERS processes) or
+# "auto" (chunked from OUT_OF_CORE_ROWS rows). Charts over frames larger
+# than CHUNK_ROWS are aggregated chunk by chunk as well
+DATASET_ENGINE = os.getenv("DATASET_ENGINE", "auto")
+OUT_OF_CORE_ROWS = int(os.getenv("OUT_OF_CORE_ROWS", "5000000"))
+CHUNK_ROWS = int(os.getenv("CHUNK_ROWS", "1000000"))
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "2"))
+
+# Hot reload: poll the source file every DATASET_WATCH_SECONDS (0 = only on
+# POST /admin/reload), and keep the replaced version's chart pool and
+# sandbox for DATASET_RELOAD_DRAIN_SECONDS so in-flight requests finish.
+# Admin endpoints require ADMIN_TOKEN as X-Admin-Token and are closed
+# while it is unset
+DATASET_WATCH_SECONDS = float(os.getenv("DATASET_WATCH_SECONDS", "0"))
+DATASET_RELOAD_DRAIN_SECONDS = float(os.getenv("DATASET_RELOAD_DRAIN_SECONDS", "120"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Logging: records are queued to a background writer thread (a full queue
+# drops records rather than blocking), and LOG_SAMPLE_RATE keeps that share
+# of the per-request INFO events
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+# Import matplotlib / LangChain and build the agent in the background
+# right after start-up (otherwise on the first request that needs them)
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() in ("1", "true", "yes")
+
+# Per-stage tracing spans (logged with each request), optional
+# Server-Timing response header, and mirroring into OpenTelemetry when the
+# opentelemetry API is installed
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "false").lower() in ("1", "true", "yes")
+TRACING_OTEL = os.getenv("TRACING_OTEL", "false").lower() in ("1", "true", "yes")
+
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-MODEL_NAME = os.getenv("MODEL_NAME", "llama-3.1-8b-instant")
\ No newline at end of file
+MODEL_NAME = os.getenv("MODEL_NAME", "llama-3.1-8b-instant")
+# "single_shot": a dataset profile is written into the prompt and the agent
+# gets LLM_SINGLE_SHOT_ITERATIONS steps, falling back to the full agent when
+# that is not enough; "agent": always the full exploratory agent
+LLM_MODE = os.getenv("LLM_MODE", "single_shot")
+LLM_SINGLE_SHOT_ITERATIONS = int(os.getenv("LLM_SINGLE_SHOT_ITERATIONS", "2"))
+
+# Agent-written pandas code runs in CODE_SANDBOX_WORKERS worker processes
+# ("process"), each call limited in CPU seconds, wall-clock seconds and
+# address space; "inline" runs it in the API process
+CODE_SANDBOX = os.getenv("CODE_SANDBOX", "process")
+CODE_SANDBOX_WORKERS = int(os.getenv("CODE_SANDBOX_WORKERS", "2"))
+CODE_SANDBOX_CPU_SECONDS = float(os.getenv("CODE_SANDBOX_CPU_SECONDS", "10"))
+CODE_SANDBOX_TIMEOUT_SECONDS = float(os.getenv("CODE_SANDBOX_TIMEOUT_SECONDS", "15"))
+CODE_SANDBOX_MEMORY_MB = int(os.getenv("CODE_SANDBOX_MEMORY_MB", "1024"))
+
+# Bounded LRU cache of deterministic answers keyed by parsed intent
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "1024"))
+
+# Chart rendering pool ("process" or "thread")
+CHART_EXECUTOR = os.getenv("CHART_EXECUTOR", "process")
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_QUEUE_SIZE = int(os.getenv("CHART_QUEUE_SIZE", "16"))
+CHART_TIMEOUT_SECONDS = float(os.getenv("CHART_TIMEOUT_SECONDS", "10"))
+
+# Content-addressed cache of rendered charts
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "256"))
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Chart specs and images shared by all worker processes (":memory:" keeps
+# them per process)
+CHART_STORE_PATH = os.getenv("CHART_STORE_PATH", os.path.join(BASE_DIR, "cache", "charts.sqlite3"))
+CHART_STORE_MAX_ENTRIES = int(os.getenv("CHART_STORE_MAX_ENTRIES", "4096"))
+CHART_STORE_MAX_BYTES = int(os.getenv("CHART_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Persistent LLM answer cache (":memory:" disables persistence).
+# LLM_CACHE_SIMILARITY > 0 (e.g. 0.8) also matches paraphrases; off by
+# default, as a near-identical question can still ask the opposite
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DIR, "cache", "answers.sqlite3"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0.0"))
+
+# Learned query plans: pandas expressions from agent answers, replayed for
+# later questions with the same template (":memory:" keeps them per process).
+# They need the process sandbox, so CODE_SANDBOX=inline turns them off
+LLM_PLANS_ENABLED = os.getenv("LLM_PLANS_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_PLAN_PATH = os.getenv("LLM_PLAN_PATH", os.path.join(BASE_DIR, "cache", "plans.sqlite3"))
+LLM_PLAN_MAX_ENTRIES = int(os.getenv("LLM_PLAN_MAX_ENTRIES", "2000"))
+
+# LLM admission control: concurrent agent runs, bounded wait queue,
+# max queue wait and end-to-end deadline per request
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
+
+# LLM token budgets (0 = unlimited): a per-minute sliding window and a
+# per-day (UTC) total. At or below LLM_BUDGET_LOW_WATERMARK of either
+# budget, agent runs switch to LLM_FALLBACK_MODEL ("fallback") or to cached
+# answers only ("cache_only"); a spent budget always means cache-only
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_DAY = int(os.getenv("LLM_TOKENS_PER_DAY", "0"))
+LLM_BUDGET_LOW_WATERMARK = float(os.getenv("LLM_BUDGET_LOW_WATERMARK", "0.2"))
+LLM_BUDGET_LOW_MODE = os.getenv("LLM_BUDGET_LOW_MODE", "fallback")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+
+# POST /chat/batch limits
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
@@ -0,0 +1,427 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from backend.core.exceptions import AppException
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+# Schema
+# ----------------------------------------------------------
+
+# Compact dtypes for the known Titanic columns; anything else is inferred
+COLUMN_KINDS = {
+    "PassengerId": ("numeric", "int32"),
+    "Survived": ("numeric", "int8"),
+    "Pclass": ("numeric", "int8"),
+    "Age": ("numeric", "float32"),
+    "SibSp": ("numeric", "int8"),
+    "Parch": ("numeric", "int8"),
+    "Fare": ("numeric", "float32"),
+    "Sex": ("categorical", None),
+    "Embarked": ("categorical", None),
+    "Name": ("text", None),
+    "Ticket": ("text", None),
+    "Cabin": ("text", None),
+}
+
+MANIFEST = "manifest.json"
+
+# Rows read from the source per step when building the cache: memory use
+# is bounded by the chunk, not by the file
+BUILD_CHUNK_ROWS = 500_000
+
+# Non-numeric columns with more distinct values are stored as text
+MAX_CATEGORIES = 255
+
+
+def dataset_version(frames):
+
+    # Content hash of the frame: identical data gives an identical version,
+    # so cache entries tagged with it stay valid across restarts. Accepts a
+    # frame or an iterable of consecutive row slices of one; row hashes
+    # don't depend on the slicing, so both give the same version.
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+
+    digest = hashlib.sha256()
+
+    for i, df in enumerate(frames):
+        if i == 0:
+            digest.update(",".join(map(str, df.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+
+    return digest.hexdigest()[:16]
+
+
+def widen_float32(values):
+
+    # float32 values widened through their shortest decimal repr, so they
+    # print as 512.3292 rather than 512.3292236328125
+    values = np.asarray(values)
+
+    if values.dtype != np.float32:
+        return values
+
+    # Large columns repeat values; converting each distinct one through
+    # its repr once is much cheaper than converting every row
+    if values.ndim == 1 and len(values) > 4096:
+        distinct, inverse = np.unique(values, return_inverse=True)
+        return distinct.astype(str).astype(np.float64)[inverse]
+
+    return values.astype(str).astype(np.float64)
+
+
+class _ColumnScan:
+
+    # First build pass over one column: what kind and dtype it needs, its
+    # categories or text width. Unknown columns are inferred from all
+    # chunks together: integers (downcast by range), other numbers
+    # (float32), categoricals (few distinct values) or text.
+
+    def __init__(self, name):
+        self.name = name
+        self.known = COLUMN_KINDS.get(name)
+        self.missing = False
+        self.integer = True
+        self.numeric = True
+        self.low = None
+        self.high = None
+        self.values = set()
+        self.width = 1
+
+    def update(self, series):
+
+        self.missing |= bool(series.isna().any())
+        kind = self.known[0] if self.known else None
+
+        if kind in (None, "numeric"):
+            self.integer &= pd.api.types.is_integer_dtype(series)
+            self.numeric &= pd.api.types.is_numeric_dtype(series)
+
+            if self.numeric and series.notna().any():
+                low, high = series.min(), series.max()
+                self.low = low if self.low is None else min(self.low, low)
+                self.high = high if self.high is None else max(self.high, high)
+
+        if kind in (None, "categorical") and len(self.values) <= MAX_CATEGORIES:
+            self.values.update(series.dropna().unique())
+
+        if kind in (None, "text"):
+            lengths = series.fillna("").astype(str).str.len()
+            if len(lengths):
+                self.width = max(self.width, int(lengths.max()))
+
+    def entry(self):
+
+        if self.known:
+            kind, dtype = self.known
+        elif self.integer:
+            kind, dtype = "numeric", str(pd.to_numeric(pd.Series([self.low or 0, self.high or 0]), downcast="integer").dtype)
+        elif self.numeric:
+            kind, dtype = "numeric", "float32"
+        elif len(self.values) <= MAX_CATEGORIES:
+            kind, dtype = "categorical", None
+        else:
+            kind, dtype = "text", None
+
+        entry = {"name": self.name, "kind": kind}
+
+        if kind == "numeric":
+            # Integer columns with gaps fall back to float32 (NaN)
+            if dtype.startswith("int") and self.missing:
+                dtype = "float32"
+            entry["dtype"] = dtype
+
+        elif kind == "categorical":
+            # Same order pd.Categorical gives the whole column
+            categories = pd.Categorical(pd.Series(list(self.values))).categories
+            entry["categories"] = [c.item() if hasattr(c, "item") else c for c in categories]
+
+        else:
+            entry["width"] = self.width
+
+        return entry
+
+
+def source_fingerprint(path):
+
+    # Cheap identity of the source file: no need to read it at start-up
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+
+def _read_chunks(path, chunk_rows=BUILD_CHUNK_ROWS):
+
+    # Consecutive row slices of the source, indexed by row position
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise AppException("Reading a Parquet dataset requires pyarrow (pip install pyarrow).", 500)
+
+        start = 0
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            yield chunk
+
+        return
+
+    yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+# ----------------------------------------------------------
+# Build Step
+# ----------------------------------------------------------
+
+def _open_column(scratch, name, dtype, rows):
+    return np.lib.format.open_memmap(os.path.join(scratch, f"{name}.npy"), mode="w+", dtype=dtype, shape=(rows,))
+
+
+def build_columnar_cache(source_path, cache_root, chunk_rows=BUILD_CHUNK_ROWS):
+
+    fingerprint = source_fingerprint(source_path)
+    target = os.path.join(cache_root, fingerprint)
+
+    if os.path.exists(os.path.join(target, MANIFEST)):
+        return target
+
+    os.makedirs(cache_root, exist_ok=True)
+
+    # ---------- Pass 1: Schema ----------
+    # Two streaming passes over the source, so files larger than memory
+    # can be converted: the first settles every column's dtype,
+    # categories and text width, the second writes the arrays in place
+    scans = None
+    rows = 0
+
+    for chunk in _read_chunks(source_path, chunk_rows):
+        if scans is None:
+            scans = [_ColumnScan(col) for col in chunk.columns]
+        for scan in scans:
+            scan.update(chunk[scan.name])
+        rows += len(chunk)
+
+    columns = [scan.entry() for scan in scans or []]
+
+    # Written to a scratch directory and renamed into place, so concurrent
+    # workers never observe a half-built cache
+    scratch = tempfile.mkdtemp(prefix=".build-", dir=cache_root)
+
+    # ---------- Pass 2: Arrays ----------
+    arrays = {}
+
+    for entry in columns:
+        name = entry["name"]
+
+        if entry["kind"] == "numeric":
+            arrays[name] = _open_column(scratch, name, entry["dtype"], rows)
+        elif entry["kind"] == "categorical":
+            arrays[name] = _open_column(scratch, name, np.int16 if len(entry["categories"]) > 127 else np.int8, rows)
+        else:
+            arrays[name] = _open_column(scratch, name, f"<U{entry.pop('width')}", rows)
+            arrays[f"{name}.missing"] = _open_column(scratch, f"{name}.missing", bool, rows)
+
+    # Per-column content hashes, so a reload can tell which columns changed
+    digests = {entry["name"]: hashlib.sha256() for entry in columns}
+    start = 0
+
+    for chunk in _read_chunks(source_path, chunk_rows):
+        stop = start + len(chunk)
+
+        for entry in columns:
+            name, series = entry["name"], chunk[entry["name"]]
+
+            if entry["kind"] == "numeric":
+                arrays[name][start:stop] = series.to_numpy(dtype=entry["dtype"])
+            elif entry["kind"] == "categorical":
+                arrays[name][start:stop] = pd.Categorical(series, categories=entry["categories"]).codes
+            else:
+                arrays[name][start:stop] = series.fillna("").astype(str).to_numpy()
+                arrays[f"{name}.missing"][start:stop] = series.isna().to_numpy()
+                digests[name].update(arrays[f"{name}.missing"][start:stop].tobytes())
+
+            digests[name].update(arrays[name][start:stop].tobytes())
+
+        start = stop
+
+    for entry in columns:
+        entry["hash"] = digests[entry["name"]].hexdigest()[:16]
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    loader = _Loader(scratch, {"columns": columns})
+
+    manifest = {
+        "source": os.path.abspath(source_path),
+        "fingerprint": fingerprint,
+        "rows": rows,
+        "version": dataset_version(
+            loader.frame(with_text=True, rows=slice(i, i + chunk_rows))
+            for i in range(0, max(rows, 1), chunk_rows)
+        ),
+        "columns": columns,
+    }
+
+    with open(os.path.join(scratch, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    try:
+        os.rename(scratch, target)
+    except OSError:
+        # Another process finished first; its cache is equivalent
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    logger.info(f"columnar_cache_built: {target}")
+
+    return target
+
+
+def changed_columns(old, new):
+
+    # Columns whose stored data differs between two manifests (dtype,
+    # categories or content hash), including added and removed ones. Every
+    # column counts as changed when the row count differs or a manifest
+    # predates column hashes.
+    before = {entry["name"]: entry for entry in old["columns"]}
+    after = {entry["name"]: entry for entry in new["columns"]}
+
+    if old["rows"] != new["rows"]:
+        return set(before) | set(after)
+
+    return {
+        name for name in set(before) | set(after)
+        if before.get(name) != after.get(name) or "hash" not in after[name]
+    }
+
+
+# ----------------------------------------------------------
+# Loading
+# ----------------------------------------------------------
+
+class _Loader:
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+
+    def _array(self, name):
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+
+    def column(self, entry, rows=None):
+
+        name = entry["name"]
+
+        def array(key):
+            values = self._array(key)
+            return values if rows is None else values[rows]
+
+        if entry["kind"] == "numeric":
+            return array(name)
+
+        if entry["kind"] == "categorical":
+            return pd.Categorical.from_codes(array(name), entry["categories"])
+
+        values = pd.Series(array(name), dtype=object)
+        values[array(f"{name}.missing")] = np.nan
+        return values.to_numpy()
+
+    def frame(self, with_text=False, rows=None):
+
+        # rows: optional slice of row positions; the index keeps them
+        data = {
+            entry["name"]: self.column(entry, rows)
+            for entry in self.manifest["columns"]
+            if with_text or entry["kind"] != "text"
+        }
+
+        index = None
+        if rows is not None:
+            total = len(self._array(self.manifest["columns"][0]["name"])) if self.manifest["columns"] else 0
+            index = pd.RangeIndex(*rows.indices(total))
+
+        # copy=False keeps numeric columns backed by the memory maps
+        return pd.DataFrame(data, index=index, copy=False)
+
+
+class Dataset:
+
+    def __init__(self, directory):
+
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+
+        self.directory = directory
+        self.version = self.manifest["version"]
+        self.rows = self.manifest["rows"]
+
+        self._loader = _Loader(directory, self.manifest)
+        self._full = None
+
+        # Numeric and categorical columns only; text loads on demand
+        self.frame = self._loader.frame(with_text=False)
+
+    def array(self, name):
+        # Raw memory-mapped column: values, or codes for categoricals
+        return self._loader._array(name)
+
+    @property
+    def text_columns(self):
+        return [c["name"] for c in self.manifest["columns"] if c["kind"] == "text"]
+
+    def full_frame(self):
+
+        # Name / Ticket / Cabin are only needed by the LLM agent, which
+        # also sees float32 columns widened back to their decimal values
+        if self._full is None:
+            extra = {}
+
+            for entry in self.manifest["columns"]:
+                if entry["kind"] == "text":
+                    extra[entry["name"]] = self._loader.column(entry)
+                elif entry.get("dtype") == "float32":
+                    extra[entry["name"]] = widen_float32(self.frame[entry["name"]])
+
+            order = [c["name"] for c in self.manifest["columns"]]
+            self._full = self.frame.assign(**extra)[order]
+
+        return self._full
+
+
+def load_dataset(source_path, cache_root):
+    return Dataset(build_columnar_cache(source_path, cache_root))
+
+
+# ----------------------------------------------------------
+# CLI: python -m backend.core.dataset build [source] [cache_root]
+# ----------------------------------------------------------
+
+if __name__ == "__main__":
+
+    from backend.core.config import DATASET_PATH, DATASET_CACHE_DIR
+
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("usage: python -m backend.core.dataset build [source] [cache_root]")
+        sys.exit(2)
+
+    source = sys.argv[2] if len(sys.argv) > 2 else DATASET_PATH
+    cache_root = sys.argv[3] if len(sys.argv) > 3 else DATASET_CACHE_DIR
+
+    dataset = load_dataset(source, cache_root)
+    print(f"{dataset.directory}: {dataset.rows} rows, version {dataset.version}")
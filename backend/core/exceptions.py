@@ -1,4 +1,5 @@
 class AppException(Exception):
-    def __init__(self, message: str, status_code: int = 400):
+    def __init__(self, message: str, status_code: int = 400, headers: dict = None):
         self.message = message
-        self.status_code = status_code 
\ No newline at end of file
+        self.status_code = status_code
+        self.headers = headers
@@ -13,6 +13,7 @@ def app_exception_handler(request: Request, exc: AppException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": exc.message},
+        headers=exc.headers,
     )
 
 
@@ -1,59 +1,171 @@
+import atexit
 import logging
 import json
 import os
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from backend.core.config import LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ---------- Structured Fields ----------
+STRUCTURED_FIELDS = {
+    "request_id": "request_id",
+    "query": "query",
+    "latency": "latency_seconds",
+    "visualization": "visualization",
+    "model": "model",
+    "tokens_input": "tokens_input",
+    "tokens_output": "tokens_output",
+    "iterations": "llm_iterations",
+    "hallucination_detected": "hallucination_detected",
+    "trace_id": "trace_id",
+    "spans": "spans",
+}
+
+
+if orjson is not None:
+    def _dumps(obj):
+        return orjson.dumps(obj, default=str).decode("utf-8")
+else:
+    _encoder = json.JSONEncoder(separators=(",", ":"), default=str)
+    _dumps = _encoder.encode
 
 
 class JSONFormatter(logging.Formatter):
 
+    # Runs on the listener thread, never on the request path. The timestamp
+    # comes from record.created (set when the event happened) and the
+    # second-resolution prefix is reused across records.
+
+    _second = None
+    _prefix = ""
+
+    def _timestamp(self, created):
+
+        second = int(created)
+
+        if second != self._second:
+            self._second = second
+            self._prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+
+        return f"{self._prefix}.{int((created - second) * 1e6):06d}Z"
+
     def format(self, record):
 
         log_record = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
 
-        # ---------- Structured Fields ----------
-        structured_fields = [
-            "request_id",
-            "query",
-            "latency",
-            "visualization",
-            "tokens_input",
-            "tokens_output",
-            "hallucination_detected",
-        ]
-
-        for field in structured_fields:
-            if hasattr(record, field):
-                key = (
-                    "latency_seconds"
-                    if field == "latency"
-                    else field
-                )
-                log_record[key] = getattr(record, field)
+        for field, key in STRUCTURED_FIELDS.items():
+            if field in record.__dict__:
+                log_record[key] = record.__dict__[field]
 
         # ---------- Exception ----------
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_record["exception"] = record.exc_text
+
+        return _dumps(log_record)
+
+
+# ----------------------------------------------------------
+# Request-path Side
+# ----------------------------------------------------------
+
+class SamplingFilter(logging.Filter):
+
+    # Keeps LOG_SAMPLE_RATE of the per-request INFO events (records carrying
+    # a query). Warnings, errors and the per-request summary record (the
+    # one with a latency) are always kept.
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
 
-        return json.dumps(log_record)
+    def filter(self, record):
+
+        if self.rate >= 1.0 or record.levelno > logging.INFO:
+            return True
+
+        fields = record.__dict__
+
+        if "query" not in fields or "latency" in fields:
+            return True
+
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+
+    # Hands records to the listener thread: a full queue drops the record
+    # (and counts it) instead of blocking the event loop
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+
+        # Resolve the message and traceback now (args and exc_info may not
+        # survive the thread hop), without the copy/format of the default
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+
+    # At shutdown, wait for room for the stop sentinel instead of failing
+    # on a full queue, so every record already queued is still written
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+_listener = None
+_queue_handler = None
 
 
 def setup_logging():
 
     import sys
 
+    global _listener, _queue_handler
+
     BASE_DIR = os.path.dirname(os.path.dirname(__file__))
     log_dir = os.path.join(BASE_DIR, "logs")
     os.makedirs(log_dir, exist_ok=True)
 
     log_file = os.path.join(log_dir, "app.log")
 
-    print("LOG FILE PATH:", log_file)
+    # Neither format uses the thread or process, so skip collecting them
+    # for every record (public logging module switches)
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
 
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
@@ -61,6 +173,8 @@ def setup_logging():
     if root_logger.hasHandlers():
         root_logger.handlers.clear()
 
+    shutdown_logging()
+
     formatter = JSONFormatter()
 
     console_handler = logging.StreamHandler(sys.stdout)
@@ -79,5 +193,45 @@ def setup_logging():
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(formatter)
 
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
\ No newline at end of file
+    # Formatting and I/O happen on the listener thread; the request path
+    # only filters and enqueues
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+    _listener = DrainingQueueListener(
+        log_queue,
+        console_handler,
+        file_handler,
+        respect_handler_level=True,
+    )
+    _listener.start()
+
+    root_logger.addHandler(_queue_handler)
+
+
+def shutdown_logging():
+
+    # Flushes whatever is still queued
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats():
+
+    if _queue_handler is None:
+        return {}
+
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "max_queue": _queue_handler.queue.maxsize,
+        "dropped": _queue_handler.dropped,
+        "sample_rate": LOG_SAMPLE_RATE,
+    }
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,155 @@
+import contextvars
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+
+from backend.core.config import TRACING_ENABLED, TRACING_OTEL
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+# Optional OpenTelemetry bridge
+# ----------------------------------------------------------
+
+# Spans are always collected in-process (no collector needed). When the
+# opentelemetry API is installed and TRACING_OTEL is set, every span is
+# also opened on the global tracer, so an SDK exporter can ship them.
+_otel_tracer = None
+
+if TRACING_OTEL:
+    try:
+        from opentelemetry import trace as _otel_trace
+        _otel_tracer = _otel_trace.get_tracer("titanic-ai")
+    except ImportError:
+        logger.warning("tracing_otel_unavailable: opentelemetry-api is not installed")
+
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name, parent_id, attributes):
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end = None
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+
+class Trace:
+
+    # W3C trace-context ids, so a trace can continue an incoming
+    # `traceparent` header and be matched with an OpenTelemetry backend
+
+    def __init__(self, name, traceparent=None):
+
+        match = _TRACEPARENT.match(traceparent or "")
+
+        self.name = name
+        self.trace_id = match.group(1) if match else os.urandom(16).hex()
+        self.parent_id = match.group(2) if match else None
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def summary(self):
+        return [
+            {"name": s.name, "ms": round(s.duration_ms, 3), **s.attributes}
+            for s in self.spans
+        ]
+
+    def server_timing(self):
+
+        # Repeated stages (e.g. agent tool calls) are summed per name
+        totals = {}
+        for s in self.spans:
+            totals[s.name] = totals.get(s.name, 0.0) + s.duration_ms
+
+        totals["total"] = (time.perf_counter() - self.start) * 1000
+
+        return ", ".join(f"{name};dur={ms:.3f}" for name, ms in totals.items())
+
+
+def start_trace(name, traceparent=None):
+
+    if not TRACING_ENABLED:
+        return None
+
+    trace = Trace(name, traceparent)
+    _current_trace.set(trace)
+    _current_span.set(trace.parent_id)
+
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def record_span(name, start, end, **attributes):
+
+    # For stages timed by callbacks rather than a with-block (e.g. the
+    # agent's model calls and tool iterations)
+    trace = _current_trace.get()
+
+    if trace is None:
+        return None
+
+    s = Span(name, _current_span.get(), attributes)
+    s.start, s.end = start, end
+    trace.spans.append(s)
+
+    return s
+
+
+@contextmanager
+def span(name, **attributes):
+
+    # Cheap no-op outside a trace
+    trace = _current_trace.get()
+
+    if trace is None:
+        yield None
+        return
+
+    s = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(s.span_id)
+
+    otel = _otel_tracer.start_as_current_span(name, attributes=attributes) if _otel_tracer else None
+    if otel is not None:
+        otel.__enter__()
+
+    try:
+        yield s
+
+    except BaseException as exc:
+        s.attributes["error"] = type(exc).__name__
+        raise
+
+    finally:
+        s.end = time.perf_counter()
+        trace.spans.append(s)
+
+        if otel is not None:
+            otel.__exit__(None, None, None)
+
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an async generator
+            # finalized elsewhere)
+            _current_span.set(s.parent_id)
@@ -1,8 +1,23 @@
-from fastapi import FastAPI
-from backend.core.logging_config import setup_logging
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from backend.core.logging_config import setup_logging, shutdown_logging, logging_stats
+from backend.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
 from backend.services.agent_service import TitanicAgentService
-from backend.schemas.chat import ChatRequest, ChatResponse
+from backend.schemas.chat import (
+    ChatRequest,
+    ChatResponse,
+    BatchRequest,
+    BatchItem,
+    BatchResponse,
+)
 from backend.core.exceptions import AppException
+from backend.core.config import (
+    WARMUP_ON_START,
+    SERVER_TIMING_HEADER,
+    DATASET_WATCH_SECONDS,
+    ADMIN_TOKEN,
+)
+from backend.core.tracing import start_trace, span
 from backend.core.exceptions_handler import (
     app_exception_handler,
     validation_exception_handler,
@@ -10,6 +25,11 @@ from backend.core.exceptions_handler import (
 )
 
 from fastapi.exceptions import RequestValidationError
+from contextlib import asynccontextmanager
+import asyncio
+import base64
+import hmac
+import json
 import logging
 import uuid
 import time
@@ -19,11 +39,38 @@ import time
 setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Titanic AI Backend", version="1.0")
-
 agent_service = TitanicAgentService()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+
+    # The app serves (deterministic answers included) while the chart
+    # pool and the LLM agent warm up in the background
+    warmup = None
+    if WARMUP_ON_START:
+        warmup = asyncio.create_task(asyncio.to_thread(agent_service.warmup))
+
+    # Reloads the dataset in place when its source file changes
+    watcher = None
+    if DATASET_WATCH_SECONDS > 0:
+        watcher = asyncio.create_task(agent_service.watch_dataset(DATASET_WATCH_SECONDS))
+
+    yield
+
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+
+    if watcher is not None:
+        watcher.cancel()
+
+    agent_service.shutdown()
+    shutdown_logging()
+
+
+app = FastAPI(title="Titanic AI Backend", version="1.0", lifespan=lifespan)
+
+
 # ------------------------
 # Register Exception Handlers
 # ------------------------
@@ -38,10 +85,11 @@ app.add_exception_handler(RequestValidationError, validation_exception_handler)
 # ------------------------
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request, response: Response):
 
     request_id = str(uuid.uuid4())[:8]
     start_time = time.time()
+    trace = start_trace("chat", http_request.headers.get("traceparent"))
 
     logger.info(
         "chat_received",
@@ -51,10 +99,19 @@ async def chat(request: ChatRequest):
         },
     )
 
-    result = await agent_service.run(request.question)
+    result = await agent_service.run(request.question, request.chart_format)
+
+    chart = result["chart"]
+
+    # Charts are served by reference; inline base64 is opt-in
+    inline = None
+    if chart is not None and request.inline_chart:
+        image, _ = await agent_service.get_chart(chart["id"])
+        with span("base64"):
+            inline = base64.b64encode(image).decode("utf-8") if image else None
 
     latency = round(time.time() - start_time, 3)
-    is_visual = result["chart"] is not None
+    is_visual = chart is not None
 
     logger.info(
         "chat_success",
@@ -63,17 +120,173 @@ async def chat(request: ChatRequest):
             "query": request.question,
             "latency": latency,
             "visualization": is_visual,
+            "model": result.get("model"),
             "tokens_input": result.get("tokens_input", 0),
             "tokens_output": result.get("tokens_output", 0),
+            "iterations": result.get("iterations", 0),
             "hallucination_detected": result.get("hallucination_detected", False),
+            **trace_fields(trace),
         },
     )
 
+    if trace is not None and SERVER_TIMING_HEADER:
+        response.headers["Server-Timing"] = trace.server_timing()
+
+    if chart is None:
+        return ChatResponse(answer=result["answer"], layer=result["layer"])
+
     return ChatResponse(
         answer=result["answer"],
-        chart=result["chart"],
+        layer=result["layer"],
+        chart=inline,
+        **chart_reference(chart),
+    )
+
+
+def trace_fields(trace):
+    if trace is None:
+        return {}
+    return {"trace_id": trace.trace_id, "spans": trace.summary()}
+
+
+def chart_reference(chart):
+    return {
+        "chart_id": chart["id"],
+        "chart_url": f"/charts/{chart['id']}",
+        "chart_format": chart["format"],
+    }
+
+
+# ------------------------
+# Batch Chat Endpoint
+# ------------------------
+
+@app.post("/chat/batch", response_model=BatchResponse)
+async def chat_batch(request: BatchRequest):
+
+    request_id = str(uuid.uuid4())[:8]
+    start_time = time.perf_counter()
+
+    logger.info(
+        "chat_batch_received",
+        extra={
+            "request_id": request_id,
+            "query": f"{len(request.questions)} questions",
+        },
+    )
+
+    results = await agent_service.run_batch(request.questions, request.chart_format)
+
+    # Rounded once: a batch answered from the cube takes well under 1 ms
+    elapsed = time.perf_counter() - start_time
+    latency = round(elapsed, 3)
+
+    logger.info(
+        "chat_batch_success",
+        extra={
+            "request_id": request_id,
+            "latency": latency,
+        },
+    )
+
+    return BatchResponse(
+        results=[
+            BatchItem(
+                **{k: v for k, v in item.items() if k != "chart"},
+                **(chart_reference(item["chart"]) if item["chart"] else {}),
+            )
+            for item in results
+        ],
+        elapsed_ms=round(elapsed * 1000, 3),
+    )
+
+
+# ------------------------
+# Streaming Chat Endpoint (Server-Sent Events)
+# ------------------------
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+
+    request_id = str(uuid.uuid4())[:8]
+    start_time = time.time()
+    traceparent = http_request.headers.get("traceparent")
+
+    logger.info(
+        "chat_stream_received",
+        extra={
+            "request_id": request_id,
+            "query": request.question,
+        },
     )
 
+    async def events():
+
+        # Started inside the generator: the response streams on its own task
+        trace = start_trace("chat_stream", traceparent)
+
+        async for event in agent_service.stream(request.question, request.chart_format):
+
+            if event["event"] == "final":
+                chart = event.pop("chart")
+                usage = event
+                event = {
+                    "event": "final",
+                    "answer": event["answer"],
+                    "layer": event["layer"],
+                    **(chart_reference(chart) if chart else {}),
+                }
+
+                logger.info(
+                    "chat_stream_success",
+                    extra={
+                        "request_id": request_id,
+                        "query": request.question,
+                        "latency": round(time.time() - start_time, 3),
+                        "visualization": chart is not None,
+                        "model": usage.get("model"),
+                        "tokens_input": usage.get("tokens_input", 0),
+                        "tokens_output": usage.get("tokens_output", 0),
+                        "iterations": usage.get("iterations", 0),
+                        **trace_fields(trace),
+                    },
+                )
+
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ------------------------
+# Chart Endpoint
+# ------------------------
+
+@app.get("/charts/{chart_id}")
+async def get_chart(chart_id: str, request: Request):
+
+    # Chart IDs are content addresses, so the ID itself is a strong ETag
+    etag = f'"{chart_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=86400, immutable",
+    }
+
+    # A matching If-None-Match only gets a 304 for a chart that exists;
+    # unknown IDs fall through to the 404
+    if request.headers.get("if-none-match") == etag and await agent_service.has_chart(chart_id):
+        return Response(status_code=304, headers=headers)
+
+    image, media_type = await agent_service.get_chart(chart_id)
+
+    if image is None:
+        raise AppException("Chart not found.", 404)
+
+    return Response(content=image, media_type=media_type, headers=headers)
+
 
 # ------------------------
 # Health Endpoint
@@ -81,4 +294,56 @@ async def chat(request: ChatRequest):
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/health/live")
+def health_live():
+    # The process is up and the event loop is responsive
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    # Ready as soon as the dataset and deterministic engine are loaded;
+    # chart and LLM warmup progress is reported, not waited for
+    return {"status": "ready", "components": agent_service.readiness()}
+
+
+# ------------------------
+# Stats Endpoint
+# ------------------------
+
+@app.get("/stats")
+def stats():
+    return {**agent_service.stats(), "logging": logging_stats()}
+
+
+# ------------------------
+# Admin Endpoints
+# ------------------------
+
+@app.post("/admin/reload")
+async def admin_reload(request: Request):
+
+    # Reloads this worker process only; multi-worker deployments use
+    # DATASET_WATCH_SECONDS so that every worker picks the change up.
+    # Without an ADMIN_TOKEN the endpoint is closed
+    token = request.headers.get("x-admin-token", "")
+
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise AppException("Forbidden.", 403)
+
+    return await agent_service.reload_dataset()
+
+
+# ------------------------
+# Metrics Endpoint (Prometheus text format)
+# ------------------------
+
+@app.get("/metrics")
+def metrics():
+    return Response(
+        content=agent_service.metrics.render(agent_service.stats()),
+        media_type=METRICS_CONTENT_TYPE,
+    )
\ No newline at end of file
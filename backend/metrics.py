@@ -1,42 +1,300 @@
 import time
-from collections import deque
+from bisect import bisect_left
+
+
+# Latency buckets (seconds): deterministic answers land in the sub-millisecond
+# buckets, LLM answers in the multi-second ones
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Layers that needed the model at some point: a fresh agent run, or an
+# answer or plan learned from one. Everything else was deterministic.
+LLM_LAYERS = {"llm", "llm_cache", "llm_plan"}
+
+
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One slot per bucket plus +Inf; cumulated (and counted) only when
+        # scraped, so observing is a single bisect and two increments
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+
+    def samples(self, name, labels):
+
+        cumulative = 0
+
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{name}_bucket{_labels({**labels, 'le': le})} {cumulative}"
+
+        yield f"{name}_sum{_labels(labels)} {self.sum}"
+        yield f"{name}_count{_labels(labels)} {self.count}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+
+    if not labels:
+        return ""
+
+    body = ",".join(
+        f'{k}="{_escape(v)}"'
+        for k, v in labels.items()
+    )
+    return "{" + body + "}"
 
 
 class Metrics:
 
+    # Recording is plain attribute / dict updates with no lock: every
+    # recording call runs on the event loop thread, and the GIL keeps each
+    # update intact. Scrapes read a slightly stale but consistent-enough view.
+
     def __init__(self):
-        self.total_requests = 0
-        self.successful_requests = 0
-        self.failed_requests = 0
-        self.visualization_requests = 0
-        self.total_response_time = 0.0
-        self.last_queries = deque(maxlen=5)
-
-    def record_request(self, question: str):
-        self.total_requests += 1
-        self.last_queries.append(question)
-
-    def record_success(self, response_time: float, is_visual: bool):
-        self.successful_requests += 1
-        self.total_response_time += response_time
-        if is_visual:
-            self.visualization_requests += 1
-
-    def record_failure(self):
-        self.failed_requests += 1
-
-    def get_metrics(self):
-        avg_time = (
-            self.total_response_time / self.successful_requests
-            if self.successful_requests > 0
-            else 0
+        self.started = time.time()
+
+        # (endpoint, layer, status) -> latency histogram; request counters
+        # and per-layer histograms are derived from these when scraped
+        self.series = {}
+
+        self.in_flight = 0
+
+    # --------------------------------------------------
+    # Recording
+    # --------------------------------------------------
+    def observe(self, endpoint, layer, seconds, status=200):
+
+        histogram = self.series.get((endpoint, layer, status))
+
+        if histogram is None:
+            histogram = self.series[(endpoint, layer, status)] = Histogram()
+
+        histogram.observe(seconds)
+
+    def enter(self):
+        self.in_flight += 1
+
+    def exit(self):
+        self.in_flight -= 1
+
+    # --------------------------------------------------
+    # Exposition
+    # --------------------------------------------------
+    def render(self, stats=None):
+
+        lines = []
+
+        series = list(self.series.items())
+
+        latency = {}
+        for (_, layer, _), histogram in series:
+            latency.setdefault(layer, Histogram()).merge(histogram)
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        metric(
+            "titanic_requests_total", "counter",
+            "Answered questions by endpoint, routing layer and status.",
+            [
+                f"titanic_requests_total{_labels({'endpoint': e, 'layer': l, 'status': s})} {h.count}"
+                for (e, l, s), h in sorted(series, key=lambda item: str(item[0]))
+            ],
+        )
+
+        metric(
+            "titanic_request_duration_seconds", "histogram",
+            "Time to answer a question, by routing layer.",
+            [
+                sample
+                for layer, histogram in sorted(latency.items())
+                for sample in histogram.samples("titanic_request_duration_seconds", {"layer": layer})
+            ],
         )
 
-        return {
-            "total_requests": self.total_requests,
-            "successful_requests": self.successful_requests,
-            "failed_requests": self.failed_requests,
-            "visualization_requests": self.visualization_requests,
-            "average_response_time_seconds": round(avg_time, 3),
-            "last_5_queries": list(self.last_queries),
-        }
\ No newline at end of file
+        answered = [(layer, h.count) for (_, layer, status), h in series if status == 200]
+        total = sum(n for _, n in answered)
+        fallback = sum(n for layer, n in answered if layer in LLM_LAYERS)
+
+        metric(
+            "titanic_llm_fallback_ratio", "gauge",
+            "Share of answered questions that needed the LLM (fresh, cached or replayed).",
+            [f"titanic_llm_fallback_ratio {fallback / total if total else 0.0:.4f}"],
+        )
+
+        metric(
+            "titanic_in_flight_requests", "gauge",
+            "Questions currently being answered.",
+            [f"titanic_in_flight_requests {self.in_flight}"],
+        )
+
+        metric(
+            "titanic_uptime_seconds", "gauge",
+            "Seconds since the process started.",
+            [f"titanic_uptime_seconds {time.time() - self.started:.3f}"],
+        )
+
+        if stats:
+            self._render_stats(stats, metric)
+
+        return "\n".join(lines) + "\n"
+
+    def _render_stats(self, stats, metric):
+
+        # Cache, queue and pool state sampled from the service at scrape time
+        caches = {
+            "intent": stats.get("intent_cache"),
+            "chart": stats.get("chart_cache"),
+            "chart_store": stats.get("chart_store"),
+            "llm_answer": stats.get("llm_cache"),
+        }
+        caches = {name: c for name, c in caches.items() if c}
+
+        metric(
+            "titanic_cache_hit_ratio", "gauge",
+            "Hit ratio of each cache since start-up.",
+            [f"titanic_cache_hit_ratio{_labels({'cache': n})} {c['hit_rate']}" for n, c in caches.items()],
+        )
+
+        metric(
+            "titanic_cache_entries", "gauge",
+            "Entries held by each cache.",
+            [f"titanic_cache_entries{_labels({'cache': n})} {c['entries']}" for n, c in caches.items()],
+        )
+
+        scheduler = stats.get("llm_scheduler")
+        if scheduler:
+            metric(
+                "titanic_llm_queue_depth", "gauge",
+                "LLM requests waiting for an agent slot.",
+                [f"titanic_llm_queue_depth {scheduler['queue_depth']}"],
+            )
+            metric(
+                "titanic_llm_active", "gauge",
+                "Agent runs in progress.",
+                [f"titanic_llm_active {scheduler['active']}"],
+            )
+            metric(
+                "titanic_llm_rejected_total", "counter",
+                "LLM requests shed because the queue was full or their wait expired.",
+                [f"titanic_llm_rejected_total {scheduler['rejected'] + scheduler['expired']}"],
+            )
+
+        budget = stats.get("llm_budget")
+        if budget:
+            metric(
+                "titanic_llm_tokens_total", "counter",
+                "Tokens used by agent runs, by model and direction.",
+                [
+                    f"titanic_llm_tokens_total{_labels({'model': m, 'direction': d})} {n}"
+                    for m, totals in sorted(budget["tokens"].items())
+                    for d, n in sorted(totals.items())
+                ],
+            )
+            metric(
+                "titanic_llm_budget_tokens", "gauge",
+                "Tokens counted against each budget window.",
+                [
+                    f"titanic_llm_budget_tokens{_labels({'window': 'minute'})} {budget['minute_tokens']}",
+                    f"titanic_llm_budget_tokens{_labels({'window': 'day'})} {budget['day_tokens']}",
+                ],
+            )
+            metric(
+                "titanic_llm_budget_degraded_total", "counter",
+                "Agent runs switched to the fallback model or refused by the token budget.",
+                [
+                    f"titanic_llm_budget_degraded_total{_labels({'action': 'fallback'})} {budget['degraded']}",
+                    f"titanic_llm_budget_degraded_total{_labels({'action': 'refused'})} {budget['refused']}",
+                ],
+            )
+
+        engine = stats.get("llm_engine")
+        if engine:
+            metric(
+                "titanic_llm_single_shot_total", "counter",
+                "Profile-primed single-shot runs, by whether they answered or fell back to the full agent.",
+                [
+                    f"titanic_llm_single_shot_total{_labels({'outcome': 'answered'})} {engine['single_shot_answers']}",
+                    f"titanic_llm_single_shot_total{_labels({'outcome': 'fallback'})} {engine['agent_fallbacks']}",
+                ],
+            )
+
+        coalescing = stats.get("llm_coalescing")
+        if coalescing:
+            metric(
+                "titanic_llm_coalesced_total", "counter",
+                "LLM requests served by another request's in-flight agent run.",
+                [f"titanic_llm_coalesced_total {coalescing['coalesced']}"],
+            )
+
+        sandbox = stats.get("code_sandbox")
+        if sandbox:
+            metric(
+                "titanic_code_sandbox_calls_total", "counter",
+                "Agent tool calls run in the code sandbox.",
+                [f"titanic_code_sandbox_calls_total {sandbox['calls']}"],
+            )
+            metric(
+                "titanic_code_sandbox_killed_total", "counter",
+                "Sandbox workers killed, by reason.",
+                [
+                    f"titanic_code_sandbox_killed_total{_labels({'reason': r})} {sandbox[k]}"
+                    for r, k in (("timeout", "timeouts"), ("crash", "crashes"), ("cancelled", "cancelled"))
+                ],
+            )
+
+        chunked = stats.get("chunked_engine")
+        if chunked:
+            metric(
+                "titanic_chunked_passes_total", "counter",
+                "Passes of the out-of-core engine over the dataset.",
+                [f"titanic_chunked_passes_total {chunked['passes']}"],
+            )
+            metric(
+                "titanic_chunked_chunks_total", "counter",
+                "Row chunks scanned by the out-of-core engine.",
+                [f"titanic_chunked_chunks_total {chunked['chunks']}"],
+            )
+
+        dataset = stats.get("dataset")
+        if dataset:
+            metric(
+                "titanic_dataset_reloads_total", "counter",
+                "Hot reloads of the dataset, by outcome.",
+                [
+                    f"titanic_dataset_reloads_total{_labels({'outcome': 'reloaded'})} {dataset['reloads']}",
+                    f"titanic_dataset_reloads_total{_labels({'outcome': 'failed'})} {dataset['failures']}",
+                ],
+            )
+
+        pool = stats.get("chart_pool")
+        if pool:
+            metric(
+                "titanic_chart_pool_pending", "gauge",
+                "Chart renders queued or running.",
+                [f"titanic_chart_pool_pending {pool['pending']}"],
+            )
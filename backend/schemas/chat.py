@@ -1,9 +1,37 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Literal, Optional
+
+ChartFormat = Literal["png", "svg", "webp", "spec"]
 
 class ChatRequest(BaseModel):
     question: str
+    chart_format: ChartFormat = "png"
+    inline_chart: bool = False
 
 class ChatResponse(BaseModel):
     answer: str
-    chart: Optional[str] = None
\ No newline at end of file
+    chart: Optional[str] = None
+    chart_id: Optional[str] = None
+    chart_url: Optional[str] = None
+    chart_format: Optional[ChartFormat] = None
+    layer: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+    chart_format: ChartFormat = "png"
+
+class BatchItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    chart_id: Optional[str] = None
+    chart_url: Optional[str] = None
+    chart_format: Optional[ChartFormat] = None
+    layer: Optional[str] = None
+    status: int = 200
+    error: Optional[str] = None
+    elapsed_ms: float
+
+class BatchResponse(BaseModel):
+    results: List[BatchItem]
+    elapsed_ms: float
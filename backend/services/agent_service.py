@@ -1,11 +1,56 @@
-import os
-import pandas as pd
 import asyncio
 import logging
+import time
 
-from backend.services.deterministic_engine import DeterministicEngine
+from backend.services.deterministic_engine import DeterministicEngine, answer_columns
+from backend.services.chunked_engine import ChunkedEngine
 from backend.services.visualisation_engine import VisualizationEngine
 from backend.services.llm_engine import LLMEngine
+from backend.services.intent_parser import IntentParser, normalize
+from backend.services.single_flight import SingleFlight
+from backend.services.llm_scheduler import LLMScheduler, PRIORITY_NORMAL, PRIORITY_LOW
+from backend.services.answer_cache import AnswerCache
+from backend.services.query_plans import QueryPlans
+from backend.services.code_sandbox import CodeSandbox
+from backend.services.token_budget import TokenBudget, MODE_FALLBACK, MODE_CACHE_ONLY
+from backend.core.cache import LRUCache
+from backend.core.tracing import span
+from backend.metrics import Metrics
+from backend.core.dataset import load_dataset, source_fingerprint, changed_columns
+from backend.core.config import (
+    DATASET_PATH,
+    DATASET_CACHE_DIR,
+    DATASET_RELOAD_DRAIN_SECONDS,
+    DATASET_ENGINE,
+    OUT_OF_CORE_ROWS,
+    CHUNK_ROWS,
+    CHUNK_WORKERS,
+    INTENT_CACHE_SIZE,
+    MODEL_NAME,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_SIMILARITY,
+    LLM_PLANS_ENABLED,
+    LLM_PLAN_PATH,
+    LLM_PLAN_MAX_ENTRIES,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_DEADLINE_SECONDS,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_TOKENS_PER_DAY,
+    LLM_BUDGET_LOW_WATERMARK,
+    LLM_BUDGET_LOW_MODE,
+    LLM_FALLBACK_MODEL,
+    CODE_SANDBOX,
+    CODE_SANDBOX_WORKERS,
+    CODE_SANDBOX_CPU_SECONDS,
+    CODE_SANDBOX_TIMEOUT_SECONDS,
+    CODE_SANDBOX_MEMORY_MB,
+    BATCH_MAX_QUESTIONS,
+    BATCH_CONCURRENCY,
+)
 from backend.core.exceptions import AppException
 
 logger = logging.getLogger(__name__)
@@ -15,115 +60,848 @@ class TitanicAgentService:
 
     def __init__(self):
 
-        BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-        DATA_PATH = os.path.join(BASE_DIR, "data", "titanic.csv")
+        # Columnar, memory-mapped copy of the CSV (built on first start)
+        # and everything derived from it; a reload swaps these as one
+        self._install(self._dataset_components(load_dataset(DATASET_PATH, DATASET_CACHE_DIR)))
+
+        # Keyed by (dataset version, intent key); a reload re-tags the
+        # entries whose columns did not change and drops the rest
+        self.intent_cache = LRUCache(INTENT_CACHE_SIZE)
+
+        self.answer_cache = AnswerCache(
+            LLM_CACHE_PATH,
+            dataset_version=self.dataset_version,
+            model_name=MODEL_NAME,
+            ttl=LLM_CACHE_TTL_SECONDS,
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            similarity=LLM_CACHE_SIMILARITY,
+            columns=self.df.columns,
+        )
+
+        # Pandas expressions learned from agent answers, replayed locally.
+        # Plans are agent-written code and need the sandbox's limits: an
+        # inline thread can be abandoned on timeout but not stopped
+        self.plans = None
+        if LLM_PLANS_ENABLED and CODE_SANDBOX == "process":
+            self.plans = QueryPlans(
+                LLM_PLAN_PATH,
+                dataset_version=self.dataset_version,
+                max_entries=LLM_PLAN_MAX_ENTRIES,
+                columns=self.df.columns,
+            )
+
+        # Identical in-flight LLM questions share one agent run
+        self.llm_flight = SingleFlight()
+
+        self.llm_scheduler = LLMScheduler(
+            max_concurrency=LLM_MAX_CONCURRENCY,
+            max_queue=LLM_MAX_QUEUE,
+            queue_timeout=LLM_QUEUE_TIMEOUT_SECONDS,
+            deadline=LLM_DEADLINE_SECONDS,
+        )
+
+        # Token budgets decide whether a run uses MODEL_NAME, the smaller
+        # fallback model (built on first use) or is refused on a cache miss
+        self.token_budget = TokenBudget(
+            per_minute=LLM_TOKENS_PER_MINUTE,
+            per_day=LLM_TOKENS_PER_DAY,
+            low_watermark=LLM_BUDGET_LOW_WATERMARK,
+            low_mode=LLM_BUDGET_LOW_MODE,
+            fallback_model=LLM_FALLBACK_MODEL,
+        )
+
+        # Per-layer request counters and latency histograms (GET /metrics)
+        self.metrics = Metrics()
+
+        # Hot reload: one reload at a time; replaced versions stay in
+        # _retiring until their in-flight requests have drained
+        self.reload_flight = SingleFlight("reload")
+        self._retiring = []
+        self.reloads = {
+            "reloads": 0,
+            "failures": 0,
+            "last_reload_seconds": None,
+            "changed_columns": [],
+            "intent_entries_kept": 0,
+        }
+
+        # Heavy subsystems warm up in the background after start-up. The
+        # LLM agent and sandbox hold the whole frame, so out of core they
+        # are only built when a question first needs them
+        self.warmup_state = {"llm": "cold", "charts": "cold"}
+        if self.sandbox is not None:
+            self.warmup_state["sandbox"] = "cold"
+        if self.chunked:
+            self.warmup_state = {"deterministic": "cold", "charts": "cold", "llm": "lazy"}
+            if self.sandbox is not None:
+                self.warmup_state["sandbox"] = "lazy"
 
-        self.df = pd.read_csv(DATA_PATH)
-
-        self.det_engine = DeterministicEngine(self.df)
-        self.vis_engine = VisualizationEngine(self.df)
-        self.llm_engine = LLMEngine(self.df)
+    # --------------------------------------------------
+    # Dataset Components
+    # --------------------------------------------------
+    def _dataset_components(self, dataset, previous=None, changed=(), purge_store=True):
+
+        # Everything built from one dataset version. previous: the
+        # deterministic engine of the version being replaced, whose indexes
+        # of unchanged columns are reused
+        df = dataset.frame
+
+        # Datasets past OUT_OF_CORE_ROWS are answered by streaming the
+        # columnar cache in chunks instead of building in-memory indexes
+        chunked = DATASET_ENGINE == "chunked" or (
+            DATASET_ENGINE == "auto" and dataset.rows >= OUT_OF_CORE_ROWS
+        )
+
+        if chunked:
+            det_engine = ChunkedEngine(dataset, chunk_rows=CHUNK_ROWS, workers=CHUNK_WORKERS)
+        elif isinstance(previous, DeterministicEngine):
+            det_engine = DeterministicEngine(df, previous=previous, changed=changed)
+        else:
+            det_engine = DeterministicEngine(df)
+
+        # Agent tool calls run in worker processes holding the dataset
+        sandbox = None
+        if CODE_SANDBOX == "process":
+            sandbox = CodeSandbox(
+                dataset.directory,
+                workers=CODE_SANDBOX_WORKERS,
+                cpu_seconds=CODE_SANDBOX_CPU_SECONDS,
+                timeout=CODE_SANDBOX_TIMEOUT_SECONDS,
+                memory_mb=CODE_SANDBOX_MEMORY_MB,
+            )
+
+        return {
+            "dataset": dataset,
+            "df": df,
+            "dataset_version": dataset.version,
+            "chunked": chunked,
+            "parser": IntentParser(df, dataset.text_columns),
+            "det_engine": det_engine,
+            "vis_engine": VisualizationEngine(df, dataset.version, dataset.directory, purge_store=purge_store),
+            "sandbox": sandbox,
+            "llm_engine": LLMEngine(dataset.full_frame, sandbox=sandbox),
+            "fallback_engine": None,
+        }
+
+    def _install(self, components):
+        # Plain attribute assignments with no await in between: on the event
+        # loop, every request sees either the old version or the new one
+        for name, value in components.items():
+            setattr(self, name, value)
+
+    def _shutdown_components(self, components):
+
+        components["vis_engine"].shutdown()
+        if components["chunked"]:
+            components["det_engine"].shutdown()
+        if components["sandbox"] is not None:
+            components["sandbox"].shutdown()
 
     # --------------------------------------------------
-    # 🔥 Invalid Query Guard (ADD THIS PROPERLY HERE)
+    # Warmup / Readiness
     # --------------------------------------------------
-    def _is_invalid_query(self, question: str) -> bool:
+    def warmup(self):
 
-        q = question.strip()
+        # Blocking: run it in a thread. Deterministic answers never wait
+        # for it; the first chart / LLM request would otherwise pay the cost
+        start = time.perf_counter()
 
-        # Too short
-        if len(q) < 4:
-            return True
+        steps = [
+            ("charts", self.vis_engine.pool.warmup),
+            ("llm", self.llm_engine.warmup),
+        ]
+        if self.sandbox is not None:
+            steps.append(("sandbox", self.sandbox.warmup))
+        if self.chunked:
+            steps = [("deterministic", self.det_engine.warmup), ("charts", self.vis_engine.pool.warmup)]
 
-        # Single random word (e.g., asdsafadsf)
-        if len(q.split()) == 1 and q.isalpha():
-            return True
+        for name, warm in steps:
+            self.warmup_state[name] = "warming"
 
-        # Must contain at least one dataset-related keyword
-        keywords = [
-            "passenger", "class", "fare", "age",
-            "survived", "embarked", "sex", "titanic"
-        ]
+            try:
+                warm()
+                self.warmup_state[name] = "ready"
 
-        if not any(k in q.lower() for k in keywords):
-            if len(q.split()) <= 2:
+            except Exception:
+                logger.exception(f"warmup_failed: {name}")
+                self.warmup_state[name] = "failed"
+
+        logger.info(f"warmup_complete: {time.perf_counter() - start:.2f}s")
+
+    def readiness(self):
+        return {
+            "deterministic": "ready",
+            **self.warmup_state,
+        }
+
+    # --------------------------------------------------
+    # Cache Management
+    # --------------------------------------------------
+    def invalidate_caches(self):
+        # Call whenever the underlying dataset changes
+        removed = self.intent_cache.invalidate()
+        removed += self.vis_engine.cache.invalidate()
+        removed += self.vis_engine.store.invalidate()
+        removed += self.answer_cache.invalidate()
+        if self.plans is not None:
+            removed += self.plans.invalidate()
+        logger.info(f"cache_invalidated: {removed} entries")
+        return removed
+
+    def stats(self):
+        return {
+            "dataset_version": self.dataset_version,
+            "intent_cache": self.intent_cache.stats(),
+            "chart_cache": self.vis_engine.cache.stats(),
+            "chart_store": self.vis_engine.store.stats(),
+            "chart_pool": self.vis_engine.pool.stats(),
+            "llm_cache": self.answer_cache.stats(),
+            "llm_plans": self.plans.stats() if self.plans is not None else None,
+            "llm_coalescing": self.llm_flight.stats(),
+            "llm_scheduler": self.llm_scheduler.stats(),
+            "llm_engine": self.llm_engine.stats(),
+            "code_sandbox": self.sandbox.stats() if self.sandbox is not None else None,
+            "llm_budget": self.token_budget.stats(),
+            "chunked_engine": self.det_engine.stats() if self.chunked else None,
+            "dataset": {
+                "version": self.dataset_version,
+                "rows": self.dataset.rows,
+                "retiring": len(self._retiring),
+                **self.reloads,
+            },
+        }
+
+    def shutdown(self):
+        for components, _ in self._retiring:
+            self._shutdown_components(components)
+        self._shutdown_components(self._components())
+        self.answer_cache.close()
+        if self.plans is not None:
+            self.plans.close()
+
+    async def get_chart(self, chart_id: str):
+
+        image, media_type = await self.vis_engine.get_chart(chart_id)
+
+        # Chart ids handed out just before a reload stay servable while the
+        # replaced version drains
+        for components, _ in reversed(self._retiring):
+            if image is not None:
+                break
+            image, media_type = await components["vis_engine"].get_chart(chart_id)
+
+        return image, media_type
+
+    async def has_chart(self, chart_id: str):
+
+        engines = [self.vis_engine] + [c["vis_engine"] for c, _ in reversed(self._retiring)]
+
+        for engine in engines:
+            if await engine.has_chart(chart_id):
                 return True
 
         return False
 
     # --------------------------------------------------
-    # MAIN ROUTER
+    # Hot Reload
     # --------------------------------------------------
-    async def run(self, question: str):
+    def _components(self):
+        return {
+            name: getattr(self, name)
+            for name in (
+                "dataset", "df", "dataset_version", "chunked", "parser",
+                "det_engine", "vis_engine", "sandbox", "llm_engine", "fallback_engine",
+            )
+        }
 
-        question = question.strip()
+    async def reload_dataset(self):
 
-        logger.info("routing_start", extra={"query": question})
+        # Concurrent callers (the watcher, POST /admin/reload) share one run,
+        # which finishes even if every caller goes away
+        return await asyncio.shield(self.reload_flight.do("reload", self._reload))
+
+    async def _reload(self):
+
+        start = time.perf_counter()
+        previous_version = self.dataset_version
+
+        try:
+            prepared = await asyncio.to_thread(self._prepare_reload)
+
+        except Exception:
+            self.reloads["failures"] += 1
+            logger.exception("dataset_reload_failed")
+
+            raise AppException("Failed to reload the dataset.", 500)
+
+        if prepared is None:
+            logger.info(f"dataset_unchanged: {previous_version}")
+
+            return {
+                "status": "unchanged",
+                "dataset_version": previous_version,
+                "previous_version": previous_version,
+                "changed_columns": [],
+                "intent_cache_kept": len(self.intent_cache),
+                "intent_cache_dropped": 0,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+            }
+
+        components, changed, same_rows = prepared
+        old = self._components()
+
+        # The swap: synchronous, so no request observes a mix of versions
+        self._install(components)
+
+        version = self.dataset_version
+
+        def retag(key):
+            tagged, intent_key = key
+            if (
+                tagged == previous_version
+                and same_rows
+                and answer_columns(intent_key).isdisjoint(changed)
+            ):
+                return version, intent_key
+            return None
+
+        dropped = self.intent_cache.rekey(retag)
+        kept = len(self.intent_cache)
+
+        # Persistent layers: answers and plans of the old version stop
+        # matching at once and are purged when it retires
+        self.answer_cache.set_version(version, self.df.columns)
+        if self.plans is not None:
+            self.plans.set_version(version, self.df.columns)
+
+        if self.chunked:
+            self.warmup_state.update({"deterministic": "ready", "charts": "ready"})
+        else:
+            self.warmup_state.update({"llm": "ready", "charts": "ready"})
+            if self.sandbox is not None:
+                self.warmup_state["sandbox"] = "ready"
+
+        elapsed = time.perf_counter() - start
+
+        self.reloads["reloads"] += 1
+        self.reloads["last_reload_seconds"] = round(elapsed, 3)
+        self.reloads["changed_columns"] = sorted(changed)
+        self.reloads["intent_entries_kept"] = kept
+
+        retire = asyncio.create_task(self._retire(old))
+        self._retiring.append((old, retire))
+
+        logger.info(
+            f"dataset_reloaded: {previous_version} -> {version}, "
+            f"{len(changed)} columns changed, {kept} intent entries kept, "
+            f"{elapsed:.2f}s"
+        )
+
+        return {
+            "status": "reloaded",
+            "dataset_version": version,
+            "previous_version": previous_version,
+            "changed_columns": sorted(changed),
+            "intent_cache_kept": kept,
+            "intent_cache_dropped": dropped,
+            "elapsed_ms": round(elapsed * 1000, 3),
+        }
+
+    def _prepare_reload(self):
+
+        # Blocking: loads the new version and builds and warms everything
+        # derived from it while the current version keeps serving
+        dataset = load_dataset(DATASET_PATH, DATASET_CACHE_DIR)
+
+        if dataset.version == self.dataset_version:
+            return None
+
+        changed = changed_columns(self.dataset.manifest, dataset.manifest)
+        same_rows = dataset.rows == self.dataset.rows
+
+        # The chart store is shared with the serving version: its stale rows
+        # are purged when that version retires, not now
+        components = self._dataset_components(
+            dataset,
+            previous=self.det_engine,
+            changed=changed,
+            purge_store=False,
+        )
+
+        try:
+            components["vis_engine"].pool.warmup()
+            if components["chunked"]:
+                components["det_engine"].warmup()
+            else:
+                components["llm_engine"].warmup()
+                if components["sandbox"] is not None:
+                    components["sandbox"].warmup()
 
+        except Exception:
+            self._shutdown_components(components)
+            raise
+
+        return components, changed, same_rows
+
+    async def _retire(self, components):
+
+        # Requests that read the old version before the swap keep using its
+        # pools until they finish; then the pools and stale rows go
         try:
+            await asyncio.sleep(DATASET_RELOAD_DRAIN_SECONDS)
+
+            await asyncio.to_thread(self._shutdown_components, components)
+            await asyncio.to_thread(self._purge_stale)
+
+            logger.info(f"dataset_retired: {components['dataset_version']}")
+
+        except Exception:
+            logger.exception("dataset_retire_failed")
+
+        finally:
+            self._retiring = [r for r in self._retiring if r[0] is not components]
+
+    def _purge_stale(self):
+
+        removed = self.answer_cache.purge_stale()
+        removed += self.vis_engine.store.purge_stale()
+        if self.plans is not None:
+            removed += self.plans.purge_stale()
+        return removed
+
+    async def watch_dataset(self, interval):
+
+        # Polls the source file; a changed fingerprint is reloaded once it
+        # has been seen on two consecutive polls (the file is no longer
+        # being written). A fingerprint that failed to load is not retried
+        pending = failed = None
+
+        while True:
+            await asyncio.sleep(interval)
+
+            try:
+                fingerprint = await asyncio.to_thread(source_fingerprint, DATASET_PATH)
+            except OSError:
+                continue
+
+            if fingerprint == self.dataset.manifest["fingerprint"] or fingerprint == failed:
+                pending = None
+                continue
+
+            if fingerprint != pending:
+                pending = fingerprint
+                continue
+
+            try:
+                await self.reload_dataset()
+            except AppException:
+                failed = fingerprint
+
+            pending = None
+
+    # --------------------------------------------------
+    # LLM Layer
+    # --------------------------------------------------
+    def _select_engine(self, question: str):
+
+        # The answer cache has already missed at this point
+        mode = self.token_budget.mode()
+
+        if mode == MODE_CACHE_ONLY:
+            self.token_budget.refused += 1
+            logger.warning("llm_budget_exhausted", extra={"query": question})
+
+            raise AppException(
+                "LLM token budget exhausted. Please retry later.",
+                429,
+                headers={"Retry-After": self.token_budget.retry_after()},
+            )
+
+        if mode == MODE_FALLBACK:
+            self.token_budget.degraded += 1
+            logger.info("llm_budget_fallback", extra={"query": question})
+
+            if self.fallback_engine is None:
+                self.fallback_engine = LLMEngine(
+                    self.dataset.full_frame,
+                    model_name=self.token_budget.fallback_model,
+                    sandbox=self.sandbox,
+                )
+
+            return self.fallback_engine
+
+        return self.llm_engine
+
+    def _plans_active(self):
+        # A plan runs against the whole frame, text columns included: out
+        # of core that would load the dataset into memory, so plans are
+        # neither learned nor replayed there
+        return self.plans is not None and not self.chunked
+
+    def _plan_evaluator(self):
+        # Learned plans are agent-written code: they run in the code sandbox
+        # workers under the same limits as agent commands
+        return self.sandbox.evaluate
+
+    async def _record_usage(self, engine, question, intent, result):
+
+        self.token_budget.record(result["model"], result["tokens_input"], result["tokens_output"])
+
+        # The answer cache is keyed to MODEL_NAME: fallback answers are
+        # served once, not stored
+        if engine is self.llm_engine:
+            await self.answer_cache.call(self.answer_cache.put, question, result["answer"])
+
+            if self._plans_active():
+                await self.plans.learn(intent, result, self._plan_evaluator())
+
+    async def _answer_with_llm(self, question: str, intent, priority: int):
+
+        # Only the single-flight leader takes a scheduler slot
+        engine = self._select_engine(question)
+
+        result = await self.llm_scheduler.run(
+            lambda: engine.answer(question),
+            priority=priority,
+        )
+        await self._record_usage(engine, question, intent, result)
+
+        return result
+
+    async def _stream_llm(self, question: str, intent, priority: int):
+
+        # Streaming runs are scheduled like any other agent run, but are
+        # not coalesced: each client receives its own step-by-step events
+        engine = self._select_engine(question)
+
+        async with self.llm_scheduler.slot(priority) as deadline:
+
+            events = engine.astream(question).__aiter__()
+
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(
+                            events.__anext__(),
+                            deadline - time.monotonic(),
+                        )
+                    except StopAsyncIteration:
+                        break
+
+                    if event["event"] == "final":
+                        await self._record_usage(engine, question, intent, event)
 
-            # 🔥 0️⃣ Invalid Query Check (BEFORE everything)
-            if self._is_invalid_query(question):
-                logger.info("invalid_query_blocked", extra={"query": question})
+                    yield event
 
-                return {
-                    "answer": "Please ask a valid question related to the Titanic dataset.",
-                    "chart": None,
-                    "tokens_input": 0,
-                    "tokens_output": 0,
-                    "hallucination_detected": False,
-                }
+            finally:
+                await events.aclose()
 
-            # 1️⃣ Deterministic
-            simple = self.det_engine.handle(question)
+    # --------------------------------------------------
+    # MAIN ROUTER
+    # --------------------------------------------------
+    def _result(self, answer, layer, chart=None, usage=None):
+
+        # usage: the agent run's token counts (only for the request that
+        # actually ran it; cached and coalesced answers cost nothing)
+        usage = usage or {}
+
+        return {
+            "answer": answer,
+            "chart": chart,
+            "layer": layer,
+            "model": usage.get("model"),
+            "tokens_input": usage.get("tokens_input", 0),
+            "tokens_output": usage.get("tokens_output", 0),
+            "iterations": usage.get("iterations", 0),
+            "hallucination_detected": False,
+        }
+
+    def _route_deterministic(self, question, intent):
+
+        # Synchronous layers: no awaits, no I/O. A chunked engine's scans
+        # are left to _route_local; only its cached answers are served here
+
+        # 🔥 0️⃣ Invalid Query Check (BEFORE everything)
+        if intent.is_invalid:
+            logger.info("invalid_query_blocked", extra={"query": question})
+
+            return self._result(
+                "Please ask a valid question related to the Titanic dataset.",
+                "invalid",
+            )
+
+        # 1️⃣ Deterministic (paraphrases share one cached answer)
+        simple = None
+
+        if intent.key is not None:
+            key = (self.dataset_version, intent.key)
+
+            with span("deterministic"):
+                simple = self.intent_cache.get(key)
+
+                if simple is None and not self.det_engine.blocking:
+                    simple = self.det_engine.handle(intent)
+
+                    if simple:
+                        self.intent_cache.put(key, simple)
+
+        if simple:
+            logger.info("deterministic_hit", extra={"query": question})
+
+            return self._result(simple, "deterministic")
+
+        return None
+
+    async def _route_local(self, question, intent, chart_format):
+
+        # Every layer that can answer without the LLM; None means fall through
+        result = self._route_deterministic(question, intent)
+
+        if result is not None:
+            return result
+
+        # 1️⃣ Deterministic, out of core: the scan runs off the event loop
+        if self.det_engine.blocking and intent.key is not None:
+            # Tagged with the version the scan ran against, in case a
+            # reload lands while it runs
+            key = (self.dataset_version, intent.key)
+
+            with span("deterministic"):
+                simple = await asyncio.to_thread(self.det_engine.handle, intent)
 
             if simple:
+                self.intent_cache.put(key, simple)
                 logger.info("deterministic_hit", extra={"query": question})
 
-                return {
-                    "answer": simple,
-                    "chart": None,
-                    "tokens_input": 0,
-                    "tokens_output": 0,
-                    "hallucination_detected": False,
-                }
+                return self._result(simple, "deterministic")
+
+        # 2️⃣ Visualization
+        if self.vis_engine.is_visual_request(intent):
+
+            logger.info("visualization_hit", extra={"query": question})
+
+            with span("visualization"):
+                answer, chart = await self.vis_engine.generate(intent, chart_format)
+
+            return self._result(answer, "visualization", chart)
+
+        # 3️⃣ LLM answer cache
+        with span("llm_cache"):
+            answer = await self.answer_cache.call(self.answer_cache.get, question)
+
+        if answer is not None:
+            logger.info("llm_cache_hit", extra={"query": question})
+
+            return self._result(answer, "llm_cache")
+
+        # 4️⃣ Learned query plan (a past agent answer's expression)
+        if self._plans_active():
+            with span("llm_plan"):
+                answer = await self.plans.replay(intent, self._plan_evaluator())
+
+            if answer is not None:
+                logger.info("llm_plan_hit", extra={"query": question})
+
+                return self._result(answer, "llm_plan")
+
+        return None
+
+    async def run(
+        self,
+        question: str,
+        chart_format: str = "png",
+        priority: int = PRIORITY_NORMAL,
+        endpoint: str = "chat",
+        intent=None,
+    ):
+
+        question = question.strip()
+
+        logger.info("routing_start", extra={"query": question})
 
-            # 2️⃣ Visualization
-            if self.vis_engine.is_visual_request(question):
+        start = time.perf_counter()
+        layer, status = "error", 200
+        self.metrics.enter()
 
-                logger.info("visualization_hit", extra={"query": question})
+        try:
 
-                answer, chart = self.vis_engine.generate(question)
+            # One parse per request, shared by every layer below
+            # (includes the invalid-query guard); batches pass in the
+            # intent they already parsed
+            if intent is None:
+                with span("parse"):
+                    intent = self.parser.parse(question)
 
-                return {
-                    "answer": answer,
-                    "chart": chart,
-                    "tokens_input": 0,
-                    "tokens_output": 0,
-                    "hallucination_detected": False,
-                }
+            result = await self._route_local(question, intent, chart_format)
 
-            # 3️⃣ LLM fallback
+            if result is not None:
+                layer = result["layer"]
+                return result
+
+            # 5️⃣ LLM fallback
             logger.info("llm_routing", extra={"query": question})
+            layer = "llm"
 
-            answer = await self.llm_engine.answer(question)
+            # Only the leader's factory runs; followers share its answer
+            led = []
 
-            return {
-                "answer": answer,
-                "chart": None,
-                "tokens_input": 0,
-                "tokens_output": 0,
-                "hallucination_detected": False,
-            }
+            def lead():
+                led.append(True)
+                return self._answer_with_llm(question, intent, priority)
+
+            with span("llm"):
+                result = await self.llm_flight.do((self.dataset_version, normalize(question)), lead)
+
+            return self._result(result["answer"], "llm", usage=result if led else {"model": result["model"]})
+
+        except AppException as exc:
+            status = exc.status_code
+            raise
 
         except asyncio.TimeoutError:
 
+            status = 504
             logger.error("llm_timeout", extra={"query": question})
 
             raise AppException("Request timeout.", 504)
 
         except Exception:
 
+            status = 500
+            logger.exception("agent_failure", extra={"query": question})
+
+            raise AppException("Failed to process request", 500)
+
+        finally:
+            self.metrics.exit()
+            self.metrics.observe(endpoint, layer, time.perf_counter() - start, status)
+
+    async def stream(self, question: str, chart_format: str = "png", priority: int = PRIORITY_NORMAL):
+
+        # Same routing as run(), emitted as events: route -> [step /
+        # observation / token ...] -> final, or a single error event
+        question = question.strip()
+
+        logger.info("routing_start", extra={"query": question})
+
+        start = time.perf_counter()
+        layer, status = "error", 200
+        self.metrics.enter()
+
+        try:
+
+            with span("parse"):
+                intent = self.parser.parse(question)
+
+            result = await self._route_local(question, intent, chart_format)
+
+            if result is not None:
+                layer = result["layer"]
+                yield {"event": "route", "layer": layer}
+                yield {"event": "final", **result}
+                return
+
+            logger.info("llm_routing", extra={"query": question})
+            layer = "llm"
+            yield {"event": "route", "layer": "llm"}
+
+            async for event in self._stream_llm(question, intent, priority):
+
+                if event["event"] == "final":
+                    yield {"event": "final", **self._result(event["answer"], "llm", usage=event)}
+                else:
+                    yield event
+
+        except AppException as exc:
+            status = exc.status_code
+            yield {"event": "error", "status": exc.status_code, "error": exc.message}
+
+        except asyncio.TimeoutError:
+            status = 504
+            logger.error("llm_timeout", extra={"query": question})
+            yield {"event": "error", "status": 504, "error": "Request timeout."}
+
+        except Exception:
+            status = 500
             logger.exception("agent_failure", extra={"query": question})
+            yield {"event": "error", "status": 500, "error": "Failed to process request"}
+
+        finally:
+            self.metrics.exit()
+            self.metrics.observe("stream", layer, time.perf_counter() - start, status)
 
-            raise AppException("Failed to process request", 500)
\ No newline at end of file
+    # --------------------------------------------------
+    # BATCH
+    # --------------------------------------------------
+    async def run_batch(self, questions, chart_format: str = "png"):
+
+        if len(questions) > BATCH_MAX_QUESTIONS:
+            raise AppException(f"At most {BATCH_MAX_QUESTIONS} questions per batch.", 413)
+
+        results = [None] * len(questions)
+        remaining = {}
+
+        # 1️⃣ One synchronous pass resolves every deterministic question
+        # straight from the precomputed cube, without touching the loop
+        for i, question in enumerate(questions):
+
+            start = time.perf_counter()
+            question = question.strip()
+
+            intent = self.parser.parse(question)
+            result = self._route_deterministic(question, intent)
+
+            if result is None:
+                remaining[i] = intent
+                continue
+
+            results[i] = self._batch_item(question, result, start)
+            self.metrics.observe("batch", result["layer"], time.perf_counter() - start)
+
+        # 2️⃣ Charts and LLM fallbacks run concurrently, bounded, at low
+        # priority so interactive /chat traffic is admitted first
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def resolve(i):
+
+            question = questions[i].strip()
+
+            async with semaphore:
+                start = time.perf_counter()
+
+                try:
+                    result = await self.run(
+                        question, chart_format, priority=PRIORITY_LOW, endpoint="batch", intent=remaining[i],
+                    )
+                    results[i] = self._batch_item(question, result, start)
+
+                except AppException as exc:
+                    results[i] = {
+                        "question": question,
+                        "answer": None,
+                        "chart": None,
+                        "layer": None,
+                        "status": exc.status_code,
+                        "error": exc.message,
+                        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+                    }
+
+        await asyncio.gather(*(resolve(i) for i in remaining))
+
+        logger.info(
+            f"batch_complete: {len(questions)} questions, "
+            f"{len(questions) - len(remaining)} deterministic"
+        )
+
+        return results
+
+    def _batch_item(self, question, result, start):
+        return {
+            "question": question,
+            "answer": result["answer"],
+            "chart": result["chart"],
+            "layer": result["layer"],
+            "status": 200,
+            "error": None,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
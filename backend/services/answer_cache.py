@@ -0,0 +1,340 @@
+import logging
+import time
+from collections import Counter
+
+from backend.services.intent_parser import (
+    COLUMN_ALIASES,
+    COMPARATORS,
+    FILTER_WORDS,
+    HIGH_WORDS,
+    LOW_WORDS,
+    MAX_WORDS,
+    MIN_WORDS,
+    RANK_WORDS,
+    normalize,
+)
+from backend.services.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+# Tokens whose presence changes the meaning of an otherwise similar question
+NEGATIONS = {"not", "no", "without", "never", "except"}
+
+# Direction words: "most common" and "least common" differ by one word.
+# The parser's superlatives and comparators, plus their everyday forms
+DIRECTIONS = (
+    HIGH_WORDS | LOW_WORDS | MAX_WORDS | MIN_WORDS | set(RANK_WORDS)
+    | {word for phrase in COMPARATORS for word in phrase if word not in ("than", "at")}
+    | {
+        "most", "least", "more", "fewer", "less", "greater", "higher", "lower",
+        "largest", "smallest", "first", "last", "top", "bottom",
+        "frequently", "rarely", "common", "rare", "rarest", "commonest",
+    }
+) - set(FILTER_WORDS)
+
+
+def _ngrams(text, n=3):
+
+    # Character trigrams tolerate small wording changes; word bigrams
+    # (counted twice) keep "men vs women" from matching "women vs men"
+    padded = f" {text} "
+    features = {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+    tokens = text.split()
+    for a, b in zip(tokens, tokens[1:]):
+        features.add((a, b, 0))
+        features.add((a, b, 1))
+
+    return features
+
+
+def _guard(text, column_words):
+
+    # Two questions may only share an answer by similarity when their
+    # numbers, columns, filters, negations and directions agree exactly
+    signature = set()
+
+    for token in text.split():
+        if token.isdigit() or token in NEGATIONS or token in DIRECTIONS:
+            signature.add(token)
+        elif token in FILTER_WORDS:
+            signature.add(FILTER_WORDS[token])
+        elif token in column_words:
+            signature.add(column_words[token])
+
+    return frozenset(signature)
+
+
+class AnswerCache(SQLiteStore):
+
+    # LLM answers by normalized question, per dataset version and model,
+    # with an in-memory n-gram index for paraphrase lookups
+
+    TOUCH_SQL = (
+        "UPDATE answers SET last_used = ? "
+        "WHERE key = ? AND dataset_version = ? AND model = ?"
+    )
+
+    def __init__(
+        self,
+        path,
+        dataset_version,
+        model_name,
+        ttl=86400,
+        max_entries=5000,
+        similarity=0.0,
+        columns=(),
+    ):
+
+        self.dataset_version = dataset_version
+        self.model_name = model_name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+
+        self.column_words = dict(COLUMN_ALIASES)
+        for col in columns:
+            self.column_words[col.lower()] = col
+            self.column_words[col.lower() + "s"] = col
+
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+        super().__init__(path, "answer-cache")
+
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT NOT NULL,
+                dataset_version TEXT NOT NULL,
+                model TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (key, dataset_version, model)
+            )
+            """
+        )
+        self._db.commit()
+
+        # In-memory n-gram index over the live entries; other worker
+        # processes write to the same file, so new rows are picked up by
+        # rowid before every similarity lookup
+        self._grams = {}
+        self._postings = {}
+        self._last_rowid = 0
+
+        self.purge_stale()
+        self._load_index()
+
+    # --------------------------------------------------
+    # Lookups
+    # --------------------------------------------------
+    def get(self, question: str):
+
+        key = normalize(question)
+        answer = self._get_exact(key)
+
+        if answer is not None:
+            self.hits += 1
+            return answer
+
+        if self.similarity > 0:
+            self._load_index()
+            match = self._most_similar(key)
+            if match is not None:
+                answer = self._get_exact(match)
+                if answer is not None:
+                    self.similar_hits += 1
+                    logger.info("llm_cache_similar_hit", extra={"query": question})
+                    return answer
+
+        self.misses += 1
+        return None
+
+    def _get_exact(self, key):
+
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer FROM answers "
+                "WHERE key = ? AND dataset_version = ? AND model = ? AND created >= ?",
+                (key, self.dataset_version, self.model_name, now - self.ttl),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._touch((key, self.dataset_version, self.model_name), now)
+
+        return row[0]
+
+    def _most_similar(self, key):
+
+        grams = _ngrams(key)
+        guard = _guard(key, self.column_words)
+        overlap = Counter()
+
+        with self._lock:
+            for gram in grams:
+                overlap.update(self._postings.get(gram, ()))
+
+            best, best_score = None, 0.0
+
+            for candidate, shared in overlap.items():
+                candidate_grams, candidate_guard = self._grams[candidate]
+
+                if candidate_guard != guard:
+                    continue
+
+                score = shared / (len(grams) + len(candidate_grams) - shared)
+
+                if score > best_score:
+                    best, best_score = candidate, score
+
+        return best if best_score >= self.similarity else None
+
+    # --------------------------------------------------
+    # Writes
+    # --------------------------------------------------
+    def put(self, question: str, answer: str):
+
+        if not answer:
+            return
+
+        key = normalize(question)
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, dataset_version, model, answer, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.dataset_version, self.model_name, answer, now, now),
+            )
+            self._index(key)
+            self._flush_touches()
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+
+        (count,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+        excess = count - self.max_entries
+
+        if excess <= 0:
+            return
+
+        victims = self._db.execute(
+            "SELECT key, dataset_version, model FROM answers "
+            "ORDER BY last_used ASC LIMIT ?",
+            (excess,),
+        ).fetchall()
+
+        self._db.executemany(
+            "DELETE FROM answers WHERE key = ? AND dataset_version = ? AND model = ?",
+            victims,
+        )
+
+        for key, version, model in victims:
+            if version == self.dataset_version and model == self.model_name:
+                self._unindex(key)
+
+    def purge_stale(self):
+
+        # Entries from another dataset version or model, or past their TTL
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM answers "
+                "WHERE dataset_version != ? OR model != ? OR created < ?",
+                (self.dataset_version, self.model_name, time.time() - self.ttl),
+            )
+            self._db.commit()
+
+        return cursor.rowcount
+
+    def set_version(self, dataset_version, columns=None):
+
+        # A reloaded dataset: lookups and new answers move to its version;
+        # the old version's rows stay until purge_stale
+        if columns is not None:
+            self.column_words = dict(COLUMN_ALIASES)
+            for col in columns:
+                self.column_words[col.lower()] = col
+                self.column_words[col.lower() + "s"] = col
+
+        with self._lock:
+            self.dataset_version = dataset_version
+            self._grams.clear()
+            self._postings.clear()
+            self._last_rowid = 0
+
+        self._load_index()
+
+    def invalidate(self):
+
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM answers")
+            self._db.commit()
+            self._grams.clear()
+            self._postings.clear()
+            self._last_rowid = 0
+
+        return cursor.rowcount
+
+    # --------------------------------------------------
+    # N-gram Index
+    # --------------------------------------------------
+    def _load_index(self):
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT rowid, key FROM answers "
+                "WHERE rowid > ? AND dataset_version = ? AND model = ?",
+                (self._last_rowid, self.dataset_version, self.model_name),
+            ).fetchall()
+
+            for rowid, key in rows:
+                self._index(key)
+                self._last_rowid = max(self._last_rowid, rowid)
+
+    def _index(self, key):
+
+        if key in self._grams:
+            return
+
+        grams = _ngrams(key)
+        self._grams[key] = (grams, _guard(key, self.column_words))
+
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key)
+
+    def _unindex(self, key):
+
+        grams, _ = self._grams.pop(key, (set(), None))
+
+        for gram in grams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def stats(self):
+
+        lookups = self.hits + self.similar_hits + self.misses
+
+        return {
+            "entries": len(self._grams),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl,
+            "model": self.model_name,
+            "dataset_version": self.dataset_version,
+        }
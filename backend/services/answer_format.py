@@ -0,0 +1,227 @@
+import pandas as pd
+
+
+# Answer texts shared by the deterministic engines (in-memory and chunked):
+# both compute the numbers their own way, then word them here, so the two
+# give identical answers for the same intent.
+
+NO_MATCH = "No passengers match the given criteria."
+
+# Longest ranked list an answer prints ("top 1000 fares" lists 50)
+MAX_TOP_K = 50
+
+PORT_NAMES = {"C": "Cherbourg", "Q": "Queenstown", "S": "Southampton"}
+
+
+# ----------------------------------------------------------
+# Labels
+# ----------------------------------------------------------
+
+def _ordinal(n):
+    n = int(n)
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def statistic_label(op, col, q):
+    return {
+        "mean": f"average {col}",
+        "median": f"median {col}",
+        "std": f"standard deviation of {col}",
+        "percentile": f"{_ordinal(q or 0)} percentile of {col}",
+        "max": f"maximum {col}",
+        "min": f"minimum {col}",
+    }[op]
+
+
+def correlation_strength(r):
+
+    size = abs(r)
+
+    if size < 0.1:
+        return "no meaningful"
+    if size < 0.3:
+        return "a weak " + ("positive" if r > 0 else "negative")
+    if size < 0.5:
+        return "a moderate " + ("positive" if r > 0 else "negative")
+    return "a strong " + ("positive" if r > 0 else "negative")
+
+
+def _capitalized(label):
+    return f"{label[0].upper()}{label[1:]}"
+
+
+def range_condition(ranges):
+
+    # Resolved range conditions for answer labels: "Fare > 14.4542",
+    # "Age between 20 and 40"; "" without ranges
+    bounds = {}
+    for col, op, value in ranges:
+        bounds.setdefault(col, {})[op] = value
+
+    parts = []
+    for col, ops in bounds.items():
+        if set(ops) == {">=", "<="}:
+            parts.append(f"{col} between {ops['>=']:g} and {ops['<=']:g}")
+        else:
+            parts.extend(f"{col} {op} {value:g}" for op, value in ops.items())
+
+    return " and ".join(parts)
+
+
+def _for(condition):
+    return f" for {condition}" if condition else ""
+
+
+def _joined(parts):
+    return parts[0] if len(parts) == 1 else ", ".join(parts[:-1]) + " and " + parts[-1]
+
+
+def _filter_clauses(filters, condition=""):
+
+    # Filters and range conditions as predicates of "passengers":
+    # ["were female in 1st class", "embarked at Cherbourg", "survived"]
+    states = []
+    if "Sex" in filters:
+        states.append(filters["Sex"])
+    if "Pclass" in filters:
+        states.append(f"in {_ordinal(filters['Pclass'])} class")
+
+    clauses = [f"were {' '.join(states)}"] if states else []
+
+    if "Embarked" in filters:
+        clauses.append(f"embarked at {PORT_NAMES.get(filters['Embarked'], filters['Embarked'])}")
+    if "Survived" in filters:
+        clauses.append("survived" if filters["Survived"] else "died")
+
+    clauses.extend(
+        f"had {col} {value}" for col, value in filters.items()
+        if col not in ("Sex", "Pclass", "Embarked", "Survived")
+    )
+
+    if condition:
+        clauses.append(f"had {condition}")
+
+    return clauses
+
+
+# ----------------------------------------------------------
+# Counts
+# ----------------------------------------------------------
+
+def count_text(n):
+    return f"There were {n} passengers matching the criteria."
+
+
+def total_text(n):
+    return f"There were {n} passengers in total."
+
+
+def percentage_text(selected, total, filters=None, condition=""):
+
+    # "64.76% of passengers were male.", "38.38% of passengers survived."
+    share = f"{selected / total * 100:.2f}% of passengers"
+    clauses = _filter_clauses(filters or {}, condition)
+
+    if not clauses:
+        return f"{share} match the given criteria."
+
+    return f"{share} {_joined(clauses)}."
+
+
+def counts_lines(counts):
+    # counts: pd.Series value -> count, already in answer order
+    return "\n".join(f"{k}: {v}" for k, v in counts.items())
+
+
+def grouped_count_text(col, lines, ports=False, condition=""):
+
+    # The unfiltered count by port has its own heading
+    if ports:
+        return "Passengers embarked from each port:\n" + lines
+
+    return f"Passenger count by {col}{_for(condition)}:\n" + lines
+
+
+# ----------------------------------------------------------
+# Statistics
+# ----------------------------------------------------------
+
+def statistic_text(op, col, q, value, condition=""):
+    # value: already formatted
+    return f"The {statistic_label(op, col, q)}{_for(condition)} was {value}."
+
+
+def grouped_statistic_text(op, col, q, group, lines, condition=""):
+    return f"{_capitalized(statistic_label(op, col, q))} by {group}{_for(condition)}:\n" + "\n".join(lines)
+
+
+def unknown_text(col):
+    return f"{col} is not known for the matching passengers."
+
+
+def age_text(op, age, condition=""):
+    return f"The {op} passenger{_for(condition)} was {age} years old."
+
+
+def top_text(op, col, k, entries, condition=""):
+
+    # k: as asked; entries: [(value, PassengerId or None)] in rank order,
+    # at most MAX_TOP_K of them
+    if not entries:
+        return NO_MATCH
+
+    word = "Top" if op == "top_k" else "Bottom"
+
+    lines = [
+        f"{rank}. {value}" + (f" (PassengerId {pid})" if pid is not None else "")
+        for rank, (value, pid) in enumerate(entries, 1)
+    ]
+
+    if k > MAX_TOP_K:
+        lines.append(f"(Only the first {MAX_TOP_K} of the {k} requested are listed.)")
+
+    return f"{word} {min(k, MAX_TOP_K)} by {col}{_for(condition)}:\n" + "\n".join(lines)
+
+
+def correlation_text(a, b, r):
+
+    if r is None:
+        return f"There is not enough data to correlate {a} and {b}."
+
+    return f"The correlation between {a} and {b} is {r:.3f}, {correlation_strength(r)} relationship."
+
+
+# ----------------------------------------------------------
+# Survival
+# ----------------------------------------------------------
+
+def survival_rate_text(survivors, n, condition=""):
+    return f"The survival rate{_for(condition)} was {survivors / n * 100:.2f}% ({survivors} of {n} passengers)."
+
+
+def survival_table_text(col, rates, condition=""):
+    return f"Survival rate by {col}{_for(condition)}:\n" + "\n".join(f"{k}: {v * 100:.2f}%" for k, v in rates.items())
+
+
+def extreme_rate_text(op, col, rates, condition=""):
+
+    highest = op == "highest_survival_rate"
+    rates = pd.Series(rates).sort_values(ascending=not highest)
+    label = "Class" if col == "Pclass" else col
+    word = "highest" if highest else "lowest"
+
+    return f"{label} {rates.index[0]} had the {word} survival rate{_for(condition)} at {rates.iloc[0] * 100:.2f}%."
+
+
+def crosstab_text(op, rows, columns, cells, condition=""):
+
+    # cells: [(row value, column value, rows in the cell, survivors)]
+    if op == "crosstab_count":
+        lines = [f"{r} / {c}: {n}" for r, c, n, _ in cells]
+        title = "Passenger count"
+    else:
+        lines = [f"{r} / {c}: {s / n * 100:.2f}%" for r, c, n, s in cells]
+        title = "Survival rate"
+
+    return f"{title} by {rows} and {columns}{_for(condition)}:\n" + "\n".join(lines)
@@ -0,0 +1,385 @@
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from backend.core.config import CHUNK_ROWS
+from backend.core.dataset import widen_float32
+from backend.core.exceptions import AppException
+from backend.services.filter_index import range_mask, resolve_ranges
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+# Rendering (runs inside worker processes)
+# ----------------------------------------------------------
+
+# Each worker receives the dataset once, at start-up: either the frame
+# itself, or the columnar cache directory to memory-map, so every worker
+# shares the same page-cache copy instead of holding its own
+_WORKER_DF = None
+
+
+def _init_worker(df, dataset_dir=None):
+    global _WORKER_DF
+
+    if dataset_dir is not None:
+        from backend.core.dataset import Dataset
+        df = Dataset(dataset_dir).frame
+
+    _WORKER_DF = df
+
+
+CHART_MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "webp": "image/webp",
+    "spec": "application/json",
+}
+
+
+def _import_matplotlib():
+
+    # Deferred: matplotlib is only needed where charts are drawn, which
+    # keeps it out of the web process's start-up path
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    return Figure, FigureCanvasAgg
+
+
+def _warm_worker():
+    _import_matplotlib()
+
+
+# Most points a scatter plot of a streamed frame keeps (an even stride)
+SCATTER_MAX_POINTS = 100_000
+
+
+def plot_data(spec, df):
+
+    # Plain-JSON description of the chart; the "spec" format ships this
+    # as-is and the raster/vector formats are drawn from it
+    if len(df) > CHUNK_ROWS:
+        return _streamed_plot_data(spec, df)
+
+    plot_type = spec["plot_type"]
+    columns = spec["columns"]
+
+    # Statistic references ("above the median") are over all rows
+    ranges = resolve_ranges(
+        spec.get("ranges", ()),
+        lambda col, name: getattr(np, f"nan{name}")(widen_float32(df[col].to_numpy())),
+    )
+
+    for col, val in spec.get("filters", ()):
+        df = df[df[col] == val]
+
+    if ranges:
+        df = df[range_mask(lambda col: widen_float32(df[col].to_numpy()), ranges)]
+
+    if plot_type == "scatter":
+        x, y = columns[:2]
+        points = df[[x, y]].dropna()
+        return {
+            "type": "scatter",
+            "x": x,
+            "y": y,
+            "points": np.column_stack([
+                widen_float32(points[x]).astype(float),
+                widen_float32(points[y]).astype(float),
+            ]).tolist(),
+        }
+
+    if plot_type in ("pie", "bar"):
+        counts = df[columns[0]].value_counts()
+        return {
+            "type": plot_type,
+            "column": columns[0],
+            "labels": [str(k) for k in counts.index],
+            "values": [int(v) for v in counts.values],
+        }
+
+    values = widen_float32(df[columns[0]].dropna()).astype(float)
+    counts, edges = np.histogram(values, bins=10)
+    return {
+        "type": "hist",
+        "column": columns[0],
+        "bins": edges.tolist(),
+        "counts": counts.tolist(),
+    }
+
+
+def _slices(df):
+    # Row slices of a (memory-mapped) frame, CHUNK_ROWS at a time
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[start:start + CHUNK_ROWS]
+
+
+def _streamed_reference(df, col, name):
+
+    # Whole-column mean / median without widening the column at once:
+    # widening keeps order, so the median's neighbours are found among
+    # the stored values and only those two are widened
+    if name == "mean":
+        total = count = 0
+        for chunk in _slices(df):
+            values = widen_float32(chunk[col].to_numpy()).astype(float)
+            total += np.nansum(values)
+            count += int((~np.isnan(values)).sum())
+        return total / count if count else np.nan
+
+    values = df[col].to_numpy()
+    values = values[~np.isnan(values)] if np.issubdtype(values.dtype, np.floating) else np.array(values)
+
+    if len(values) == 0:
+        return np.nan
+
+    lower, upper = (len(values) - 1) // 2, len(values) // 2
+    values = np.partition(values, [lower, upper])
+    low, high = widen_float32(values[[lower, upper]]).astype(float)
+
+    return (low + high) / 2
+
+
+def _streamed_plot_data(spec, df):
+
+    # plot_data for frames past CHUNK_ROWS rows: filters, ranges and the
+    # aggregation run one row slice at a time and only the partial
+    # results (counts, histogram bins, sampled points) are kept
+    plot_type = spec["plot_type"]
+    columns = spec["columns"]
+
+    ranges = resolve_ranges(spec.get("ranges", ()), lambda col, name: _streamed_reference(df, col, name))
+
+    def selected():
+        for chunk in _slices(df):
+            for col, val in spec.get("filters", ()):
+                chunk = chunk[chunk[col] == val]
+            if ranges:
+                chunk = chunk[range_mask(lambda col: widen_float32(chunk[col].to_numpy()), ranges)]
+            yield chunk
+
+    if plot_type == "scatter":
+        x, y = columns[:2]
+        stride = max(1, -(-len(df) // SCATTER_MAX_POINTS))
+        points = []
+
+        for chunk in selected():
+            chunk = chunk.loc[chunk.index % stride == 0, [x, y]].dropna()
+            points.append(np.column_stack([
+                widen_float32(chunk[x]).astype(float),
+                widen_float32(chunk[y]).astype(float),
+            ]))
+
+        return {
+            "type": "scatter",
+            "x": x,
+            "y": y,
+            "points": np.concatenate(points).tolist() if points else [],
+        }
+
+    if plot_type in ("pie", "bar"):
+        # Unsorted per-slice counts merge in order of first appearance, so
+        # ties sort as value_counts over the whole column would
+        counts = {}
+
+        for chunk in selected():
+            for key, n in chunk[columns[0]].value_counts(sort=False).items():
+                counts[key] = counts.get(key, 0) + int(n)
+
+        counts = pd.Series(counts, dtype="int64").sort_values(ascending=False, kind="stable")
+        return {
+            "type": plot_type,
+            "column": columns[0],
+            "labels": [str(k) for k in counts.index],
+            "values": [int(v) for v in counts.values],
+        }
+
+    # Same ten equal-width bins np.histogram would pick: one pass for the
+    # range, one to count
+    col = columns[0]
+    low, high = np.inf, -np.inf
+
+    for chunk in selected():
+        values = widen_float32(chunk[col].dropna()).astype(float)
+        if len(values):
+            low, high = min(low, values.min()), max(high, values.max())
+
+    if low > high:
+        low, high = 0.0, 1.0
+    elif low == high:
+        low, high = low - 0.5, high + 0.5
+
+    edges = np.linspace(low, high, 11)
+    counts = np.zeros(10, dtype=np.int64)
+
+    for chunk in selected():
+        counts += np.histogram(widen_float32(chunk[col].dropna()).astype(float), bins=edges)[0]
+
+    return {
+        "type": "hist",
+        "column": col,
+        "bins": edges.tolist(),
+        "counts": counts.tolist(),
+    }
+
+
+def render_chart(spec, df=None, fmt="png"):
+
+    df = _WORKER_DF if df is None else df
+    data = plot_data(spec, df)
+
+    if fmt == "spec":
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+    # Object-oriented Figure/Agg API only: no global pyplot state,
+    # so concurrent renders never share a figure
+    Figure, FigureCanvasAgg = _import_matplotlib()
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    if data["type"] == "scatter":
+        points = np.asarray(data["points"]).reshape(-1, 2)
+        ax.scatter(points[:, 0], points[:, 1])
+        ax.set_xlabel(data["x"])
+        ax.set_ylabel(data["y"])
+
+    elif data["type"] == "pie":
+        ax.pie(data["values"], labels=data["labels"], autopct="%1.1f%%")
+        ax.set_ylabel("count")
+
+    elif data["type"] == "bar":
+        positions = list(range(len(data["values"])))
+        ax.bar(positions, data["values"])
+        ax.set_xticks(positions, data["labels"], rotation=90)
+        ax.set_xlabel(data["column"])
+
+    else:
+        edges = data["bins"]
+        ax.hist(edges[:-1], bins=edges, weights=data["counts"])
+        ax.grid(True)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+
+    return buffer.getvalue()
+
+
+# ----------------------------------------------------------
+# Pool
+# ----------------------------------------------------------
+
+class ChartRenderPool:
+
+    def __init__(self, df, executor="process", workers=2, queue_size=16, timeout=10.0, dataset_dir=None):
+
+        self.df = df
+        self.dataset_dir = dataset_dir
+        self.executor_kind = executor
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.timeout = timeout
+
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+
+        # Created on first use so importing the app never forks
+        if self._executor is None:
+
+            if self.executor_kind == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(None, self.dataset_dir) if self.dataset_dir else (self.df,),
+                )
+
+        return self._executor
+
+    def warmup(self):
+
+        # Start the workers and import matplotlib in each of them
+        executor = self._get_executor()
+        futures = [executor.submit(_warm_worker) for _ in range(self.workers)]
+
+        for future in futures:
+            future.result()
+
+    def _submit(self, spec, fmt):
+
+        executor = self._get_executor()
+
+        # Threads share this process, so hand them the frame directly
+        if self.executor_kind == "thread":
+            return executor.submit(render_chart, spec, self.df, fmt)
+
+        return executor.submit(render_chart, spec, None, fmt)
+
+    async def render(self, spec, fmt="png"):
+
+        # Bounded queue: fail fast instead of piling up renders
+        with self._lock:
+            if self._pending >= self.capacity:
+                logger.warning("chart_queue_full")
+                raise AppException("Chart renderer is busy. Please retry shortly.", 503)
+
+            self._pending += 1
+
+        future = None
+
+        try:
+            future = self._submit(spec, fmt)
+
+            # A render that times out keeps its worker busy, so its slot
+            # is freed when the render ends, not when the wait does
+            future.add_done_callback(self._release)
+
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+        except asyncio.TimeoutError:
+            logger.error("chart_timeout")
+            raise AppException("Chart rendering timed out.", 504)
+
+        except BrokenProcessPool:
+            logger.exception("chart_pool_broken")
+            self.shutdown()
+            raise AppException("Failed to generate chart.", 500)
+
+        finally:
+            if future is None:
+                self._release()
+
+    def _release(self, future=None):
+        # Runs on executor threads as well as the event loop
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self):
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "pending": self._pending,
+            "capacity": self.capacity,
+        }
+
+    def shutdown(self):
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
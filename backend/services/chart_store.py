@@ -0,0 +1,196 @@
+import json
+import logging
+import time
+
+from backend.services.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class ChartStore(SQLiteStore):
+
+    # Chart specs and rendered images in one SQLite file, shared by every
+    # worker process on the host: a chart planned or rendered by one
+    # worker can be served by any other without re-rendering. Image hits
+    # only bump last_used in memory (see SQLiteStore._touch)
+
+    TOUCH_SQL = "UPDATE charts SET last_used = ? WHERE chart_id = ?"
+
+    def __init__(self, path, dataset_version, max_entries=4096, max_bytes=256 * 1024 * 1024, purge=True):
+
+        self.dataset_version = dataset_version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        super().__init__(path, "chart-store")
+
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS charts (
+                chart_id TEXT PRIMARY KEY,
+                dataset_version TEXT NOT NULL,
+                format TEXT NOT NULL,
+                spec TEXT NOT NULL,
+                image BLOB,
+                size INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+
+        # A hot reload keeps the previous version's charts until its
+        # requests have drained, then purges them
+        if purge:
+            self.purge_stale()
+
+    # --------------------------------------------------
+    # Specs
+    # --------------------------------------------------
+    def put_spec(self, chart_id, spec, fmt):
+
+        payload = json.dumps({
+            "plot_type": spec["plot_type"],
+            "columns": list(spec["columns"]),
+            "filters": [list(f) for f in spec["filters"]],
+            "ranges": [list(r) for r in spec.get("ranges", ())],
+        })
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO charts "
+                "(chart_id, dataset_version, format, spec, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chart_id, self.dataset_version, fmt, payload, time.time()),
+            )
+            self._db.commit()
+
+    def get_spec(self, chart_id):
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT spec, format FROM charts WHERE chart_id = ? AND dataset_version = ?",
+                (chart_id, self.dataset_version),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        spec = json.loads(row[0])
+
+        return {
+            "plot_type": spec["plot_type"],
+            "columns": tuple(spec["columns"]),
+            "filters": tuple(tuple(f) for f in spec["filters"]),
+            "ranges": tuple(tuple(r) for r in spec.get("ranges", ())),
+        }, row[1]
+
+    # --------------------------------------------------
+    # Images
+    # --------------------------------------------------
+    def get_image(self, chart_id):
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT image FROM charts "
+                "WHERE chart_id = ? AND dataset_version = ? AND image IS NOT NULL",
+                (chart_id, self.dataset_version),
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._touch((chart_id,))
+
+        self.hits += 1
+        return bytes(row[0])
+
+    def put_image(self, chart_id, image):
+
+        with self._lock:
+            self._db.execute(
+                "UPDATE charts SET image = ?, size = ?, last_used = ? WHERE chart_id = ?",
+                (image, len(image), time.time(), chart_id),
+            )
+            self._flush_touches()
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+
+        # Oldest specs go first once the entry budget is exceeded; beyond
+        # the byte budget only the images are dropped, so a chart can
+        # still be re-rendered from its spec
+        (count,) = self._db.execute("SELECT COUNT(*) FROM charts").fetchone()
+
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM charts WHERE chart_id IN ("
+                "SELECT chart_id FROM charts ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM charts").fetchone()
+
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute(
+            "SELECT chart_id, size FROM charts WHERE image IS NOT NULL ORDER BY last_used ASC"
+        ).fetchall()
+
+        victims = []
+        for chart_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((chart_id,))
+            total -= size
+
+        self._db.executemany(
+            "UPDATE charts SET image = NULL, size = 0 WHERE chart_id = ?",
+            victims,
+        )
+
+    def purge_stale(self):
+
+        # Charts of other dataset versions
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM charts WHERE dataset_version != ?",
+                (self.dataset_version,),
+            )
+            self._db.commit()
+
+        return cursor.rowcount
+
+    def invalidate(self):
+
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM charts")
+            self._db.commit()
+
+        return cursor.rowcount
+
+    def stats(self):
+
+        with self._lock:
+            entries, images, total = self._db.execute(
+                "SELECT COUNT(*), COUNT(image), COALESCE(SUM(size), 0) FROM charts"
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": entries,
+            "images": images,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
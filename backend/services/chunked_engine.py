@@ -0,0 +1,720 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backend.core.dataset import widen_float32
+from backend.services.answer_format import (
+    MAX_TOP_K,
+    NO_MATCH,
+    age_text,
+    count_text,
+    counts_lines,
+    correlation_text,
+    crosstab_text,
+    extreme_rate_text,
+    grouped_count_text,
+    grouped_statistic_text,
+    percentage_text,
+    range_condition,
+    statistic_text,
+    survival_rate_text,
+    survival_table_text,
+    top_text,
+    total_text,
+    unknown_text,
+)
+from backend.services.deterministic_engine import AGGREGATES, CUBE_OPERATIONS, SURVIVAL_TABLES
+from backend.services.filter_index import COMPARISONS, INDEX_DIMENSIONS
+from backend.services.sorted_index import interpolate
+
+logger = logging.getLogger(__name__)
+
+
+# Bins per histogram pass when selecting an order statistic, and the most
+# values a pass may collect to finish it exactly
+SELECT_BINS = 1024
+COLLECT_LIMIT = 200_000
+
+# Partial of a row group: rows, survivors, first row position, then
+# moments of the target column (non-missing count, sum, min, max, centered
+# sum of squares)
+ROWS, SURVIVED, FIRST, N, SUM, MIN, MAX, M2 = range(8)
+
+
+# ----------------------------------------------------------
+# Chunk Passes (run in worker processes, or inline)
+# ----------------------------------------------------------
+
+_WORKER_DATASET = None
+
+
+def _init_worker(dataset_dir):
+    global _WORKER_DATASET
+
+    from backend.core.dataset import Dataset
+    _WORKER_DATASET = Dataset(dataset_dir)
+
+
+def _run_in_worker(query, start, stop):
+    return _run(_WORKER_DATASET, query, start, stop)
+
+
+class _Chunk:
+
+    # Lazily read, widened columns of one row range of the dataset
+    def __init__(self, dataset, start, stop):
+        self.dataset = dataset
+        self.start = start
+        self.stop = stop
+        self.kinds = {c["name"]: c for c in dataset.manifest["columns"]}
+        self._values = {}
+
+    def raw(self, col):
+        # Values, or category codes
+        return self.dataset.array(col)[self.start:self.stop]
+
+    def values(self, col):
+
+        if col not in self._values:
+            values = self.raw(col)
+            self._values[col] = values if self.kinds[col]["kind"] == "categorical" else widen_float32(values)
+
+        return self._values[col]
+
+    def mask(self, query):
+
+        mask = np.ones(self.stop - self.start, dtype=bool)
+
+        # Categorical filters arrive as codes
+        for col, value in query["filters"]:
+            mask &= self.values(col) == value
+
+        for col, op, value in query["ranges"]:
+            mask &= COMPARISONS[op](self.values(col), value)
+
+        for col, lo, hi, bins, j in query.get("levels", ()):
+            mask &= _bins(self.values(col), lo, hi, bins) == j
+
+        return mask
+
+
+def _bins(values, lo, hi, bins):
+
+    # Same expression in every pass, so bin membership is reproducible
+    if hi == lo:
+        return np.zeros(len(values), dtype=np.int64)
+
+    with np.errstate(invalid="ignore"):
+        index = ((values - lo) / (hi - lo) * bins).astype(np.int64)
+
+    return np.clip(index, 0, bins - 1)
+
+
+def _groups_partial(chunk, mask, keys, target):
+
+    # -> {key tuple: partial row}; rows with a missing key are dropped
+    columns = {}
+
+    for i, col in enumerate(keys):
+        values = chunk.values(col)
+        if chunk.kinds[col]["kind"] == "categorical":
+            mask = mask & (values >= 0)
+        else:
+            mask = mask & ~np.isnan(values.astype(np.float64))
+        columns[i] = values
+
+    selected = int(mask.sum())
+    frame = pd.DataFrame({i: values[mask] for i, values in columns.items()} if keys else {0: np.zeros(selected, dtype=np.int8)})
+    frame["rows"] = 1
+    frame["survived"] = chunk.values("Survived")[mask] if "Survived" in chunk.kinds else 0
+    frame["row"] = np.flatnonzero(mask) + chunk.start
+    frame["v"] = chunk.values(target)[mask].astype(np.float64) if target else np.nan
+
+    grouped = frame.groupby(list(range(max(len(keys), 1))), sort=False)
+    n = grouped["v"].count()
+
+    table = pd.DataFrame({
+        ROWS: grouped["rows"].sum(),
+        SURVIVED: grouped["survived"].sum(),
+        FIRST: grouped["row"].min(),
+        N: n,
+        SUM: grouped["v"].sum(),
+        MIN: grouped["v"].min(),
+        MAX: grouped["v"].max(),
+        M2: grouped["v"].var(ddof=0).fillna(0) * n,
+    })
+
+    return {
+        (key if isinstance(key, tuple) else (key,))[:len(keys)]: row
+        for key, row in zip(table.index, table.to_numpy())
+    }
+
+
+def _run(dataset, query, start, stop):
+
+    chunk = _Chunk(dataset, start, stop)
+    mask = chunk.mask(query)
+    task = query["task"]
+
+    if task == "groups":
+        return _groups_partial(chunk, mask, query["keys"], query.get("target"))
+
+    col = query.get("column")
+    values = chunk.values(col).astype(np.float64) if col else None
+
+    if task == "hist":
+        valid = mask & ~np.isnan(values)
+        selected = values[valid]
+        index = _bins(selected, query["lo"], query["hi"], query["bins"])
+
+        counts = np.bincount(index, minlength=query["bins"])
+        mins = np.full(query["bins"], np.inf)
+        maxs = np.full(query["bins"], -np.inf)
+        np.minimum.at(mins, index, selected)
+        np.maximum.at(maxs, index, selected)
+
+        return counts, mins, maxs
+
+    if task == "collect":
+        return values[mask & ~np.isnan(values)]
+
+    if task == "top":
+        rows = np.flatnonzero(mask & ~np.isnan(values))
+        order = np.lexsort((rows, -values[rows] if query["largest"] else values[rows]))[:query["k"]]
+        ids = chunk.raw("PassengerId")[rows[order]] if "PassengerId" in chunk.kinds else None
+        return values[rows[order]], rows[order] + start, ids
+
+    if task == "comoments":
+        a = values
+        b = chunk.values(query["other"]).astype(np.float64)
+        valid = mask & ~(np.isnan(a) | np.isnan(b))
+        a, b = a[valid], b[valid]
+
+        if len(a) == 0:
+            return np.zeros(6)
+
+        ma, mb = a.mean(), b.mean()
+        return np.array([
+            len(a), ma, mb,
+            ((a - ma) ** 2).sum(), ((b - mb) ** 2).sum(), ((a - ma) * (b - mb)).sum(),
+        ])
+
+    raise ValueError(f"unknown task: {task}")
+
+
+# ----------------------------------------------------------
+# Merging
+# ----------------------------------------------------------
+
+def _merge_groups(partials):
+
+    # Moments combine pairwise (Chan et al.), so the variance stays exact
+    # however the rows were split
+    merged = {}
+
+    for partial in partials:
+        for key, row in partial.items():
+
+            if key not in merged:
+                merged[key] = row.copy()
+                continue
+
+            total = merged[key]
+            na, nb = total[N], row[N]
+            n = na + nb
+
+            if nb:
+                if na:
+                    delta = row[SUM] / nb - total[SUM] / na
+                    total[M2] += row[M2] + delta * delta * na * nb / n
+                    total[MIN] = min(total[MIN], row[MIN])
+                    total[MAX] = max(total[MAX], row[MAX])
+                else:
+                    total[M2], total[MIN], total[MAX] = row[M2], row[MIN], row[MAX]
+                total[SUM] += row[SUM]
+
+            total[N] = n
+            total[ROWS] += row[ROWS]
+            total[SURVIVED] += row[SURVIVED]
+            total[FIRST] = min(total[FIRST], row[FIRST])
+
+    return merged
+
+
+def _merge_comoments(partials):
+
+    total = np.zeros(6)
+
+    for part in partials:
+        n1, n2 = total[0], part[0]
+        if not n2:
+            continue
+        if not n1:
+            total = part.copy()
+            continue
+
+        n = n1 + n2
+        da, db = part[1] - total[1], part[2] - total[2]
+        total = np.array([
+            n,
+            total[1] + da * n2 / n,
+            total[2] + db * n2 / n,
+            total[3] + part[3] + da * da * n1 * n2 / n,
+            total[4] + part[4] + db * db * n1 * n2 / n,
+            total[5] + part[5] + da * db * n1 * n2 / n,
+        ])
+
+    return total
+
+
+# ----------------------------------------------------------
+# Engine
+# ----------------------------------------------------------
+
+class ChunkedEngine:
+
+    # Out-of-core counterpart of DeterministicEngine for datasets larger
+    # than memory: the same intents and answers, computed by streaming the
+    # memory-mapped columnar cache in row chunks. Each chunk yields a small
+    # mergeable partial (group counts, moments, co-moments, top-k
+    # candidates, histogram bins) and only partials are combined, so memory
+    # stays bounded by the chunk size. Chunks run across a process pool.
+    #
+    # Order statistics are exact: histogram passes narrow down the bin
+    # holding the k-th value until it is small enough to collect and sort.
+
+    # Answers scan the data: callers run them off the event loop
+    blocking = True
+
+    def __init__(self, dataset, chunk_rows=1_000_000, workers=2):
+
+        self.dataset = dataset
+        self.chunk_rows = max(1, chunk_rows)
+        self.workers = workers
+        self.rows = dataset.rows
+
+        self.columns = {c["name"]: c for c in dataset.manifest["columns"] if c["kind"] != "text"}
+        self.dimensions = [d for d in INDEX_DIMENSIONS if d in self.columns]
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._values = None
+
+        # ---------- Metrics ----------
+        self.queries = 0
+        self.passes = 0
+        self.chunks = 0
+
+    # --------------------------------------------------
+    # Execution
+    # --------------------------------------------------
+    def _ranges(self):
+        return [(start, min(start + self.chunk_rows, self.rows)) for start in range(0, self.rows, self.chunk_rows)]
+
+    def _executor(self):
+
+        # Answers run in threads off the event loop: one pool for all
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.dataset.directory,),
+                )
+                logger.info(f"chunked_engine_pool_started: {self.workers} workers")
+
+            return self._pool
+
+    def _map(self, query):
+
+        # One pass over the data: a partial per chunk
+        ranges = self._ranges()
+        self.passes += 1
+        self.chunks += len(ranges)
+
+        if self.workers <= 0 or len(ranges) <= 1:
+            return [_run(self.dataset, query, start, stop) for start, stop in ranges]
+
+        executor = self._executor()
+        futures = [executor.submit(_run_in_worker, query, start, stop) for start, stop in ranges]
+
+        return [future.result() for future in futures]
+
+    def warmup(self):
+
+        # Blocking: start the pool and read the filter dimensions' values
+        self.dimension_values()
+
+        if self.workers > 0 and len(self._ranges()) > 1:
+            list(self._executor().map(int, range(self.workers)))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            "rows": self.rows,
+            "chunk_rows": self.chunk_rows,
+            "workers": self.workers,
+            "queries": self.queries,
+            "passes": self.passes,
+            "chunks": self.chunks,
+        }
+
+    # --------------------------------------------------
+    # Queries
+    # --------------------------------------------------
+    def _key_value(self, col, key):
+
+        # Category codes back to values, numpy scalars to Python
+        entry = self.columns[col]
+
+        if entry["kind"] == "categorical":
+            return entry["categories"][int(key)]
+
+        key = np.asarray(key, dtype=entry["dtype"]) if entry["dtype"] != "float32" else np.float64(key)
+        return key.item()
+
+    def _groups(self, base, keys=(), target=None):
+
+        # -> {value tuple: partial row}, keys in sorted order
+        merged = _merge_groups(self._map({**base, "task": "groups", "keys": list(keys), "target": target}))
+
+        return {
+            tuple(self._key_value(col, k) for col, k in zip(keys, key)): row
+            for key, row in sorted(merged.items())
+        }
+
+    def _total(self, base, target=None):
+        row = self._groups(base, (), target).get(())
+        return row if row is not None else np.array([0, 0, 0, 0, 0.0, np.nan, np.nan, 0.0])
+
+    def dimension_values(self):
+
+        # Values of the filter dimensions, as FilterIndex would list them
+        if self._values is None:
+            values = {}
+
+            for col in self.dimensions:
+                entry = self.columns[col]
+                if entry["kind"] == "categorical":
+                    values[col] = list(entry["categories"])
+                else:
+                    values[col] = [key[0] for key in self._groups(self._base({}, ()), (col,))]
+
+            self._values = values
+
+        return self._values
+
+    def _base(self, filters, ranges):
+
+        # Picklable query for the chunk passes; categoricals compare codes
+        return {
+            "filters": [(col, self._encode(col, value)) for col, value in filters.items()],
+            "ranges": list(ranges),
+        }
+
+    def _select(self, base, col, k, lo, hi, size, count=1):
+
+        # Order statistics k .. k + count - 1 (0-based) of the selected values
+        # of col; [lo, hi] bounds all `size` of them. Fewer come back when
+        # the bin finally collected ends before k + count - 1.
+        levels = []
+        offset = 0
+
+        while lo != hi and size > COLLECT_LIMIT:
+            partials = self._map({**base, "levels": levels, "task": "hist", "column": col, "lo": lo, "hi": hi, "bins": SELECT_BINS})
+            counts = sum(p[0] for p in partials)
+            mins = np.minimum.reduce([p[1] for p in partials])
+            maxs = np.maximum.reduce([p[2] for p in partials])
+
+            cumulative = np.cumsum(counts)
+            j = int(np.searchsorted(cumulative, k - offset, "right"))
+
+            offset += int(cumulative[j - 1]) if j else 0
+            size = int(counts[j])
+            levels = levels + [(col, lo, hi, SELECT_BINS, j)]
+            lo, hi = mins[j], maxs[j]
+
+        if lo == hi:
+            return np.full(min(count, size - (k - offset)), lo)
+
+        values = np.sort(np.concatenate(self._map({**base, "levels": levels, "task": "collect", "column": col})))
+        return values[k - offset:k - offset + count]
+
+    def _percentile(self, base, col, q):
+
+        total = self._total(base, col)
+        n = int(total[N])
+
+        if n == 0:
+            return np.nan
+
+        position = q / 100 * (n - 1)
+        below = int(np.floor(position))
+        fraction = position - below
+
+        # Both neighbours usually fall in the same collected bin
+        values = self._select(base, col, below, total[MIN], total[MAX], n, 2 if fraction else 1)
+
+        if fraction == 0:
+            return values[0]
+
+        high = values[1] if len(values) > 1 else self._select(base, col, below + 1, total[MIN], total[MAX], n)[0]
+        return interpolate(values[0], high, fraction)
+
+    def _statistic(self, op, base, col, q=None):
+
+        if op in ("median", "percentile"):
+            return self._percentile(base, col, 50.0 if op == "median" else q)
+
+        total = self._total(base, col)
+        return self._moment(op, total)
+
+    def _moment(self, op, row):
+
+        n = row[N]
+
+        if n == 0:
+            return np.nan
+        if op == "mean":
+            return row[SUM] / n
+        if op == "std":
+            return np.sqrt(row[M2] / (n - 1)) if n > 1 else np.nan
+        if op == "max":
+            return row[MAX]
+        return row[MIN]
+
+    def _native(self, col, value):
+        # Integer columns print as integers, like the in-memory answers
+        dtype = self.columns[col]["dtype"]
+        return np.float64(value) if dtype == "float32" or np.isnan(value) else np.dtype(dtype).type(value)
+
+    def _resolve(self, ranges):
+
+        # "above the median fare": statistics over the whole column
+        resolved = []
+
+        for col, op, value in ranges:
+            if isinstance(value, str):
+                base = self._base({}, ())
+                value = self._percentile(base, col, 50.0) if value == "median" else self._moment("mean", self._total(base, col))
+            resolved.append((col, op, value))
+
+        return resolved
+
+    # --------------------------------------------------
+    # Answers
+    # --------------------------------------------------
+    def _supports(self, filters):
+
+        values = self.dimension_values()
+        return all(col in values and val in values[col] for col, val in filters.items())
+
+    def handle(self, intent):
+
+        op = intent.operation
+
+        if op is None:
+            return None
+
+        filters = intent.filter_dict
+
+        if not self._supports(filters):
+            return None
+
+        self.queries += 1
+        ranges = self._resolve(intent.ranges)
+        base = self._base(filters, ranges)
+
+        # Same split as DeterministicEngine: cube semantics where it would
+        # answer from the cube, row-mask semantics elsewhere
+        cube = not (
+            ranges
+            or op not in CUBE_OPERATIONS
+            or (op in AGGREGATES and len(intent.columns) > 1)
+            or (op in SURVIVAL_TABLES and filters)
+        )
+
+        if cube:
+            return self._handle_cube(intent, filters, base)
+
+        return self._handle_masked(intent, filters, base, range_condition(ranges))
+
+    def _counts_text(self, groups, first_seen=False):
+
+        # Ties keep value order, or order of first appearance like
+        # value_counts on the whole column
+        if first_seen:
+            groups = dict(sorted(groups.items(), key=lambda item: item[1][FIRST]))
+
+        counts = pd.Series({key[0]: int(row[ROWS]) for key, row in groups.items()})
+        counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+        return counts_lines(counts)
+
+    def _rates(self, base, col):
+        return pd.Series({
+            key[0]: row[SURVIVED] / row[ROWS] if row[ROWS] else np.nan
+            for key, row in self._groups(base, (col,)).items()
+        })
+
+    def _handle_cube(self, intent, filters, base):
+
+        op = intent.operation
+        cols = intent.columns
+
+        if op == "grouped_count":
+            col = cols[0]
+
+            # Counts per value of a filter dimension come from the cube, where
+            # that value replaces any filter on the same column
+            if col in self.dimensions and filters:
+                base = self._base({k: v for k, v in filters.items() if k != col}, ())
+                text = self._counts_text(self._groups(base, (col,)))
+            else:
+                first_seen = col not in self.dimensions or self.columns[col]["kind"] != "categorical"
+                text = self._counts_text(self._groups(base, (col,)), first_seen)
+
+            return grouped_count_text(col, text, ports=col == "Embarked" and not filters)
+
+        if op == "count":
+            if filters:
+                return count_text(int(self._total(base)[ROWS]))
+            return total_text(self.rows)
+
+        if op == "percentage":
+            return percentage_text(int(self._total(base)[ROWS]), self.rows, filters)
+
+        if op == "mean":
+            col = cols[0]
+            return statistic_text("mean", col, None, f"{self._moment('mean', self._total(base, col)):.2f}")
+
+        if op in ("max", "min"):
+            col = cols[0]
+            value = self._native(col, self._moment(op, self._total(base, col)))
+            return statistic_text(op, col, None, value)
+
+        if op == "group_survival_rate":
+            col = cols[0]
+            return survival_table_text(col, self._rates(base, col))
+
+        if op in ("highest_survival_rate", "lowest_survival_rate"):
+            return extreme_rate_text(op, cols[0], self._rates(base, cols[0]))
+
+        if op in ("oldest", "youngest"):
+            age = self._native("Age", self._moment("max" if op == "oldest" else "min", self._total(base, "Age")))
+            return age_text(op, age)
+
+        return None
+
+    def _handle_masked(self, intent, filters, base, condition):
+
+        op = intent.operation
+        cols = intent.columns
+        selected = int(self._total(base)[ROWS])
+
+        if op == "count":
+            return count_text(selected)
+
+        if op == "percentage":
+            return percentage_text(selected, self.rows, filters, condition)
+
+        if selected == 0:
+            return NO_MATCH
+
+        if op == "grouped_count":
+            return grouped_count_text(cols[0], self._counts_text(self._groups(base, (cols[0],))), condition=condition)
+
+        if op in AGGREGATES:
+            col = cols[0]
+
+            if len(cols) == 1:
+                value = self._statistic(op, base, col, intent.param)
+                if np.isnan(value):
+                    return unknown_text(col)
+                return statistic_text(op, col, intent.param, self._statistic_text(op, col, value), condition)
+
+            # Moments of every group come from one pass; order statistics
+            # select within each group in turn
+            groups = self._groups(base, (cols[1],), col)
+            lines = []
+
+            for key, row in groups.items():
+                if op in ("median", "percentile"):
+                    group = {**base, "filters": base["filters"] + [(cols[1], self._encode(cols[1], key[0]))]}
+                    stat = self._statistic(op, group, col, intent.param)
+                else:
+                    stat = self._moment(op, row)
+                if not np.isnan(stat):
+                    lines.append(f"{key[0]}: {self._statistic_text(op, col, stat)}")
+
+            return grouped_statistic_text(op, col, intent.param, cols[1], lines, condition)
+
+        if op in ("top_k", "bottom_k"):
+            col, k = cols[0], int(intent.param)
+            partials = self._map({**base, "task": "top", "column": col, "k": min(k, MAX_TOP_K), "largest": op == "top_k"})
+            values = np.concatenate([p[0] for p in partials])
+            rows = np.concatenate([p[1] for p in partials])
+            ids = [p[2] for p in partials]
+            ids = np.concatenate(ids) if ids[0] is not None else None
+            order = np.lexsort((rows, -values if op == "top_k" else values))[:min(k, MAX_TOP_K)]
+
+            return top_text(op, col, k, [
+                (self._native(col, values[i]), ids[i] if ids is not None else None)
+                for i in order
+            ], condition)
+
+        if op in ("oldest", "youngest"):
+            age = self._native("Age", self._moment("max" if op == "oldest" else "min", self._total(base, "Age")))
+            return age_text(op, age, condition)
+
+        if op == "corr":
+            n, _, _, caa, cbb, cab = _merge_comoments(
+                self._map({**base, "task": "comoments", "column": cols[0], "other": cols[1]})
+            )
+
+            if n < 3 or caa == 0 or cbb == 0:
+                return correlation_text(cols[0], cols[1], None)
+
+            return correlation_text(cols[0], cols[1], float(cab / np.sqrt(caa * cbb)))
+
+        if op == "survival_rate":
+            total = self._total(base)
+            return survival_rate_text(int(total[SURVIVED]), int(total[ROWS]), condition)
+
+        if op in SURVIVAL_TABLES:
+            col = cols[0]
+            rates = self._rates(base, col)
+
+            if op != "group_survival_rate":
+                return extreme_rate_text(op, col, rates, condition)
+
+            return survival_table_text(col, rates, condition)
+
+        if op in ("crosstab_count", "crosstab_survival_rate"):
+            rows, columns = cols
+
+            return crosstab_text(op, rows, columns, [
+                (row_value, col_value, int(row[ROWS]), row[SURVIVED])
+                for (row_value, col_value), row in self._groups(base, (rows, columns)).items()
+            ], condition)
+
+        return None
+
+    def _encode(self, col, value):
+        entry = self.columns[col]
+        return entry["categories"].index(value) if entry["kind"] == "categorical" else value
+
+    def _statistic_text(self, op, col, value):
+
+        if op in ("max", "min"):
+            return f"{self._native(col, value)}"
+
+        return f"{value:.2f}"
@@ -0,0 +1,358 @@
+import ast
+import asyncio
+import logging
+import math
+import multiprocessing
+import resource
+import signal
+from contextlib import redirect_stdout
+from io import StringIO
+
+logger = logging.getLogger(__name__)
+
+
+# Observations longer than this are cut before leaving the worker: the
+# model only reads the start, and huge reprs must not cross the pipe
+MAX_OUTPUT_CHARS = 4000
+
+
+# ----------------------------------------------------------
+# Execution (runs inside worker processes)
+# ----------------------------------------------------------
+
+class CPUTimeExceeded(Exception):
+    pass
+
+
+class SandboxError(Exception):
+    pass
+
+
+def _on_sigxcpu(signum, frame):
+    raise CPUTimeExceeded()
+
+
+def _load_frame(dataset_dir, frame):
+
+    if dataset_dir is not None:
+        from backend.core.dataset import Dataset
+        return Dataset(dataset_dir).full_frame()
+
+    return frame
+
+
+def _limit_memory(memory_bytes):
+
+    if not memory_bytes:
+        return
+
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_bytes = min(memory_bytes, hard)
+
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, hard))
+
+
+def _limit_cpu(seconds):
+
+    # RLIMIT_CPU counts the whole process, so each call's limit is set
+    # relative to the CPU time already used; None lifts it again
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + seconds)
+
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def run_code(code, df):
+
+    # Same contract as LangChain's python_repl_ast tool: run every
+    # statement, return the value of the last expression (or what was
+    # printed), errors as "<Type>: <message>". Each call gets a fresh
+    # namespace over a shallow copy of the frame, so nothing one query
+    # defines or assigns leaks into the next.
+    import numpy as np
+    import pandas as pd
+
+    namespace = {"df": df.copy(deep=False), "pd": pd, "np": np}
+
+    try:
+        tree = ast.parse(code)
+        head = ast.unparse(ast.Module(tree.body[:-1], type_ignores=[]))
+        tail = ast.unparse(ast.Module(tree.body[-1:], type_ignores=[]))
+
+        exec(head, namespace)
+        buffer = StringIO()
+
+        try:
+            with redirect_stdout(buffer):
+                result = eval(tail, namespace)
+        except Exception:
+            with redirect_stdout(buffer):
+                exec(tail, namespace)
+            result = None
+
+        output = buffer.getvalue() if result is None else str(result)
+
+    except (CPUTimeExceeded, MemoryError):
+        raise
+
+    except Exception as e:
+        output = f"{type(e).__name__}: {e}"
+
+    return output[:MAX_OUTPUT_CHARS]
+
+
+def run_plan(code, slots, columns, df):
+
+    # A learned query plan: (True, reduced value) or (False, error)
+    from backend.services.query_plans import evaluate_plan
+
+    try:
+        return True, evaluate_plan(code, slots, df, columns)
+
+    except (CPUTimeExceeded, MemoryError):
+        raise
+
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def _worker_main(conn, dataset_dir, frame, memory_bytes):
+
+    # Requests are (code, cpu_seconds, plan); code None is a readiness
+    # ping, plan (slots, columns) runs code as a learned query plan
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGXCPU, _on_sigxcpu)
+
+    df = _load_frame(dataset_dir, frame)
+    _limit_memory(memory_bytes)
+
+    while True:
+
+        try:
+            code, cpu_seconds, plan = conn.recv()
+        except EOFError:
+            return
+
+        if code is None:
+            conn.send("ready")
+            continue
+
+        try:
+            _limit_cpu(cpu_seconds)
+            output = run_code(code, df) if plan is None else run_plan(code, *plan, df)
+
+        except CPUTimeExceeded:
+            output = f"TimeoutError: exceeded the {cpu_seconds:g} s CPU time limit"
+            if plan is not None:
+                output = (False, output)
+
+        except MemoryError:
+            output = "MemoryError: exceeded the sandbox memory limit"
+            if plan is not None:
+                output = (False, output)
+
+        finally:
+            _limit_cpu(None)
+
+        conn.send(output)
+
+
+# ----------------------------------------------------------
+# Pool
+# ----------------------------------------------------------
+
+class _Worker:
+
+    def __init__(self, context, dataset_dir, frame, memory_bytes):
+
+        self.conn, child = context.Pipe()
+
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child, dataset_dir, frame, memory_bytes),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+    def kill(self, wait=True):
+        # Without wait the killed process is left for the caller to reap
+        self.process.kill()
+        if wait:
+            self.process.join(1)
+        self.conn.close()
+
+
+class CodeSandbox:
+
+    # Runs agent-written pandas code in a pool of worker processes that
+    # each hold the dataset (memory-mapped from the columnar cache). Every
+    # call is limited in CPU time (RLIMIT_CPU), wall-clock time and address
+    # space (RLIMIT_AS). A call that times out, crashes its worker or is
+    # cancelled (client gone) kills that worker; a fresh one replaces it on
+    # the next call. Limit breaches come back as error observations, like
+    # any other failed command, so the agent can recover. Learned query
+    # plans are evaluated by the same workers (evaluate).
+
+    def __init__(self, dataset_dir=None, frame=None, workers=2, cpu_seconds=10.0, timeout=15.0, memory_mb=1024):
+
+        self.dataset_dir = dataset_dir
+        self.frame = None if dataset_dir is not None else frame
+        self.workers = max(1, workers)
+        self.cpu_seconds = cpu_seconds
+        self.timeout = timeout
+        self.memory_bytes = int(memory_mb * 2**20) if memory_mb else 0
+
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._busy = set()
+        self._slots = asyncio.Semaphore(self.workers)
+
+        # ---------- Metrics ----------
+        self.calls = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.cancelled = 0
+        self.replaced = 0
+
+    def _spawn(self):
+        return _Worker(self._context, self.dataset_dir, self.frame, self.memory_bytes)
+
+    def warmup(self):
+
+        # Blocking: start every worker and wait until each holds the frame
+        started = [self._spawn() for _ in range(self.workers - len(self._idle))]
+
+        for worker in started:
+            worker.conn.send((None, None, None))
+            worker.conn.recv()
+
+        self._idle.extend(started)
+
+    # --------------------------------------------------
+    # Execution
+    # --------------------------------------------------
+    async def _receive(self, conn):
+
+        # Waits on the pipe without tying up a thread
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = conn.fileno()
+
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+
+        try:
+            await readable
+        finally:
+            loop.remove_reader(fd)
+
+        return conn.recv()
+
+    def _discard(self, worker):
+
+        # Called on the event loop: SIGKILL returns at once, and the dead
+        # process is reaped on a thread instead of joined here
+        self.replaced += 1
+        self._busy.discard(worker)
+        worker.kill(wait=False)
+        asyncio.get_running_loop().run_in_executor(None, worker.process.join, 1)
+
+    async def run(self, code: str):
+
+        try:
+            return await self._call(code, None)
+
+        except asyncio.TimeoutError:
+            return f"TimeoutError: exceeded the {self.timeout:g} s time limit"
+
+        except (EOFError, OSError):
+            return "RuntimeError: the command crashed its worker process"
+
+    async def evaluate(self, code: str, slots, columns):
+
+        # A learned query plan (see query_plans.evaluate_plan) under the same
+        # limits as agent commands; failures raise SandboxError
+        try:
+            ok, value = await self._call(code, (slots, list(columns)))
+
+        except asyncio.TimeoutError:
+            raise SandboxError(f"TimeoutError: exceeded the {self.timeout:g} s time limit")
+
+        except (EOFError, OSError):
+            raise SandboxError("RuntimeError: the plan crashed its worker process")
+
+        if not ok:
+            raise SandboxError(value)
+
+        return value
+
+    async def _call(self, code, plan):
+
+        await self._slots.acquire()
+
+        worker = self._idle.pop() if self._idle else self._spawn()
+        self._busy.add(worker)
+        self.calls += 1
+
+        try:
+            worker.conn.send((code, self.cpu_seconds, plan))
+            output = await asyncio.wait_for(self._receive(worker.conn), self.timeout)
+
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._discard(worker)
+            logger.warning("sandbox_timeout")
+            raise
+
+        except (EOFError, OSError):
+            self.crashes += 1
+            self._discard(worker)
+            logger.error("sandbox_worker_crashed")
+            raise
+
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            self._discard(worker)
+            raise
+
+        except BaseException:
+            self._discard(worker)
+            raise
+
+        else:
+            self._busy.discard(worker)
+            self._idle.append(worker)
+            return output
+
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "idle": len(self._idle),
+            "busy": len(self._busy),
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "cancelled": self.cancelled,
+            "replaced": self.replaced,
+        }
+
+    def shutdown(self):
+
+        for worker in self._idle + list(self._busy):
+            worker.kill()
+
+        self._idle = []
+        self._busy = set()
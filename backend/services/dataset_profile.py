@@ -0,0 +1,70 @@
+import pandas as pd
+
+from backend.core.dataset import widen_float32
+
+
+# Columns with at most this many distinct values get full value counts and,
+# when the target column exists, a survival-rate table
+MAX_CATEGORIES = 10
+
+TARGET = "Survived"
+
+
+def _table(frame):
+    return frame.to_string()
+
+
+def _round(values):
+    return widen_float32(values).round(2)
+
+
+def build_profile(df, max_categories=MAX_CATEGORIES, target=TARGET):
+
+    # Compact text summary of the full dataset, written into the LLM prompt
+    # so most questions need no exploratory tool calls (head(), dtypes,
+    # describe(), value_counts()). Built once per agent, a few KB of text.
+    sections = [f"Rows: {len(df)}"]
+
+    # ---------- Schema ----------
+    schema = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "non_null": df.notna().sum(),
+        "unique": df.nunique(),
+    })
+    sections.append("Columns:\n" + _table(schema))
+
+    # ---------- Numeric Summary ----------
+    numeric = df.select_dtypes("number")
+
+    if not numeric.empty:
+        summary = numeric.apply(_round).describe().T.round(2)
+        sections.append("Numeric summary:\n" + _table(summary))
+
+    # ---------- Value Counts ----------
+    categorical = [
+        col for col in df.columns
+        if df[col].nunique() <= max_categories
+    ]
+
+    for col in categorical:
+        counts = df[col].value_counts(dropna=False).sort_index()
+        sections.append(f"Value counts of {col}:\n" + _table(counts.to_frame("count")))
+
+    # ---------- Target Rates ----------
+    if target in df.columns:
+
+        for col in categorical:
+            if col == target:
+                continue
+
+            rates = df.groupby(col, observed=True)[target].agg(["mean", "count"])
+            rates["mean"] = (rates["mean"] * 100).round(2)
+            rates.columns = [f"{target.lower()}_rate_pct", "count"]
+            sections.append(f"{target} rate by {col}:\n" + _table(rates))
+
+        # The interaction most questions ask about
+        if "Sex" in categorical and "Pclass" in categorical:
+            rates = (df.groupby(["Sex", "Pclass"], observed=True)[target].mean() * 100).round(2).unstack()
+            sections.append(f"{target} rate (%) by Sex and Pclass:\n" + _table(rates))
+
+    return "\n\n".join(sections)
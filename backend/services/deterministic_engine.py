@@ -1,172 +1,528 @@
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from backend.core.dataset import widen_float32
+from backend.services.answer_format import (
+    MAX_TOP_K,
+    NO_MATCH,
+    age_text,
+    count_text,
+    counts_lines,
+    correlation_text,
+    crosstab_text,
+    extreme_rate_text,
+    grouped_count_text,
+    grouped_statistic_text,
+    percentage_text,
+    range_condition,
+    statistic_text,
+    survival_rate_text,
+    survival_table_text,
+    top_text,
+    total_text,
+    unknown_text,
+)
+from backend.services.filter_index import FilterIndex, range_mask, resolve_ranges
+from backend.services.sorted_index import SortedIndex
+
+
+# Statistics over the selected rows of one numeric column (NaN-free input)
+AGGREGATES = {
+    "mean": lambda values, q: values.mean(),
+    "median": lambda values, q: np.median(values),
+    "std": lambda values, q: values.std(ddof=1) if len(values) > 1 else np.nan,
+    "percentile": lambda values, q: np.percentile(values, q),
+    "max": lambda values, q: values.max(),
+    "min": lambda values, q: values.min(),
+}
+
+# Operations answered from the aggregate cube when there are no ranges
+CUBE_OPERATIONS = {
+    "grouped_count", "count", "percentage", "mean", "max", "min",
+    "group_survival_rate", "highest_survival_rate", "lowest_survival_rate",
+    "oldest", "youngest",
+}
+
+SURVIVAL_TABLES = {"group_survival_rate", "highest_survival_rate", "lowest_survival_rate"}
+
+
+def answer_columns(key):
+
+    # Columns a deterministic answer reads, from its intent key: the answer
+    # holds for any dataset version with the same rows in these columns
+    operation, columns, filters, ranges, _, _ = key
+    used = set(columns) | {col for col, _ in filters} | {col for col, _, _ in ranges}
+
+    if operation in SURVIVAL_TABLES or operation in ("survival_rate", "crosstab_survival_rate"):
+        used.add("Survived")
+    if operation in ("oldest", "youngest"):
+        used.add("Age")
+    if operation in ("top_k", "bottom_k"):
+        used.add("PassengerId")
+
+    return used
+
+
 class DeterministicEngine:
 
-    def __init__(self, df):
+    # Answers come from in-memory indexes: cheap enough for the event loop
+    blocking = False
+
+    def __init__(self, df, previous=None, changed=()):
+
+        # previous: the engine of the last dataset version, whose indexes
+        # are kept for every column not in `changed` (see FilterIndex)
         self.df = df
+        self.index = FilterIndex(df, previous=previous.index if previous is not None else None, changed=changed)
 
-    def handle(self, question: str):
+        # Grouped tables are built on first use and reused afterwards
+        self._grouped_answers = {}
 
-        q = question.lower().strip()
-        tokens = q.replace(",", "").split()
+        # Widened numpy columns and per-value group masks for the
+        # vectorized (non-cube) path
+        self._arrays = {}
+        self._groups = {}
 
-        filters = {}
+        # Sorted orders of the numeric columns for range counts, order
+        # statistics and top-k without scanning
+        kept = previous.sorted if previous is not None and self.index.reused else None
 
-        # ====================================================
-        # 1️⃣ FILTER DETECTION
-        # ====================================================
+        self.sorted = SortedIndex(
+            self.index,
+            {
+                col: self._array(col) for col in self.index.numeric_columns
+                if kept is None or col in changed or not kept.supports(col)
+            },
+            columns=self.index.numeric_columns,
+            previous=kept,
+        )
 
-        if "male" in tokens:
-            filters["Sex"] = "male"
+    def _grouped(self, kind, col, build):
 
-        if "female" in tokens:
-            filters["Sex"] = "female"
+        key = (kind, col)
 
-        if "first" in tokens or "1st" in tokens:
-            filters["Pclass"] = 1
+        if key not in self._grouped_answers:
+            self._grouped_answers[key] = build()
 
-        if "second" in tokens or "2nd" in tokens:
-            filters["Pclass"] = 2
+        return self._grouped_answers[key]
 
-        if "third" in tokens or "3rd" in tokens:
-            filters["Pclass"] = 3
+    def handle(self, intent):
 
-        if "survived" in tokens:
-            filters["Survived"] = 1
+        op = intent.operation
 
-        if "died" in tokens or "dead" in tokens:
-            filters["Survived"] = 0
+        if op is None:
+            return None
 
-        df_filtered = self.df.copy()
+        filters = intent.filter_dict
 
-        for col, val in filters.items():
-            df_filtered = df_filtered[df_filtered[col] == val]
+        if not self.index.supports(filters):
+            return None
 
-        # ====================================================
-        # 2️⃣ GROUPED LOGIC (MUST BE BEFORE TOTAL COUNT)
-        # ====================================================
+        if intent.ranges:
+            intent = replace(intent, ranges=resolve_ranges(intent.ranges, self._reference_statistic))
 
-        # Embarked grouped count (most common failure case)
-        if "embarked" in q and ("how many" in q or "number" in q):
-            counts = self.df["Embarked"].value_counts()
-            result = "\n".join(
-                f"{k}: {v}" for k, v in counts.items()
-            )
-            return f"Passengers embarked from each port:\n{result}"
-
-        # Generic grouped count (How many by X)
-        if ("how many" in q or "number" in q) and "by" in q:
-            for col in self.df.columns:
-                if col.lower() in q:
-                    counts = self.df[col].value_counts()
-                    result = "\n".join(
-                        f"{k}: {v}" for k, v in counts.items()
-                    )
-                    return f"Passenger count by {col}:\n{result}"
+        # Binary searches over the sorted indexes where they apply
+        answer = self._handle_sorted(intent, filters)
+
+        if answer is not None:
+            return answer
+
+        # Range conditions, grouped statistics, filtered survival tables
+        # and the newer statistics need row masks
+        if (
+            intent.ranges
+            or op not in CUBE_OPERATIONS
+            or (op in AGGREGATES and len(intent.columns) > 1)
+            or (op in SURVIVAL_TABLES and filters)
+        ):
+            return self._handle_masked(intent, filters)
+
+        # Filtered statistics come straight from the precomputed cube
+        cell = self.index.cell(filters)
 
         # ====================================================
-        # 3️⃣ FILTERED COUNT
+        # 1️⃣ GROUPED COUNT (MUST BE BEFORE TOTAL COUNT)
         # ====================================================
 
-        if ("how many" in q or "number" in q) and filters:
-            count = len(df_filtered)
-            return f"There were {count} passengers matching the criteria."
+        if op == "grouped_count":
+            col = intent.columns[0]
+
+            if not filters:
+                return self._grouped(
+                    "count", col,
+                    lambda: grouped_count_text(col, self._value_counts_text(col), ports=col == "Embarked"),
+                )
+
+            return grouped_count_text(col, self._filtered_counts_text(col, filters))
 
         # ====================================================
-        # 4️⃣ SIMPLE TOTAL COUNT (LOW PRIORITY)
+        # 2️⃣ FILTERED / TOTAL COUNT
         # ====================================================
 
-        if "how many passengers" in q and not filters:
-            return f"There were {len(self.df)} passengers in total."
+        if op == "count":
+            if filters:
+                return count_text(cell["count"])
+            return total_text(self.index.n_rows)
 
         # ====================================================
-        # 5️⃣ PERCENTAGE
+        # 3️⃣ PERCENTAGE
         # ====================================================
 
-        if "percentage" in q and filters:
-            total = len(self.df)
-            count = len(df_filtered)
-            pct = (count / total) * 100
-            return f"{pct:.2f}% of passengers match the given criteria."
-
-        if "percentage" in q and ("male" in q or "female" in q):
-            gender = "male" if "male" in q else "female"
-            count = len(self.df[self.df["Sex"] == gender])
-            total = len(self.df)
-            pct = (count / total) * 100
-            return f"{pct:.2f}% of passengers were {gender}."
+        if op == "percentage":
+            return percentage_text(cell["count"], self.index.n_rows, filters)
 
         # ====================================================
-        # 6️⃣ NUMERIC OPERATIONS
+        # 4️⃣ NUMERIC OPERATIONS
         # ====================================================
 
-        numeric_columns = self.df.select_dtypes(include="number").columns
+        if op == "mean":
+            col = intent.columns[0]
+            return statistic_text("mean", col, None, f"{cell['mean'][col]:.2f}")
 
-        if "average" in q or "mean" in q:
-            for col in numeric_columns:
-                if col.lower() in q:
-                    avg = df_filtered[col].mean()
-                    return f"The average {col} was {avg:.2f}."
+        if op == "max":
+            col = intent.columns[0]
+            return statistic_text("max", col, None, cell["max"][col])
 
-        if "maximum" in q or "max" in q:
-            for col in numeric_columns:
-                if col.lower() in q:
-                    val = df_filtered[col].max()
-                    return f"The maximum {col} was {val}."
-
-        if "minimum" in q or "min" in q:
-            for col in numeric_columns:
-                if col.lower() in q:
-                    val = df_filtered[col].min()
-                    return f"The minimum {col} was {val}."
+        if op == "min":
+            col = intent.columns[0]
+            return statistic_text("min", col, None, cell["min"][col])
 
         # ====================================================
-        # 7️⃣ SURVIVAL RATE
+        # 5️⃣ SURVIVAL RATE
         # ====================================================
 
-        if "survival rate" in q and "by" in q:
-            for col in self.df.columns:
-                if col.lower() in q:
-                    rates = (
-                        self.df.groupby(col)["Survived"]
-                        .mean() * 100
-                    )
-                    result = "\n".join(
-                        f"{k}: {v:.2f}%"
-                        for k, v in rates.items()
-                    )
-                    return f"Survival rate by {col}:\n{result}"
-
-        if "highest" in q and "survival rate" in q:
-            rates = (
-                self.df.groupby("Pclass")["Survived"]
-                .mean()
-                .sort_values(ascending=False)
-            )
-            top_class = rates.index[0]
-            top_rate = rates.iloc[0] * 100
-            return f"Class {top_class} had the highest survival rate at {top_rate:.2f}%."
-
-        if "lowest" in q and "survival rate" in q:
-            rates = (
-                self.df.groupby("Pclass")["Survived"]
-                .mean()
-                .sort_values()
+        if op == "group_survival_rate":
+            col = intent.columns[0]
+            return self._grouped(
+                "survival_rate", col,
+                lambda: survival_table_text(col, self._survival_rates(col)),
             )
-            bottom_class = rates.index[0]
-            bottom_rate = rates.iloc[0] * 100
-            return f"Class {bottom_class} had the lowest survival rate at {bottom_rate:.2f}%."
+
+        if op in ("highest_survival_rate", "lowest_survival_rate"):
+            col = intent.columns[0]
+            return extreme_rate_text(op, col, self._survival_rates(col))
 
         # ====================================================
-        # 8️⃣ AGE SPECIAL
+        # 6️⃣ AGE SPECIAL
         # ====================================================
 
-        if "oldest" in q:
-            return f"The oldest passenger was {df_filtered['Age'].max()} years old."
+        if op == "oldest":
+            return age_text(op, cell["max"]["Age"])
 
-        if "youngest" in q:
-            return f"The youngest passenger was {df_filtered['Age'].min()} years old."
+        if op == "youngest":
+            return age_text(op, cell["min"]["Age"])
 
         # ====================================================
         # NOTHING MATCHED
         # ====================================================
 
-        return None
\ No newline at end of file
+        return None
+
+    # --------------------------------------------------
+    # Sorted Path
+    # --------------------------------------------------
+    def _reference_statistic(self, col, name):
+
+        if name == "mean":
+            return self.index.cell({})["mean"][col]
+
+        if self.sorted.supports(col):
+            return self.sorted.percentile(col, 50)
+
+        return np.nanmedian(self._array(col))
+
+    def _native(self, col, value):
+        # Order statistics come back as float64; ints print as ints
+        return self._array(col).dtype.type(value)
+
+    def _top_text(self, op, col, k, ranked, condition):
+
+        ids = self.df["PassengerId"].to_numpy() if "PassengerId" in self.df.columns else None
+
+        return top_text(op, col, k, [
+            (self._native(col, value), ids[row] if ids is not None else None)
+            for value, row in ranked
+        ], condition)
+
+    def _handle_sorted(self, intent, filters):
+
+        # Questions over one indexed numeric column (ranges on that column,
+        # any categorical filters); anything else returns None and takes
+        # the masked path
+        op = intent.operation
+        cols = intent.columns
+        ranges = intent.ranges
+        ranged = {col for col, _, _ in ranges}
+        condition = range_condition(ranges)
+
+        if len(ranged) > 1 or not all(self.sorted.supports(col) for col in ranged):
+            return None
+
+        ranged = next(iter(ranged), None)
+
+        # ---------- Range Counts ----------
+        if ranged and op in ("count", "percentage"):
+            n = self.sorted.count(ranged, filters, ranges)
+
+            if op == "count":
+                return count_text(n)
+            return percentage_text(n, self.index.n_rows, filters, condition)
+
+        if ranged and op == "grouped_count" and cols[0] in self.index.values and cols[0] not in filters:
+            col = cols[0]
+            counts = pd.Series({
+                value: self.sorted.count(ranged, {**filters, col: value}, ranges)
+                for value in self.index.values[col]
+            })
+            counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+            if counts.empty:
+                return NO_MATCH
+
+            return grouped_count_text(col, counts_lines(counts), condition=condition)
+
+        # ---------- Single-Column Statistics ----------
+        target = "Age" if op in ("oldest", "youngest") else (cols[0] if cols else None)
+
+        if target is None or not self.sorted.supports(target) or ranged not in (None, target):
+            return None
+
+        if op in ("top_k", "bottom_k"):
+            k = int(intent.param)
+            ranked = self.sorted.top(target, min(k, MAX_TOP_K), filters, ranges, largest=op == "top_k")
+            return self._top_text(op, target, k, ranked, condition)
+
+        if op in ("median", "percentile"):
+            q = 50.0 if op == "median" else intent.param
+
+            if len(cols) == 1:
+                value = self.sorted.percentile(target, q, filters, ranges)
+                if np.isnan(value):
+                    if ranges or self.index.cell(filters)["count"] == 0:
+                        return NO_MATCH
+                    return unknown_text(target)
+                return statistic_text(op, target, q, f"{value:.2f}", condition)
+
+            group = cols[1]
+            if group not in self.index.values or group in filters:
+                return None
+
+            lines = []
+            for value in self.index.values[group]:
+                stat = self.sorted.percentile(target, q, {**filters, group: value}, ranges)
+                if not np.isnan(stat):
+                    lines.append(f"{value}: {stat:.2f}")
+
+            if not lines:
+                return NO_MATCH
+
+            return grouped_statistic_text(op, target, q, group, lines, condition)
+
+        if ranged and op in ("max", "min", "oldest", "youngest") and len(cols) == 1:
+            n = self.sorted.count(target, filters, ranges)
+
+            if n == 0:
+                return NO_MATCH
+
+            value = self._native(target, self.sorted.kth(target, n - 1 if op in ("max", "oldest") else 0, filters, ranges))
+
+            if op in ("oldest", "youngest"):
+                return age_text(op, value, condition)
+            return statistic_text(op, target, None, value, condition)
+
+        return None
+
+    # --------------------------------------------------
+    # Masked Path
+    # --------------------------------------------------
+    def _array(self, col):
+
+        if col not in self._arrays:
+            self._arrays[col] = widen_float32(self.df[col].to_numpy())
+
+        return self._arrays[col]
+
+    def _group_masks(self, col):
+
+        # [(value, row mask)] in category order; indexed dimensions reuse
+        # the bitmaps of the filter index
+        if col not in self._groups:
+
+            if col in self.index.bitmaps:
+                groups = list(self.index.bitmaps[col].items())
+            else:
+                values = pd.Series(self._array(col))
+                codes, uniques = pd.factorize(values, sort=True)
+                groups = [(u.item() if hasattr(u, "item") else u, codes == i) for i, u in enumerate(uniques)]
+
+            self._groups[col] = groups
+
+        return self._groups[col]
+
+    def _selection(self, intent, filters):
+
+        mask = self.index.mask(filters)
+        ranges = range_mask(self._array, intent.ranges)
+
+        return mask if ranges is None else mask & ranges
+
+    def _aggregate(self, op, col, mask, q):
+
+        values = self._array(col)[mask]
+
+        if np.issubdtype(values.dtype, np.floating):
+            values = values[~np.isnan(values)]
+
+        if len(values) == 0:
+            return np.nan
+
+        return AGGREGATES[op](values, q)
+
+    def _statistic_text(self, op, col, value):
+
+        # max/min keep the column's own precision, like the cube answers
+        if op in ("max", "min"):
+            return f"{value}"
+
+        return f"{value:.2f}"
+
+    def _rate(self, mask):
+        n = int(mask.sum())
+        return (self._array("Survived")[mask].sum() / n if n else np.nan), n
+
+    def _handle_masked(self, intent, filters):
+
+        # Every operation as a reduction over one boolean row mask
+        # (filters & range conditions), optionally split by group masks
+        op = intent.operation
+        cols = intent.columns
+        mask = self._selection(intent, filters)
+        selected = int(mask.sum())
+        condition = range_condition(intent.ranges)
+
+        if op == "count":
+            return count_text(selected)
+
+        if op == "percentage":
+            return percentage_text(selected, self.index.n_rows, filters, condition)
+
+        if selected == 0:
+            return NO_MATCH
+
+        if op == "grouped_count":
+            counts = pd.Series(widen_float32(self.df[cols[0]].to_numpy()[mask])).value_counts()
+            counts = counts.sort_index().sort_values(ascending=False, kind="stable")
+            return grouped_count_text(cols[0], counts_lines(counts), condition=condition)
+
+        if op in AGGREGATES:
+            col = cols[0]
+
+            if len(cols) == 1:
+                value = self._aggregate(op, col, mask, intent.param)
+                if np.isnan(value):
+                    return unknown_text(col)
+                return statistic_text(op, col, intent.param, self._statistic_text(op, col, value), condition)
+
+            lines = []
+            for value, group in self._group_masks(cols[1]):
+                stat = self._aggregate(op, col, mask & group, intent.param)
+                if not np.isnan(stat):
+                    lines.append(f"{value}: {self._statistic_text(op, col, stat)}")
+
+            return grouped_statistic_text(op, col, intent.param, cols[1], lines, condition)
+
+        if op in ("top_k", "bottom_k"):
+            col, k = cols[0], int(intent.param)
+            values = self._array(col).astype(np.float64)
+            rows = np.flatnonzero(mask & ~np.isnan(values))
+            order = np.lexsort((rows, -values[rows] if op == "top_k" else values[rows]))[:min(k, MAX_TOP_K)]
+            return self._top_text(op, col, k, [(values[rows[i]], rows[i]) for i in order], condition)
+
+        if op in ("oldest", "youngest"):
+            age = self._aggregate("max" if op == "oldest" else "min", "Age", mask, None)
+            return age_text(op, age, condition)
+
+        if op == "corr":
+            a, b = (self._array(c)[mask].astype(np.float64) for c in cols)
+            valid = ~(np.isnan(a) | np.isnan(b))
+            a, b = a[valid], b[valid]
+
+            if len(a) < 3 or a.std() == 0 or b.std() == 0:
+                return correlation_text(cols[0], cols[1], None)
+
+            return correlation_text(cols[0], cols[1], float(np.corrcoef(a, b)[0, 1]))
+
+        if op == "survival_rate":
+            survivors = int(self._array("Survived")[mask].sum())
+            return survival_rate_text(survivors, selected, condition)
+
+        if op in SURVIVAL_TABLES:
+            col = cols[0]
+            rates = pd.Series({
+                value: self._rate(mask & group)[0]
+                for value, group in self._group_masks(col)
+                if (mask & group).any()
+            })
+
+            if op != "group_survival_rate":
+                return extreme_rate_text(op, col, rates, condition)
+
+            return survival_table_text(col, rates, condition)
+
+        if op in ("crosstab_count", "crosstab_survival_rate"):
+            rows, columns = cols
+            survived = self._array("Survived")
+            cells = []
+
+            for row_value, row_group in self._group_masks(rows):
+                for col_value, col_group in self._group_masks(columns):
+                    cell = mask & row_group & col_group
+                    if cell.any():
+                        cells.append((row_value, col_value, int(cell.sum()), survived[cell].sum()))
+
+            return crosstab_text(op, rows, columns, cells, condition)
+
+        return None
+
+    # --------------------------------------------------
+    # Grouped Tables
+    # --------------------------------------------------
+    def _value_counts_text(self, col):
+        counts = self.df[col].value_counts()
+        counts.index = widen_float32(counts.index)
+        return counts_lines(counts)
+
+    def _filtered_counts_text(self, col, filters):
+
+        if col in self.index.values:
+            counts = pd.Series({
+                value: self.index.cell({**filters, col: value})["count"]
+                for value in self.index.values[col]
+            })
+            counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+        else:
+            counts = self.df.loc[self.index.mask(filters), col].value_counts()
+            counts.index = widen_float32(counts.index)
+
+        return counts_lines(counts)
+
+    def _survival_rates(self, col):
+
+        # Indexed dimensions read the per-value cells of the cube
+        if col in self.index.values:
+            return self._grouped(
+                "rates", col,
+                lambda: pd.Series({
+                    value: self.index.cell({col: value})["survival_rate"]
+                    for value in self.index.values[col]
+                }).rename_axis(col),
+            )
+
+        def build():
+            rates = self.df.groupby(col)["Survived"].mean()
+            rates.index = pd.Index(widen_float32(rates.index), name=col)
+            return rates
+
+        return self._grouped("rates", col, build)
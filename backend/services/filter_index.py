@@ -0,0 +1,261 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from backend.core.dataset import widen_float32
+
+
+INDEX_DIMENSIONS = ["Sex", "Pclass", "Survived", "Embarked"]
+
+# Range conditions parsed from questions, as (column, op, value)
+COMPARISONS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+
+
+def resolve_ranges(ranges, statistic):
+
+    # "above the median fare": statistic(col, name) turns the parsed
+    # reference ("median" / "mean") into a number over the whole column
+    return tuple(
+        (col, op, statistic(col, value) if isinstance(value, str) else value)
+        for col, op, value in ranges
+    )
+
+
+def range_mask(values, ranges):
+
+    # values(col) returns the widened numpy column; missing values never match
+    result = None
+
+    for col, op, value in ranges:
+        match = COMPARISONS[op](values(col), value)
+        result = match if result is None else result & match
+
+    return result
+
+
+def _to_python(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+class FilterIndex:
+
+    def __init__(self, df, dimensions=None, previous=None, changed=()):
+
+        self.n_rows = len(df)
+        self.dimensions = [
+            d for d in (dimensions or INDEX_DIMENSIONS)
+            if d in df.columns
+        ]
+        self.numeric_columns = list(df.select_dtypes(include="number").columns)
+
+        # The index of a previous dataset version over the same rows, with
+        # none of the dimensions in `changed`, lends its codes, bitmaps and
+        # cell layout, and the partial aggregates of unchanged columns
+        self.reused = (
+            previous is not None
+            and previous.n_rows == self.n_rows
+            and previous.dimensions == self.dimensions
+            and not set(self.dimensions) & set(changed)
+        )
+
+        if self.reused:
+            self.values = previous.values
+            self._codes = previous._codes
+            self.bitmaps = previous.bitmaps
+
+        else:
+            # Per-dimension category values and per-row codes
+            # (missing values get their own trailing code)
+            self.values = {}
+            self._codes = {}
+
+            for col in self.dimensions:
+                cat = pd.Categorical(df[col])
+                values = [_to_python(v) for v in cat.categories]
+                codes = np.asarray(cat.codes, dtype=np.int64).copy()
+                codes[codes < 0] = len(values)
+                self.values[col] = values
+                self._codes[col] = codes
+
+            # ---------- Bitmaps ----------
+            self.bitmaps = {
+                col: {
+                    value: self._codes[col] == code
+                    for code, value in enumerate(self.values[col])
+                }
+                for col in self.dimensions
+            }
+
+        # ---------- Aggregate Cube ----------
+        self.cube = self._build_cube(df, previous if self.reused else None, changed)
+
+    # --------------------------------------------------
+    # Lookups
+    # --------------------------------------------------
+    def key(self, filters):
+        return tuple(filters.get(col) for col in self.dimensions)
+
+    def supports(self, filters):
+        return all(
+            col in self.values and val in self.values[col]
+            for col, val in filters.items()
+        )
+
+    def cell(self, filters):
+        return self.cube.get(self.key(filters))
+
+    def fine_cells(self, filters):
+
+        # Ids of the fine-grained cells (one value, or missing, per
+        # dimension) that a filter selects; rows map to them via cell_ids
+        members = [
+            [self.values[col].index(filters[col])] if col in filters else list(range(size))
+            for col, size in zip(self.dimensions, self._sizes)
+        ]
+
+        return np.array(
+            [
+                sum(c * s for c, s in zip(codes, self._strides))
+                for codes in itertools.product(*members)
+            ],
+            dtype=np.int64,
+        )
+
+    def mask(self, filters):
+
+        result = np.ones(self.n_rows, dtype=bool)
+
+        for col, val in filters.items():
+            result &= self.bitmaps[col][val]
+
+        return result
+
+    # --------------------------------------------------
+    # Cube Construction
+    # --------------------------------------------------
+    def _build_cube(self, df, previous=None, changed=()):
+
+        # One vectorized pass: every row maps to a single fine-grained cell,
+        # partial aggregates are computed per cell, then rolled up into every
+        # (value | any) combination of the dimensions.
+        sizes = [len(self.values[col]) + 1 for col in self.dimensions]
+        n_cells = int(np.prod(sizes)) if sizes else 1
+
+        if previous is not None:
+            cell_ids, strides = previous.cell_ids, previous._strides
+
+        else:
+            cell_ids = np.zeros(self.n_rows, dtype=np.int64)
+            stride = 1
+            strides = []
+            for col, size in zip(self.dimensions, sizes):
+                cell_ids += self._codes[col] * stride
+                strides.append(stride)
+                stride *= size
+
+        # Kept for the sorted numeric indexes, which are segmented by cell
+        self.cell_ids = cell_ids
+        self.n_cells = n_cells
+        self._sizes = sizes
+        self._strides = strides
+
+        row_counts = np.bincount(cell_ids, minlength=n_cells)
+
+        # Only changed columns are rescanned on a reload; the roll-up
+        # below is cheap and always redone
+        kept = previous._partials if previous is not None else {}
+
+        partials = {
+            col: kept[col] if col in kept and col not in changed
+            else self._partial_aggregates(df[col].to_numpy(), cell_ids, n_cells)
+            for col in self.numeric_columns
+        }
+        self._partials = partials
+
+        cube = {}
+
+        choices = [
+            [None] + list(range(len(self.values[col])))
+            for col in self.dimensions
+        ]
+
+        for combo in itertools.product(*choices):
+
+            members = [
+                list(range(size)) if code is None else [code]
+                for code, size in zip(combo, sizes)
+            ]
+            fine = np.array(
+                [
+                    sum(c * s for c, s in zip(codes, strides))
+                    for codes in itertools.product(*members)
+                ],
+                dtype=np.int64,
+            )
+
+            key = tuple(
+                None if code is None else self.values[col][code]
+                for col, code in zip(self.dimensions, combo)
+            )
+
+            cube[key] = self._rollup(fine, row_counts, partials)
+
+        return cube
+
+    def _partial_aggregates(self, values, cell_ids, n_cells):
+
+        is_float = np.issubdtype(values.dtype, np.floating)
+
+        if is_float:
+            valid = ~np.isnan(values)
+            ids, vals = cell_ids[valid], values[valid]
+            lo_init, hi_init = np.inf, -np.inf
+        else:
+            ids, vals = cell_ids, values
+            info = np.iinfo(values.dtype)
+            lo_init, hi_init = info.max, info.min
+
+        counts = np.bincount(ids, minlength=n_cells)
+        sums = np.bincount(ids, weights=vals, minlength=n_cells)
+
+        mins = np.full(n_cells, lo_init, dtype=values.dtype)
+        maxs = np.full(n_cells, hi_init, dtype=values.dtype)
+        np.minimum.at(mins, ids, vals)
+        np.maximum.at(maxs, ids, vals)
+
+        return counts, sums, mins, maxs
+
+    def _rollup(self, fine, row_counts, partials):
+
+        cell = {
+            "count": int(row_counts[fine].sum()),
+            "mean": {},
+            "min": {},
+            "max": {},
+        }
+
+        for col, (counts, sums, mins, maxs) in partials.items():
+
+            n = counts[fine]
+            present = fine[n > 0]
+
+            if len(present) == 0:
+                cell["mean"][col] = np.float64("nan")
+                cell["min"][col] = np.float64("nan")
+                cell["max"][col] = np.float64("nan")
+                continue
+
+            cell["mean"][col] = np.float64(sums[fine].sum() / n.sum())
+            cell["min"][col] = widen_float32(mins[present].min())[()]
+            cell["max"][col] = widen_float32(maxs[present].max())[()]
+
+        if "Survived" in partials:
+            cell["survival_rate"] = cell["mean"]["Survived"]
+
+        return cell
@@ -0,0 +1,619 @@
+import re
+from dataclasses import dataclass
+
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(question: str) -> str:
+    return _NON_WORD.sub(" ", question.lower()).strip()
+
+
+# ----------------------------------------------------------
+# Vocabulary
+# ----------------------------------------------------------
+
+FILTER_WORDS = {
+    "male": ("Sex", "male"),
+    "males": ("Sex", "male"),
+    "man": ("Sex", "male"),
+    "men": ("Sex", "male"),
+    "female": ("Sex", "female"),
+    "females": ("Sex", "female"),
+    "woman": ("Sex", "female"),
+    "women": ("Sex", "female"),
+    "first": ("Pclass", 1),
+    "1st": ("Pclass", 1),
+    "second": ("Pclass", 2),
+    "2nd": ("Pclass", 2),
+    "third": ("Pclass", 3),
+    "3rd": ("Pclass", 3),
+    "cherbourg": ("Embarked", "C"),
+    "queenstown": ("Embarked", "Q"),
+    "southampton": ("Embarked", "S"),
+    "survived": ("Survived", 1),
+    "survivors": ("Survived", 1),
+    "died": ("Survived", 0),
+    "dead": ("Survived", 0),
+    "perished": ("Survived", 0),
+}
+
+# Port codes are single letters, so they only filter right after "from" or
+# "embarked" ("embarked from S", "embarked at C")
+PORT_CODES = {
+    "s": ("Embarked", "S"),
+    "c": ("Embarked", "C"),
+    "q": ("Embarked", "Q"),
+}
+PORT_CODE_WORDS = {"from", "embarked"}
+
+COLUMN_ALIASES = {
+    "class": "Pclass",
+    "classes": "Pclass",
+    "gender": "Sex",
+    "genders": "Sex",
+    "port": "Embarked",
+    "ports": "Embarked",
+}
+
+COUNT_WORDS = {"number", "count"}
+GROUP_WORDS = {"by", "per", "each"}
+PERCENT_WORDS = {"percentage", "percent"}
+MEAN_WORDS = {"average", "mean", "avg"}
+MAX_WORDS = {"maximum", "max"}
+MIN_WORDS = {"minimum", "min"}
+MEDIAN_WORDS = {"median"}
+STD_WORDS = {"deviation", "std", "stdev"}
+CORR_WORDS = {"correlation", "correlated", "correlate", "correlates", "corr"}
+HIGH_WORDS = {"highest", "best", "most"}
+LOW_WORDS = {"lowest", "worst", "least"}
+
+VISUAL_WORDS = {
+    "show", "plot", "chart", "graph", "scatter", "visualize",
+    "visualise", "draw", "display", "histogram", "pie", "bar",
+}
+
+# Range conditions: phrase -> comparison. The number follows the phrase
+# ("fare over 50", "older than 30"); "between N and M" is handled apart.
+COMPARATORS = {
+    ("older", "than"): ">",
+    ("younger", "than"): "<",
+    ("more", "than"): ">",
+    ("greater", "than"): ">",
+    ("higher", "than"): ">",
+    ("less", "than"): "<",
+    ("lower", "than"): "<",
+    ("fewer", "than"): "<",
+    ("at", "least"): ">=",
+    ("at", "most"): "<=",
+    ("over",): ">",
+    ("above",): ">",
+    ("under",): "<",
+    ("below",): "<",
+}
+
+# Words that name the compared column without mentioning it
+IMPLIED_COLUMNS = {
+    "older": "Age",
+    "younger": "Age",
+    "aged": "Age",
+    "years": "Age",
+    "pay": "Fare",
+    "paid": "Fare",
+    "paying": "Fare",
+}
+
+# "passengers over 30" compares ages
+PEOPLE_WORDS = {
+    "passengers", "passenger", "people", "persons", "those",
+    "travellers", "travelers", "children", "kids", "adults",
+}
+
+# Skipped when looking back from a comparison for the column it applies to
+CONDITION_FILLER = {"is", "was", "were", "are", "a", "an", "the", "with", "who", "that", "had", "has", "whose"}
+
+# Top-k: "top 10 fares", "5 oldest passengers", "lowest 3 ages". The
+# word sets the direction; some also name the column.
+RANK_WORDS = {
+    "top": True, "highest": True, "largest": True, "biggest": True,
+    "oldest": True, "expensive": True,
+    "bottom": False, "lowest": False, "smallest": False,
+    "youngest": False, "cheapest": False,
+}
+RANK_COLUMNS = {"oldest": "Age", "youngest": "Age", "expensive": "Fare", "cheapest": "Fare"}
+
+# "older than average", "fare above the median"
+REFERENCE_STATISTICS = {"median": "median", "average": "mean", "mean": "mean"}
+
+QUARTILES = {"lower": 25, "first": 25, "upper": 75, "third": 75}
+
+# Low-cardinality numeric columns that can still group a statistic
+NUMERIC_GROUPS = {"Pclass", "Survived", "SibSp", "Parch"}
+
+# Substring keywords used by the invalid-query guard
+DATASET_KEYWORDS = [
+    "passenger", "class", "fare", "age",
+    "survived", "embarked", "sex", "titanic",
+]
+
+DETERMINISTIC_OPERATIONS = {
+    "grouped_count",
+    "count",
+    "percentage",
+    "mean",
+    "max",
+    "min",
+    "group_survival_rate",
+    "highest_survival_rate",
+    "lowest_survival_rate",
+    "oldest",
+    "youngest",
+    "median",
+    "std",
+    "percentile",
+    "corr",
+    "survival_rate",
+    "crosstab_count",
+    "crosstab_survival_rate",
+    "top_k",
+    "bottom_k",
+}
+
+
+@dataclass(frozen=True)
+class QueryIntent:
+    text: str
+    operation: str = None
+    columns: tuple = ()
+    mentioned: tuple = ()
+    filters: tuple = ()
+    ranges: tuple = ()
+    param: float = None
+    chart_type: str = None
+    is_visual: bool = False
+    is_invalid: bool = False
+
+    @property
+    def key(self):
+        # Paraphrases that resolve to the same structure share one key
+        if self.operation is None:
+            return None
+        return (self.operation, self.columns, self.filters, self.ranges, self.param, self.chart_type)
+
+    @property
+    def filter_dict(self):
+        return dict(self.filters)
+
+
+class IntentParser:
+
+    def __init__(self, df, text_columns=()):
+
+        self.columns = list(df.columns)
+        self.numeric_columns = set(df.select_dtypes(include="number").columns)
+
+        self.column_words = dict(COLUMN_ALIASES)
+        for col in self.columns:
+            self.column_words[col.lower()] = col
+            self.column_words[col.lower() + "s"] = col
+
+        # Columns only the LLM agent loads (Name, Ticket, Cabin): a question
+        # naming one is never answered by a default count
+        self.text_words = {col.lower() for col in text_columns} | {col.lower() + "s" for col in text_columns}
+
+    # --------------------------------------------------
+    # Invalid Query Guard
+    # --------------------------------------------------
+    def is_invalid(self, question: str) -> bool:
+
+        q = question.strip()
+
+        # Too short
+        if len(q) < 4:
+            return True
+
+        # Single random word (e.g., asdsafadsf)
+        if len(q.split()) == 1 and q.isalpha():
+            return True
+
+        # Must contain at least one dataset-related keyword
+        if not any(k in q.lower() for k in DATASET_KEYWORDS):
+            if len(q.split()) <= 2:
+                return True
+
+        return False
+
+    # --------------------------------------------------
+    # Parsing
+    # --------------------------------------------------
+    def parse(self, question: str) -> QueryIntent:
+
+        text = normalize(question)
+        tokens = text.split()
+        words = set(tokens)
+
+        if self.is_invalid(question):
+            return QueryIntent(text=text, is_invalid=True)
+
+        # ---------- Filters ----------
+        filters = {}
+        consumed = set()
+
+        for i, token in enumerate(tokens):
+            before = tokens[max(i - 2, 0):i]
+            if token in PORT_CODES and (
+                (before and before[-1] in PORT_CODE_WORDS) or before == ["embarked", "at"]
+            ):
+                col, val = PORT_CODES[token]
+                filters[col] = val
+                consumed.add(i)
+                continue
+
+            # "first quartile" is a statistic, not first class
+            if token in FILTER_WORDS and not (i + 1 < len(tokens) and tokens[i + 1] in ("quartile", "percentile")):
+                col, val = FILTER_WORDS[token]
+                filters[col] = val
+                consumed.add(i)
+
+                # "first class" is a filter, not a mention of Pclass
+                if col == "Pclass" and i + 1 < len(tokens) and tokens[i + 1] in ("class", "classes"):
+                    consumed.add(i + 1)
+
+        # ---------- Range Conditions ----------
+        ranges, unresolved = self._ranges(question, tokens, consumed)
+
+        # ---------- Column Mentions ----------
+        columns = []
+        group_columns = []
+        seen_group_word = False
+
+        for i, token in enumerate(tokens):
+            if token in GROUP_WORDS:
+                seen_group_word = True
+                continue
+
+            if i in consumed or token not in self.column_words:
+                continue
+
+            col = self.column_words[token]
+
+            if col not in columns:
+                columns.append(col)
+
+            if seen_group_word and col not in group_columns:
+                group_columns.append(col)
+
+        # ---------- Chart Type ----------
+        is_visual = bool(words & VISUAL_WORDS)
+        chart_type = None
+
+        if is_visual:
+            if "scatter" in words:
+                chart_type = "scatter"
+            elif "pie" in words:
+                chart_type = "pie"
+            elif "bar" in words:
+                chart_type = "bar"
+            else:
+                chart_type = "hist"
+
+        # A comparison whose column can't be told would be silently
+        # dropped by every deterministic operation: leave it to the LLM
+        if unresolved:
+            operation, target, param = None, (), None
+        else:
+            operation, target, param = self._operation(
+                text, tokens, words, columns, group_columns, filters, ranges, consumed,
+            )
+
+        return QueryIntent(
+            text=text,
+            operation=operation,
+            columns=target,
+            mentioned=tuple(columns),
+            filters=tuple(sorted(filters.items())),
+            ranges=tuple(sorted(ranges, key=str)),
+            param=param,
+            chart_type=chart_type,
+            is_visual=is_visual,
+        )
+
+    # --------------------------------------------------
+    # Range Conditions
+    # --------------------------------------------------
+    def _number(self, question, tokens, i):
+
+        # normalize() splits "7.25" into "7 25"; rejoin from the raw text
+        if i >= len(tokens) or not tokens[i].isdigit():
+            return None, 0
+
+        if i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            joined = f"{tokens[i]}.{tokens[i + 1]}"
+            if re.search(rf"(?<![\d.]){re.escape(joined)}(?![\d.])", question):
+                return float(joined), 2
+
+        return int(tokens[i]), 1
+
+    def _condition_column(self, tokens, start, consumed):
+
+        # The column named right before the comparison, skipping filler.
+        # A column word used this way is consumed: "average fare for age
+        # over 30" asks about Fare.
+        for j in range(start - 1, -1, -1):
+
+            token = tokens[j]
+
+            if token in IMPLIED_COLUMNS:
+                return IMPLIED_COLUMNS[token]
+
+            if token in CONDITION_FILLER:
+                continue
+
+            if j not in consumed and token in self.column_words:
+                col = self.column_words[token]
+                if col not in self.numeric_columns:
+                    return None
+                consumed.add(j)
+                return col
+
+            if token in PEOPLE_WORDS:
+                return "Age"
+
+            return None
+
+        return None
+
+    def _reference(self, tokens, i, consumed):
+
+        # "above the median fare": a statistic of the column instead of a
+        # number, resolved against the whole dataset when answering.
+        # -> (statistic, tokens used, column named after it)
+        j = i + 1 if i < len(tokens) and tokens[i] == "the" else i
+
+        if j >= len(tokens) or tokens[j] not in REFERENCE_STATISTICS:
+            return None, 0, None
+
+        statistic = REFERENCE_STATISTICS[tokens[j]]
+        following = tokens[j + 1] if j + 1 < len(tokens) else None
+        col = self.column_words.get(following)
+
+        if col in self.numeric_columns and j + 1 not in consumed:
+            consumed.add(j + 1)
+            return statistic, j + 2 - i, col
+
+        return statistic, j + 1 - i, None
+
+    def _years_follow(self, tokens, i):
+        return i < len(tokens) and tokens[i] in ("years", "year")
+
+    def _ranges(self, question, tokens, consumed):
+
+        # -> ([(column, op, value)], unresolved). Comparison and number
+        # tokens are marked consumed so they are not read as mentions.
+        ranges = []
+        unresolved = False
+        i = 0
+
+        while i < len(tokens):
+
+            # ---------- between N and M ----------
+            if tokens[i] == "between":
+                low, n_low = self._number(question, tokens, i + 1)
+                j = i + 1 + n_low
+                high, n_high = self._number(question, tokens, j + 1) if low is not None and j < len(tokens) and tokens[j] in ("and", "to") else (None, 0)
+
+                if high is not None:
+                    col = self._condition_column(tokens, i, consumed)
+                    if col is None and self._years_follow(tokens, j + 1 + n_high):
+                        col = "Age"
+
+                    if col is None:
+                        unresolved = True
+                    else:
+                        ranges += [(col, ">=", min(low, high)), (col, "<=", max(low, high))]
+
+                    consumed.update(range(i, j + 1 + n_high))
+                    i = j + 1 + n_high
+                    continue
+
+            # ---------- comparison N ----------
+            for phrase, op in COMPARATORS.items():
+
+                end = i + len(phrase)
+                if tuple(tokens[i:end]) != phrase:
+                    continue
+
+                value, n = self._number(question, tokens, end)
+                named = None
+
+                if value is None:
+                    value, n, named = self._reference(tokens, end, consumed)
+                if value is None:
+                    continue
+
+                col = named or IMPLIED_COLUMNS.get(phrase[0]) or self._condition_column(tokens, i, consumed)
+                if col is None and self._years_follow(tokens, end + n):
+                    col = "Age"
+
+                if col is None:
+                    unresolved = True
+                else:
+                    ranges.append((col, op, value))
+
+                consumed.update(range(i, end + n))
+                i = end + n - 1
+                break
+
+            i += 1
+
+        return ranges, unresolved
+
+    # --------------------------------------------------
+    # Operations
+    # --------------------------------------------------
+    def _percentile(self, text):
+
+        match = re.search(r"\b(\d{1,2})(?:st|nd|rd|th)? percentile\b", text)
+        if match:
+            return float(match.group(1))
+
+        match = re.search(r"\b(lower|upper|first|third) quartile\b", text)
+        if match:
+            return float(QUARTILES[match.group(1)])
+
+        return None
+
+    def _ranked(self, tokens, targets, consumed):
+
+        # -> (operation, column, k) for "top 10 fares"-style questions
+        for i, token in enumerate(tokens):
+
+            if i in consumed or not token.isdigit() or int(token) == 0:
+                continue
+
+            # Adjacent words only ("top 10", "10 oldest", "10 most expensive"),
+            # so range numbers elsewhere in the question are not taken as k
+            around = tokens[i - 1:i] + tokens[i + 1:i + 2]
+            if tokens[i + 1:i + 2] == ["most"]:
+                around += tokens[i + 2:i + 3]
+            near = [t for t in around if t in RANK_WORDS]
+            if not near:
+                continue
+
+            largest = not any(RANK_WORDS[t] is False for t in near)
+            implied = [RANK_COLUMNS[t] for t in near if t in RANK_COLUMNS]
+            ranked = [c for c in targets if c not in NUMERIC_GROUPS]
+            col = (ranked or implied or [None])[0]
+
+            if col is None:
+                return None
+
+            return ("top_k" if largest else "bottom_k"), col, int(token)
+
+        return None
+
+    def _operation(self, text, tokens, words, columns, group_columns, filters, ranges, consumed):
+
+        # Words used by a filter or range condition ("fare above the
+        # median") don't choose the operation
+        words = {token for i, token in enumerate(tokens) if i not in consumed}
+        padded = f" {text} "
+        is_count = " how many " in padded or bool(words & COUNT_WORDS)
+        is_survival_rate = (
+            " survival rate" in padded
+            or " survival by " in padded
+            or " survival per " in padded
+        )
+        numeric = [c for c in columns if c in self.numeric_columns]
+        grouped = bool(words & GROUP_WORDS) and bool(group_columns)
+        group_column = group_columns[0] if group_columns else None
+
+        # Two grouping columns: a cross-tab
+        if words & GROUP_WORDS and len(group_columns) >= 2:
+            if is_survival_rate:
+                return "crosstab_survival_rate", tuple(group_columns[:2]), None
+            if is_count:
+                return "crosstab_count", tuple(group_columns[:2]), None
+
+        # "top 10 fares": the number is a k, not a filter value
+        ranked = None if is_count else self._ranked(tokens, numeric, consumed)
+        if ranked:
+            operation, col, k = ranked
+            return operation, (col,), k
+
+        # Grouped logic must win over plain counts
+        if is_count and grouped:
+            return "grouped_count", (group_column,), None
+
+        if is_count and "Embarked" in columns and "Embarked" not in filters:
+            return "grouped_count", ("Embarked",), None
+
+        if is_count:
+            return "count", (), None
+
+        if words & PERCENT_WORDS and (filters or ranges):
+            return "percentage", (), None
+
+        # "is fare correlated with survival"
+        if words & CORR_WORDS:
+            pair = list(numeric)
+            if "survival" in words and "Survived" not in pair:
+                pair.append("Survived")
+            if len(pair) >= 2:
+                return "corr", tuple(pair[:2]), None
+            return None, (), None
+
+        # ---------- Numeric Statistics ----------
+        # Optionally grouped: "median fare by class"
+        quantile = self._percentile(text)
+
+        # "average survival by class" has no target column of its own
+        targets = [c for c in numeric if c not in group_columns] if grouped else numeric
+
+        # "max fare under 100": the compared column is also the target
+        if not targets and len({col for col, _, _ in ranges}) == 1:
+            targets = [ranges[0][0]]
+
+        for operation, present in (
+            ("percentile", quantile is not None),
+            ("median", bool(words & MEDIAN_WORDS)),
+            ("std", bool(words & STD_WORDS)),
+            ("mean", bool(words & MEAN_WORDS)),
+            ("max", bool(words & MAX_WORDS)),
+            ("min", bool(words & MIN_WORDS)),
+        ):
+            if not present or not targets:
+                continue
+
+            target = targets[0]
+            by = [
+                c for c in group_columns
+                if c != target and (c not in self.numeric_columns or c in NUMERIC_GROUPS)
+            ] if grouped else []
+
+            # "average fare by sex and class": one grouping level only
+            if len(by) > 1:
+                return None, (), None
+
+            if by:
+                return operation, (target, by[0]), quantile
+
+            return operation, (target,), quantile
+
+        if is_survival_rate:
+
+            if words & GROUP_WORDS and group_column:
+                return "group_survival_rate", (group_column,), None
+
+            # Class is the default comparison dimension
+            by = tuple(c for c in columns if c not in self.numeric_columns or c == "Pclass")[:1]
+
+            if words & HIGH_WORDS:
+                return "highest_survival_rate", by or ("Pclass",), None
+
+            if words & LOW_WORDS:
+                return "lowest_survival_rate", by or ("Pclass",), None
+
+            return "survival_rate", (), None
+
+        if "oldest" in words:
+            return "oldest", ("Age",), None
+
+        if "youngest" in words:
+            return "youngest", ("Age",), None
+
+        # A bare condition ("passengers older than 60", "fare above median
+        # by class") asks how many match, unless it names another column
+        # or ranks ("bottom 3 younger than 18")
+        if (
+            ranges
+            and all(c in group_columns for c in columns)
+            and not words & (self.text_words | RANK_WORDS.keys() | HIGH_WORDS | LOW_WORDS)
+        ):
+            if grouped and len(group_columns) >= 2:
+                return "crosstab_count", tuple(group_columns[:2]), None
+            if grouped:
+                return "grouped_count", (group_column,), None
+            return "count", (), None
+
+        return None, (), None
@@ -1,41 +1,430 @@
 import asyncio
 import logging
+import threading
+import time
 
-from langchain_groq import ChatGroq
-from langchain_experimental.agents import create_pandas_dataframe_agent
-from backend.core.config import GROQ_API_KEY, MODEL_NAME
+from backend.core.config import GROQ_API_KEY, MODEL_NAME, LLM_MODE, LLM_SINGLE_SHOT_ITERATIONS
+from backend.core.tracing import current_trace, record_span, span
 
 logger = logging.getLogger(__name__)
 
+FINAL_ANSWER_MARKER = "Final Answer:"
 
-class LLMEngine:
 
-    def __init__(self, df):
+_handler_classes = None
+
+
+def _response_usage(response):
+
+    # Provider-reported usage: usage_metadata on chat messages, or the
+    # OpenAI-style token_usage block of llm_output
+    tokens_in = tokens_out = 0
+    found = False
+
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                tokens_in += usage.get("input_tokens", 0)
+                tokens_out += usage.get("output_tokens", 0)
+                found = True
+
+    if not found:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            tokens_in = usage.get("prompt_tokens", 0)
+            tokens_out = usage.get("completion_tokens", 0)
+            found = True
+
+    return (tokens_in, tokens_out) if found else None
+
+
+def _estimate_tokens(chars):
+    # ~4 characters per token, for models that report no usage
+    return -(-chars // 4)
+
+
+def _callback_classes():
+
+    global _handler_classes
+
+    if _handler_classes is not None:
+        return _handler_classes
+
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class SpanHandler(BaseCallbackHandler):
+
+        # One span per model call and per tool call of the agent loop, so
+        # a slow answer can be attributed to a specific iteration. Called
+        # on the agent's own task, so spans land in its trace.
+        run_inline = True
+
+        def __init__(self):
+            self.started = {}
+
+        def _start(self, run_id, name, **attributes):
+            self.started[run_id] = (name, time.perf_counter(), attributes)
+
+        def _end(self, run_id, **attributes):
+            entry = self.started.pop(run_id, None)
+            if entry is not None:
+                name, start, attrs = entry
+                record_span(name, start, time.perf_counter(), **attrs, **attributes)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id, "llm_model")
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id, "llm_model")
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error=type(error).__name__)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+            self._start(run_id, "llm_tool", tool=(serialized or {}).get("name", "tool"))
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error=type(error).__name__)
+
+    class UsageHandler(BaseCallbackHandler):
+
+        # Token and iteration counts of one agent run
+        run_inline = True
+
+        def __init__(self, model):
+            self.model = model
+            self.tokens_input = 0
+            self.tokens_output = 0
+            self.model_calls = 0
+            self.tool_calls = 0
+            self.estimated = False
+            self._prompt_chars = {}
+
+            # The last python_repl_ast command and its output (see
+            # QueryPlans.learn)
+            self.last_code = None
+            self.last_observation = None
+            self._tool_inputs = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._prompt_chars[run_id] = sum(
+                len(str(message.content)) for batch in messages for message in batch
+            )
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._prompt_chars[run_id] = sum(len(p) for p in prompts)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+
+            self.model_calls += 1
+            prompt_chars = self._prompt_chars.pop(run_id, 0)
+            usage = _response_usage(response)
 
-        self.llm = ChatGroq(
-            groq_api_key=GROQ_API_KEY,
-            model_name=MODEL_NAME,
-            temperature=0,
+            if usage is None:
+                self.estimated = True
+                output_chars = sum(len(g.text) for gens in response.generations for g in gens)
+                usage = (_estimate_tokens(prompt_chars), _estimate_tokens(output_chars))
+
+            self.tokens_input += usage[0]
+            self.tokens_output += usage[1]
+
+        def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+            self.tool_calls += 1
+            if (serialized or {}).get("name") == "python_repl_ast":
+                self._tool_inputs[run_id] = input_str
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            code = self._tool_inputs.pop(run_id, None)
+            if code is not None:
+                self.last_code = code
+                self.last_observation = str(output)
+
+        def tool_run(self):
+            return {"code": self.last_code, "observation": self.last_observation}
+
+        def summary(self):
+            return {
+                "model": self.model,
+                "tokens_input": self.tokens_input,
+                "tokens_output": self.tokens_output,
+                "tokens_estimated": self.estimated,
+                "iterations": self.model_calls,
+                "tool_calls": self.tool_calls,
+            }
+
+    _handler_classes = (SpanHandler, UsageHandler)
+
+    return _handler_classes
+
+
+def _callbacks(model):
+
+    span_handler, usage_handler = _callback_classes()
+    usage = usage_handler(model)
+
+    handlers = [usage]
+    if current_trace() is not None:
+        handlers.append(span_handler())
+
+    return handlers, usage
+
+
+_sandbox_tool_class = None
+
+
+def _sandboxed(agent, sandbox):
+
+    # Swaps the agent's in-process python_repl_ast tool for one that runs
+    # the same commands in the sandbox's worker processes
+    global _sandbox_tool_class
+
+    if _sandbox_tool_class is None:
+
+        from typing import Any
+
+        from langchain_core.tools import BaseTool
+        from langchain_experimental.tools.python.tool import sanitize_input
+
+        class SandboxedPythonTool(BaseTool):
+
+            sandbox: Any = None
+
+            def _run(self, query, run_manager=None):
+                return asyncio.run(self.sandbox.run(sanitize_input(query)))
+
+            async def _arun(self, query, run_manager=None):
+                return await self.sandbox.run(sanitize_input(query))
+
+        _sandbox_tool_class = SandboxedPythonTool
+
+    agent.tools = [
+        _sandbox_tool_class(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            sandbox=sandbox,
         )
+        if tool.name == "python_repl_ast" else tool
+        for tool in agent.tools
+    ]
+
+    return agent
+
+
+# Tells the model that sandboxed commands share no state
+SANDBOX_NOTE = (
+    "Each python_repl_ast command runs in a fresh namespace where only `df`, "
+    "`pd` and `np` are defined, so compute everything you need in one command."
+)
+
+# Returned by AgentExecutor when max_iterations runs out
+STOPPED_OUTPUT = "Agent stopped due to iteration limit or time limit."
+
+SINGLE_SHOT_SUFFIX = """
+This is a profile of the full dataframe `df`, precomputed for you:
+
+{profile}
+
+First rows of `df`:
+{{df_head}}
+
+Answer from the profile whenever it is enough, directly with a Final Answer.
+Otherwise run ONE python_repl_ast command that computes the answer on `df`
+(no exploratory df.head(), df.dtypes or df.columns), then give the Final Answer.
 
-        self.agent = create_pandas_dataframe_agent(
+Begin!
+Question: {{input}}
+{{agent_scratchpad}}"""
+
+
+class LLMEngine:
+
+    def __init__(self, load_frame, llm=None, model_name=MODEL_NAME, mode=LLM_MODE, sandbox=None):
+
+        # The LangChain stack takes about a second to import, so the agents
+        # are built on first use (or by warmup()), never at start-up.
+        # `llm` replaces ChatGroq (e.g. the benchmarks' local stand-in).
+        #
+        # mode "single_shot" first asks a profile-primed agent limited to
+        # LLM_SINGLE_SHOT_ITERATIONS steps, and only falls back to the full
+        # agent when it cannot finish; "agent" always uses the full agent.
+        #
+        # With a `sandbox` (CodeSandbox), the agents' pandas code runs in its
+        # worker processes instead of in this one.
+        self.load_frame = load_frame
+        self.llm = llm
+        self.model_name = model_name
+        self.mode = mode
+        self.sandbox = sandbox
+        self._agent = None
+        self._single_shot = None
+        self._lock = threading.Lock()
+
+        # ---------- Metrics ----------
+        self.single_shot_answers = 0
+        self.agent_fallbacks = 0
+
+    @property
+    def ready(self):
+        return self._agent is not None
+
+    @property
+    def agent(self):
+
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._build()
+
+        return self._agent
+
+    def _build(self):
+
+        from langchain_experimental.agents import create_pandas_dataframe_agent
+        from langchain_experimental.agents.agent_toolkits.pandas.prompt import PREFIX
+
+        if self.llm is None:
+            from langchain_groq import ChatGroq
+
+            self.llm = ChatGroq(
+                groq_api_key=GROQ_API_KEY,
+                model_name=self.model_name,
+                temperature=0,
+            )
+
+        df = self.load_frame()
+        prefix = PREFIX if self.sandbox is None else f"{PREFIX}\n{SANDBOX_NOTE}\n"
+        single_shot = None
+
+        if self.mode == "single_shot":
+
+            from backend.services.dataset_profile import build_profile
+
+            # Literal braces in the profile must survive the prompt template
+            profile = build_profile(df).replace("{", "{{").replace("}", "}}")
+
+            single_shot = create_pandas_dataframe_agent(
+                self.llm,
+                df,
+                verbose=False,
+                allow_dangerous_code=True,
+                prefix=prefix,
+                suffix=SINGLE_SHOT_SUFFIX.format(profile=profile),
+                include_df_in_prompt=None,
+                number_of_head_rows=3,
+                max_iterations=LLM_SINGLE_SHOT_ITERATIONS,
+            )
+
+        agent = create_pandas_dataframe_agent(
             self.llm,
             df,
             verbose=False,
             allow_dangerous_code=True,
+            prefix=prefix,
             max_iterations=20, 
         )
 
+        if self.sandbox is not None:
+            agent = _sandboxed(agent, self.sandbox)
+            if single_shot is not None:
+                single_shot = _sandboxed(single_shot, self.sandbox)
+
+        # Published last: _agent set means both agents are complete
+        self._single_shot = single_shot
+        self._agent = agent
+
+        logger.info("llm_agent_built")
+
+    def warmup(self):
+        return self.agent
+
+    async def _ensure_agent(self):
+
+        # Built off the event loop when no warmup has happened yet
+        if self._agent is None:
+            await asyncio.to_thread(self.warmup)
+
+        return self._agent
+
+    def _plan(self):
+
+        # Agents to try in order, with the mode each one reports
+        if self._single_shot is None:
+            return [("agent", self._agent)]
+
+        return [("single_shot", self._single_shot), ("agent", self._agent)]
+
+    def _settle(self, mode, question, error=None):
+
+        # True when `mode`'s answer stands; False to fall through to the
+        # full agent (iteration limit reached or unparseable output)
+        if mode == "agent":
+            return True
+
+        if error is None:
+            self.single_shot_answers += 1
+            return True
+
+        self.agent_fallbacks += 1
+        logger.info(f"llm_single_shot_fallback: {error}", extra={"query": question})
+
+        return False
+
     async def answer(self, question: str):
 
+        # Returns the answer with the run's usage: model, mode, tokens_input,
+        # tokens_output, tokens_estimated, iterations (summed over both
+        # agents when single-shot falls back), tool_calls
         logger.info("llm_start", extra={"query": question})
 
         try:
-            result = await self.agent.ainvoke(question)
+            await self._ensure_agent()
+            callbacks, usage = _callbacks(self.model_name)
+
+            for mode, agent in self._plan():
+
+                error = None
 
-            logger.info("llm_finish", extra={"query": question})
+                with span("llm_agent", model=self.model_name, mode=mode):
+                    try:
+                        result = await agent.ainvoke(
+                            question,
+                            config={"callbacks": callbacks},
+                        )
+                        output = result.get("output", "").strip()
 
-            return result.get("output", "").strip()
+                        if output == STOPPED_OUTPUT:
+                            error = "iteration_limit"
+
+                    except ValueError as exc:
+                        # Output parsing errors; the full agent re-raises
+                        if mode == "agent":
+                            raise
+                        error = type(exc).__name__
+
+                if self._settle(mode, question, error):
+                    break
+
+            summary = usage.summary()
+
+            logger.info(
+                "llm_finish",
+                extra={
+                    "query": question,
+                    "tokens_input": summary["tokens_input"],
+                    "tokens_output": summary["tokens_output"],
+                    "iterations": summary["iterations"],
+                },
+            )
+
+            return {"answer": output, "mode": mode, **summary, **usage.tool_run()}
 
         except Exception as e:
 
@@ -44,4 +433,105 @@ class LLMEngine:
                 extra={"query": question}
             )
 
-            raise
\ No newline at end of file
+            raise
+
+    async def astream(self, question: str):
+
+        # Yields agent steps as they happen, then answer tokens once the
+        # model starts writing its "Final Answer:", then the final output.
+        # A single-shot run that cannot finish is followed by the full
+        # agent's events; only the last run's final event is emitted.
+        logger.info("llm_stream_start", extra={"query": question})
+
+        await self._ensure_agent()
+        callbacks, usage = _callbacks(self.model_name)
+
+        for mode, agent in self._plan():
+
+            output, error = None, None
+            events = self._agent_events(agent, question, callbacks)
+
+            try:
+                async for event in events:
+                    if event["event"] == "final":
+                        output = event["answer"]
+                    else:
+                        yield event
+
+            except ValueError as exc:
+                if mode == "agent":
+                    raise
+                error = type(exc).__name__
+
+            if error is None and output == STOPPED_OUTPUT:
+                error = "iteration_limit"
+
+            if self._settle(mode, question, error):
+                break
+
+        logger.info("llm_stream_finish", extra={"query": question})
+
+        yield {
+            "event": "final",
+            "answer": output or "",
+            "mode": mode,
+            **usage.summary(),
+            **usage.tool_run(),
+        }
+
+    async def _agent_events(self, agent, question, callbacks):
+
+        buffers = {}
+
+        async for event in agent.astream_events(
+            question,
+            version="v2",
+            config={"callbacks": callbacks},
+        ):
+
+            kind = event["event"]
+
+            # The executor's own stream carries each decided action
+            if kind == "on_chain_stream" and not event.get("parent_ids"):
+                for action in event["data"]["chunk"].get("actions", []):
+                    yield {
+                        "event": "step",
+                        "tool": action.tool,
+                        "input": str(action.tool_input),
+                    }
+
+            elif kind == "on_tool_end":
+                yield {
+                    "event": "observation",
+                    "tool": event["name"],
+                    "output": str(event["data"].get("output", ""))[:500],
+                }
+
+            elif kind == "on_chat_model_stream":
+                chunk = event["data"]["chunk"].content
+                if not chunk:
+                    continue
+
+                run_id = event["run_id"]
+                before = buffers.get(run_id, "")
+                text = before + chunk
+                buffers[run_id] = text
+
+                marker = text.find(FINAL_ANSWER_MARKER)
+                if marker == -1:
+                    continue
+
+                start = max(len(before), marker + len(FINAL_ANSWER_MARKER))
+                if text[start:]:
+                    yield {"event": "token", "text": text[start:]}
+
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                output = event["data"].get("output") or {}
+                yield {"event": "final", "answer": output.get("output", "").strip()}
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "single_shot_answers": self.single_shot_answers,
+            "agent_fallbacks": self.agent_fallbacks,
+        }
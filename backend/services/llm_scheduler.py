@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+
+from backend.core.exceptions import AppException
+from backend.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class LLMScheduler:
+
+    def __init__(self, max_concurrency=4, max_queue=32, queue_timeout=30.0, deadline=90.0):
+
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+
+        self.active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+        # ---------- Metrics ----------
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_count = 0
+        self.run_total = 0.0
+
+    @property
+    def queue_depth(self):
+        return sum(1 for *_, fut in self._waiters if not fut.done())
+
+    # --------------------------------------------------
+    # Admission
+    # --------------------------------------------------
+    def _retry_after(self):
+
+        # Rough time until a queued request would start
+        avg_run = self.run_total / self.run_count if self.run_count else 5.0
+        estimate = avg_run * (self.queue_depth + 1) / self.max_concurrency
+
+        return str(max(1, math.ceil(estimate)))
+
+    def _overloaded(self, message):
+        return AppException(message, 503, headers={"Retry-After": self._retry_after()})
+
+    async def _acquire(self, priority, deadline):
+
+        if self.active < self.max_concurrency and not self.queue_depth:
+            self.active += 1
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            logger.warning("llm_queue_full")
+            raise self._overloaded("LLM capacity exceeded. Please retry shortly.")
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+
+        timeout = min(self.queue_timeout, deadline - time.monotonic())
+
+        try:
+            await asyncio.wait_for(fut, max(0.0, timeout))
+
+        except asyncio.TimeoutError:
+            self._discard(fut)
+            self.expired += 1
+            logger.warning("llm_queue_deadline_exceeded")
+            raise self._overloaded("LLM queue wait exceeded the request deadline.")
+
+        except asyncio.CancelledError:
+            self._discard(fut)
+            raise
+
+    def _discard(self, fut):
+
+        # A slot may have been handed over just as the waiter gave up
+        if fut.done() and not fut.cancelled():
+            self._release()
+        else:
+            fut.cancel()
+
+    def _release(self):
+
+        while self._waiters:
+            *_, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                # Hand the slot straight to the next waiter
+                fut.set_result(None)
+                return
+
+        self.active -= 1
+
+    # --------------------------------------------------
+    # Execution
+    # --------------------------------------------------
+    @asynccontextmanager
+    async def slot(self, priority=PRIORITY_NORMAL):
+
+        # Yields the request's absolute deadline (time.monotonic clock)
+        start = time.monotonic()
+        deadline = start + self.deadline
+
+        with span("llm_queue"):
+            await self._acquire(priority, deadline)
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.wait_count += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+        started = time.monotonic()
+
+        try:
+            yield deadline
+
+        finally:
+            self.run_count += 1
+            self.run_total += time.monotonic() - started
+            self._release()
+
+    async def run(self, factory, priority=PRIORITY_NORMAL):
+
+        async with self.slot(priority) as deadline:
+            return await asyncio.wait_for(factory(), deadline - time.monotonic())
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "wait_avg_seconds": round(self.wait_total / self.wait_count, 4) if self.wait_count else 0.0,
+            "wait_max_seconds": round(self.wait_max, 4),
+            "run_avg_seconds": round(self.run_total / self.run_count, 4) if self.run_count else 0.0,
+        }
@@ -0,0 +1,595 @@
+import ast
+import json
+import logging
+import math
+import operator
+import re
+import time
+
+import numpy as np
+
+from backend.services.intent_parser import FILTER_WORDS
+from backend.services.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+# Safe Evaluator
+# ----------------------------------------------------------
+
+class PlanError(Exception):
+    pass
+
+
+# Read-only pandas / numpy methods a plan may call. Nothing that takes a
+# method name as a string (agg, aggregate, transform, pipe): those would
+# dispatch to any method, writers included
+METHODS = {
+    "abs", "all", "any", "astype",
+    "between", "contains", "corr", "count", "cov", "cumsum", "describe",
+    "diff", "drop_duplicates", "dropna", "duplicated", "endswith", "fillna",
+    "first", "get", "groupby", "head", "idxmax", "idxmin", "isin", "isna",
+    "isnull", "item", "kurt", "last", "len", "lower", "max", "mean",
+    "median", "min", "mode", "nlargest", "nsmallest", "notna", "notnull",
+    "nunique", "pct_change", "prod", "quantile", "rank", "reset_index",
+    "round", "sem", "size", "skew", "sort_index", "sort_values",
+    "startswith", "std", "sum", "tail", "to_dict", "to_list", "tolist",
+    "unique", "upper", "value_counts", "var",
+}
+
+# Non-callable attributes
+PROPERTIES = {
+    "at", "columns", "dt", "empty", "iat", "iloc", "index", "loc", "name",
+    "ndim", "shape", "size", "str", "T", "values",
+}
+
+FUNCTIONS = {
+    "len": len, "round": round, "abs": abs, "int": int, "float": float,
+    "min": min, "max": max, "sum": sum,
+}
+
+BIN_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod, ast.Pow: operator.pow,
+    ast.BitAnd: operator.and_, ast.BitOr: operator.or_, ast.BitXor: operator.xor,
+}
+
+UNARY_OPS = {
+    ast.USub: operator.neg, ast.UAdd: operator.pos,
+    ast.Invert: operator.invert, ast.Not: operator.not_,
+}
+
+COMPARE_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+
+
+def safe_eval(node, env, columns=()):
+
+    # Evaluates one expression by walking its AST: names come only from
+    # `env`, attributes from the whitelists (or column names), and there
+    # are no statements, lambdas, comprehensions or dunder access
+    def walk(n):
+
+        if isinstance(n, ast.Expression):
+            return walk(n.body)
+
+        if isinstance(n, ast.Constant):
+            return n.value
+
+        if isinstance(n, ast.Name):
+            if n.id in env:
+                return env[n.id]
+            raise PlanError(f"name not allowed: {n.id}")
+
+        if isinstance(n, (ast.Tuple, ast.List)):
+            items = [walk(e) for e in n.elts]
+            return tuple(items) if isinstance(n, ast.Tuple) else items
+
+        if isinstance(n, ast.Slice):
+            return slice(
+                walk(n.lower) if n.lower else None,
+                walk(n.upper) if n.upper else None,
+                walk(n.step) if n.step else None,
+            )
+
+        if isinstance(n, ast.Subscript):
+            return walk(n.value)[walk(n.slice)]
+
+        if isinstance(n, ast.Attribute):
+            attr = n.attr
+            if attr.startswith("_") or not (attr in METHODS or attr in PROPERTIES or attr in columns):
+                raise PlanError(f"attribute not allowed: {attr}")
+            return getattr(walk(n.value), attr)
+
+        if isinstance(n, ast.Call):
+            if isinstance(n.func, ast.Name):
+                if n.func.id not in FUNCTIONS:
+                    raise PlanError(f"function not allowed: {n.func.id}")
+                func = FUNCTIONS[n.func.id]
+            elif isinstance(n.func, ast.Attribute) and n.func.attr in METHODS:
+                func = walk(n.func)
+            else:
+                raise PlanError("call not allowed")
+
+            args = [walk(a) for a in n.args if not isinstance(a, ast.Starred)]
+            kwargs = {k.arg: walk(k.value) for k in n.keywords if k.arg is not None}
+
+            if len(args) != len(n.args) or len(kwargs) != len(n.keywords):
+                raise PlanError("unpacking not allowed")
+
+            if any(callable(a) for a in (*args, *kwargs.values())):
+                raise PlanError("callable arguments not allowed")
+
+            return func(*args, **kwargs)
+
+        if isinstance(n, ast.BinOp) and type(n.op) in BIN_OPS:
+            return BIN_OPS[type(n.op)](walk(n.left), walk(n.right))
+
+        if isinstance(n, ast.UnaryOp) and type(n.op) in UNARY_OPS:
+            return UNARY_OPS[type(n.op)](walk(n.operand))
+
+        if isinstance(n, ast.Compare) and len(n.ops) == 1 and type(n.ops[0]) in COMPARE_OPS:
+            return COMPARE_OPS[type(n.ops[0])](walk(n.left), walk(n.comparators[0]))
+
+        raise PlanError(f"expression not allowed: {type(n).__name__}")
+
+    return walk(node)
+
+
+def evaluate_plan(code, slots, df, columns=()):
+
+    # Runs a stored plan with its slot values bound. The result is reduced
+    # to a float, or its printed form, so it can leave a sandbox worker
+    from backend.services.code_sandbox import MAX_OUTPUT_CHARS
+
+    env = {"df": df, **{_slot(slot): value for slot, value in slots.items()}}
+    value = safe_eval(ast.parse(code, mode="eval"), env, columns)
+
+    number = _numeric(value)
+    return number if number is not None else str(value)[:MAX_OUTPUT_CHARS]
+
+
+# ----------------------------------------------------------
+# Plan Construction
+# ----------------------------------------------------------
+
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.]*\d)")
+
+# Code the agent may wrap its command in (same clean-up as the tool)
+_FENCE = re.compile(r"^(\s|`)*(?i:python)?\s*|(\s|`)*$")
+
+
+def _slot(name):
+    return f"_slot_{name}"
+
+
+def template_of(intent):
+
+    # The question with its parameters replaced: filter words by the
+    # filtered column, numbers by <n>. Returns (template, values), where
+    # values maps each slot to this question's value.
+    filters = intent.filter_dict
+    tokens, values = [], {}
+    numbers = 0
+
+    for token in intent.text.split():
+
+        mapped = FILTER_WORDS.get(token)
+
+        if mapped is not None and filters.get(mapped[0]) == mapped[1]:
+            tokens.append(f"<{mapped[0]}>")
+            values[mapped[0]] = mapped[1]
+
+        elif token.isdigit():
+            tokens.append("<n>")
+            values[f"n{numbers}"] = int(token)
+            numbers += 1
+
+        else:
+            tokens.append(token)
+
+    return " ".join(tokens), values
+
+
+def _column_of(node):
+
+    # df['Col'] or df.Col
+    if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant):
+        return node.slice.value
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _same(a, b):
+    return type(a) is not bool and type(b) is not bool and a == b
+
+
+class _Binder(ast.NodeTransformer):
+
+    # Replaces the literals that carry a question's parameters with slot
+    # names: filter values compared against their column, and numbers
+    # that appear in the question
+    def __init__(self, values):
+        self.values = values
+        self.bound = set()
+
+    def visit_Compare(self, node):
+
+        if len(node.ops) == 1:
+            left, right = node.left, node.comparators[0]
+
+            for column_side, value_side, put in (
+                (left, right, lambda v: node.comparators.__setitem__(0, v)),
+                (right, left, lambda v: setattr(node, "left", v)),
+            ):
+                col = _column_of(column_side)
+
+                if (
+                    col in self.values
+                    and isinstance(value_side, ast.Constant)
+                    and _same(value_side.value, self.values[col])
+                ):
+                    put(ast.Name(id=_slot(col), ctx=ast.Load()))
+                    self.bound.add(col)
+                    self.visit(column_side)
+                    return node
+
+        return self.generic_visit(node)
+
+    def visit_Constant(self, node):
+
+        for slot, value in self.values.items():
+            if slot.startswith("n") and slot[1:].isdigit() and _same(node.value, value):
+                self.bound.add(slot)
+                return ast.Name(id=_slot(slot), ctx=ast.Load())
+
+        return node
+
+
+def _numeric(value):
+
+    if isinstance(value, (bool, np.bool_)):
+        return None
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = float(value)
+        return value if math.isfinite(value) else None
+    return None
+
+
+def _answer_template(answer, value, observation, slots):
+
+    # Finds where the result appears in the final answer and how it was
+    # written there; number slots are templated too. None when the answer
+    # can't be rewritten safely (result not found, or other figures left).
+    text = answer.replace("{", "{{").replace("}", "}}")
+    result_format = None
+    number = _numeric(value)
+
+    if number is not None:
+        for match in _NUMBER.finditer(text):
+
+            literal = match.group()
+            decimals = len(literal.split(".")[1]) if "." in literal else 0
+            tail = text[match.end():match.end() + 8].lstrip()
+            percent = tail.startswith("%") or tail.startswith("percent")
+            shown = number * 100 if percent else number
+
+            if abs(float(literal) - shown) <= 0.5 * 10 ** -decimals + 1e-12:
+                text = text[:match.start()] + "{value}" + text[match.end():]
+                result_format = {"decimals": decimals, "percent": percent}
+                break
+
+    elif observation and observation in text:
+        text = text.replace(observation, "{value}", 1)
+        result_format = {"raw": True}
+
+    if result_format is None:
+        return None, None
+
+    for slot, slot_value in slots.items():
+        if slot.startswith("n"):
+            text = re.sub(rf"(?<![\w.]){slot_value}(?![\w.]*\d)", "{" + slot + "}", text)
+
+    # Any other figure would go stale when the plan is replayed
+    if _NUMBER.search(re.sub(r"\{\w+\}", "", text)):
+        return None, None
+
+    return text, result_format
+
+
+def _render(value, result_format):
+
+    if result_format.get("raw"):
+        return str(value)
+
+    number = _numeric(value)
+    if number is None:
+        raise PlanError("result is not a number")
+
+    if result_format["percent"]:
+        number *= 100
+
+    return f"{number:.{result_format['decimals']}f}"
+
+
+# ----------------------------------------------------------
+# Store
+# ----------------------------------------------------------
+
+class QueryPlans(SQLiteStore):
+
+    # Pandas expressions the agent ran to answer a question, kept as
+    # parameterized plans keyed by the question's template (see
+    # template_of). A later question with the same template replays the
+    # plan through safe_eval in milliseconds. Plans belong to one dataset
+    # version: others are dropped on start-up and never matched.
+    #
+    # Plans are agent-written code: learn() and replay() never evaluate
+    # them here but through `evaluate`, an async callable
+    # (code, slots, columns) -> reduced value that runs evaluate_plan in the code
+    # sandbox. The SQLite queries around
+    # those awaits go through call(), off the event loop.
+
+    TOUCH_SQL = (
+        "UPDATE plans SET last_used = ? "
+        "WHERE template = ? AND fixed = ? AND dataset_version = ?"
+    )
+
+    def __init__(self, path, dataset_version, max_entries=2000, columns=()):
+
+        self.dataset_version = dataset_version
+        self.max_entries = max_entries
+        self.columns = set(columns)
+
+        self.hits = 0
+        self.misses = 0
+        self.learned = 0
+        self.rejected = 0
+        self.failed = 0
+
+        super().__init__(path, "query-plans")
+
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plans (
+                template TEXT NOT NULL,
+                fixed TEXT NOT NULL,
+                dataset_version TEXT NOT NULL,
+                code TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                format TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (template, fixed, dataset_version)
+            )
+            """
+        )
+        self._db.commit()
+
+        self.purge_stale()
+
+    # --------------------------------------------------
+    # Learning
+    # --------------------------------------------------
+    async def learn(self, intent, result, evaluate):
+
+        # result: LLMEngine.answer() output with the last tool run
+        code = _FENCE.sub("", result.get("code") or "")
+        observation = (result.get("observation") or "").strip()
+
+        if not code or intent.is_invalid or intent.is_visual:
+            return False
+
+        try:
+            tree = ast.parse(code, mode="eval")
+        except SyntaxError:
+            # Multi-statement commands are not replayed
+            self.rejected += 1
+            return False
+
+        template, values = template_of(intent)
+
+        binder = _Binder(values)
+        tree = ast.fix_missing_locations(binder.visit(tree))
+
+        # Parameters the code does not use stay fixed: the plan then only
+        # matches questions with the same value for them
+        fixed = {slot: value for slot, value in values.items() if slot not in binder.bound}
+
+        try:
+            value = await evaluate(ast.unparse(tree), {slot: values[slot] for slot in binder.bound}, self.columns)
+
+            # Only a plan that reproduces what the agent saw is kept
+            number = _numeric(value)
+            expected = _numeric(_parse_number(observation))
+
+            if number is not None and expected is not None:
+                if not math.isclose(number, expected, rel_tol=1e-9, abs_tol=1e-12):
+                    raise PlanError("result differs from the agent's")
+            elif str(value).strip() != observation:
+                raise PlanError("result differs from the agent's")
+
+        except Exception as exc:
+            self.rejected += 1
+            logger.info(f"plan_rejected: {type(exc).__name__}: {exc}", extra={"query": intent.text})
+            return False
+
+        # Filter words that appear in the answer pin that filter's value
+        for slot in list(binder.bound):
+            if not slot.startswith("n") and _mentions(result["answer"], slot, values[slot]):
+                fixed[slot] = values[slot]
+
+        answer, result_format = _answer_template(result["answer"], value, observation, values)
+
+        if answer is None:
+            self.rejected += 1
+            return False
+
+        await self.call(self._put, template, fixed, ast.unparse(tree), answer, result_format)
+
+        self.learned += 1
+        logger.info("plan_learned", extra={"query": intent.text})
+
+        return True
+
+    def _put(self, template, fixed, code, answer, result_format):
+
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans "
+                "(template, fixed, dataset_version, code, answer, format, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    template,
+                    json.dumps(fixed, sort_keys=True),
+                    self.dataset_version,
+                    code,
+                    answer,
+                    json.dumps(result_format),
+                    now,
+                    now,
+                ),
+            )
+            self._flush_touches()
+            self._evict()
+            self._db.commit()
+
+    # --------------------------------------------------
+    # Replay
+    # --------------------------------------------------
+    async def replay(self, intent, evaluate):
+
+        if intent.is_invalid or intent.is_visual:
+            return None
+
+        template, values = template_of(intent)
+
+        rows = await self.call(self._candidates, template)
+
+        # Nothing is evaluated (and no frame loaded) unless a plan matches
+        for fixed, code, answer, result_format in rows:
+
+            fixed = json.loads(fixed)
+
+            if any(values.get(slot) != value for slot, value in fixed.items()):
+                continue
+
+            try:
+                value = await evaluate(code, values, self.columns)
+                text = answer.format(value=_render(value, json.loads(result_format)), **values)
+
+            except Exception as exc:
+                self.failed += 1
+                logger.warning(f"plan_replay_failed: {type(exc).__name__}", extra={"query": intent.text})
+                continue
+
+            await self.call(self._used, template, fixed)
+
+            self.hits += 1
+            return text
+
+        self.misses += 1
+        return None
+
+    def _candidates(self, template):
+
+        with self._lock:
+            return self._db.execute(
+                "SELECT fixed, code, answer, format FROM plans "
+                "WHERE template = ? AND dataset_version = ? ORDER BY last_used DESC",
+                (template, self.dataset_version),
+            ).fetchall()
+
+    def _used(self, template, fixed):
+
+        with self._lock:
+            self._touch((template, json.dumps(fixed, sort_keys=True), self.dataset_version))
+
+    # --------------------------------------------------
+    # Maintenance
+    # --------------------------------------------------
+    def _evict(self):
+
+        (count,) = self._db.execute("SELECT COUNT(*) FROM plans").fetchone()
+        excess = count - self.max_entries
+
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM plans WHERE rowid IN "
+                "(SELECT rowid FROM plans ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+
+    def purge_stale(self):
+
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM plans WHERE dataset_version != ?",
+                (self.dataset_version,),
+            )
+            self._db.commit()
+
+        return cursor.rowcount
+
+    def set_version(self, dataset_version, columns=None):
+
+        # A reloaded dataset: same rule as on start-up. A plan was only
+        # checked against the agent's result on its own version, so plans
+        # of the old version stop matching and go with purge_stale
+        if columns is not None:
+            self.columns = set(columns)
+
+        with self._lock:
+            self.dataset_version = dataset_version
+
+    def invalidate(self):
+
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM plans")
+            self._db.commit()
+
+        return cursor.rowcount
+
+    def stats(self):
+
+        with self._lock:
+            (entries,) = self._db.execute(
+                "SELECT COUNT(*) FROM plans WHERE dataset_version = ?",
+                (self.dataset_version,),
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "learned": self.learned,
+            "rejected": self.rejected,
+            "replay_failures": self.failed,
+            "dataset_version": self.dataset_version,
+        }
+
+
+def _parse_number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _mentions(answer, column, value):
+
+    words = {w for w, mapped in FILTER_WORDS.items() if mapped == (column, value)}
+    words.add(str(value).lower())
+
+    return any(re.search(rf"\b{re.escape(w)}\b", answer.lower()) for w in words)
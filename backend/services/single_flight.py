@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+
+    def __init__(self, name="llm"):
+
+        self.name = name
+
+        # key -> [shared task, number of waiters]
+        self._inflight = {}
+
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+
+        self.calls += 1
+        entry = self._inflight.get(key)
+
+        if entry is None:
+            entry = [asyncio.ensure_future(factory()), 0]
+            self._inflight[key] = entry
+            entry[0].add_done_callback(lambda _: self._forget(key, entry))
+        else:
+            self.coalesced += 1
+            logger.info(
+                f"{self.name}_coalesced: ratio={self.coalesce_ratio():.3f}",
+                extra={"query": key},
+            )
+
+        task = entry[0]
+        entry[1] += 1
+
+        try:
+            # Shielded so one caller going away never cancels the others
+            return await asyncio.shield(task)
+
+        except asyncio.CancelledError:
+            # The last interested caller left: stop the shared work too
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+                self._forget(key, entry)
+            raise
+
+        finally:
+            entry[1] -= 1
+
+    def _forget(self, key, entry):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    def coalesce_ratio(self):
+        return self.coalesced / self.calls if self.calls else 0.0
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesce_ratio": round(self.coalesce_ratio(), 4),
+        }
@@ -0,0 +1,186 @@
+import numpy as np
+
+from backend.core.dataset import widen_float32
+
+
+# Numeric columns worth ordering: the filter dimensions are answered from
+# the cube, and identifiers have no meaningful ranges
+SKIP_COLUMNS = {"PassengerId"}
+
+# Bound sides for np.searchsorted: (lower bound, upper bound) per operator
+_LOWER_SIDE = {">": "right", ">=": "left"}
+_UPPER_SIDE = {"<": "left", "<=": "right"}
+
+
+def interpolate(low, high, fraction):
+    # np.percentile's linear interpolation, bit for bit
+    diff = high - low
+    return high - diff * (1 - fraction) if fraction >= 0.5 else low + diff * fraction
+
+
+class SortedIndex:
+
+    # Per numeric column, the non-missing values in ascending order with
+    # their row positions, twice: once over all rows, and once ordered by
+    # (filter cell, value) with per-cell offsets. A filter selects a set of
+    # cells (see FilterIndex.fine_cells), each an already-sorted segment, so
+    # range counts are a binary search per segment, order statistics a
+    # binary search over values, and top-k a merge of segment ends. Range
+    # conditions on the indexed column narrow each segment first.
+
+    def __init__(self, index, arrays, columns=None, previous=None):
+
+        # previous: the SortedIndex of an earlier dataset version with the
+        # same rows and cells (a reused FilterIndex); columns missing from
+        # `arrays` keep its orders
+        self.index = index
+        self.columns = [
+            col for col in (columns or arrays)
+            if col not in index.dimensions and col not in SKIP_COLUMNS
+        ]
+
+        self._global = {}
+        self._cells = {}
+
+        for col in self.columns:
+
+            if col not in arrays:
+                self._global[col] = previous._global[col]
+                self._cells[col] = previous._cells[col]
+                continue
+
+            values = widen_float32(arrays[col]).astype(np.float64)
+            rows = np.flatnonzero(~np.isnan(values))
+
+            # ---------- All Rows ----------
+            order = rows[np.argsort(values[rows], kind="stable")]
+            self._global[col] = (values[order], order)
+
+            # ---------- Per Filter Cell ----------
+            cells = index.cell_ids[rows]
+            order = rows[np.lexsort((values[rows], cells))]
+            offsets = np.searchsorted(index.cell_ids[order], np.arange(index.n_cells + 1))
+
+            self._cells[col] = (values[order], order, offsets)
+
+    def supports(self, col):
+        return col in self._global
+
+    # --------------------------------------------------
+    # Segments
+    # --------------------------------------------------
+    def _segments(self, col, filters, ranges):
+
+        # -> [(values, rows)] sorted views covering the selection
+        if filters:
+            values, rows, offsets = self._cells[col]
+            bounds = [
+                (offsets[c], offsets[c + 1])
+                for c in self.index.fine_cells(filters)
+                if offsets[c] < offsets[c + 1]
+            ]
+        else:
+            values, rows = self._global[col]
+            bounds = [(0, len(values))]
+
+        segments = []
+
+        for start, stop in bounds:
+
+            segment = values[start:stop]
+            lo, hi = 0, len(segment)
+
+            for _, op, value in ranges:
+                if op in _LOWER_SIDE:
+                    lo = max(lo, int(np.searchsorted(segment, value, _LOWER_SIDE[op])))
+                else:
+                    hi = min(hi, int(np.searchsorted(segment, value, _UPPER_SIDE[op])))
+
+            if lo < hi:
+                segments.append((segment[lo:hi], rows[start:stop][lo:hi]))
+
+        return segments
+
+    # --------------------------------------------------
+    # Queries
+    # --------------------------------------------------
+    def count(self, col, filters=None, ranges=()):
+        return sum(len(values) for values, _ in self._segments(col, filters, ranges))
+
+    def kth(self, col, k, filters=None, ranges=(), segments=None):
+
+        # k-th smallest (0-based) value of the selection: binary search over
+        # the column's sorted values for the first with more than k
+        # selected values at or below it
+        if segments is None:
+            segments = self._segments(col, filters, ranges)
+
+        if len(segments) == 1:
+            return segments[0][0][k]
+
+        candidates = self._global[col][0]
+        lo, hi = 0, len(candidates) - 1
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at_or_below = sum(int(np.searchsorted(values, candidates[mid], "right")) for values, _ in segments)
+
+            if at_or_below > k:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        return candidates[lo]
+
+    def percentile(self, col, q, filters=None, ranges=()):
+
+        # Linear interpolation between order statistics, like np.percentile
+        segments = self._segments(col, filters, ranges)
+        n = sum(len(values) for values, _ in segments)
+
+        if n == 0:
+            return np.nan
+
+        position = q / 100 * (n - 1)
+        below = int(np.floor(position))
+        fraction = position - below
+
+        low = self.kth(col, below, segments=segments)
+
+        if fraction == 0:
+            return low
+
+        high = self.kth(col, below + 1, segments=segments)
+        return interpolate(low, high, fraction)
+
+    def top(self, col, k, filters=None, ranges=(), largest=True):
+
+        # -> [(value, row)]: the k largest (or smallest) values. The ends of
+        # the segments give the k-th value; every entry reaching it is then
+        # a candidate, so ties resolve by row as in a full stable sort.
+        segments = self._segments(col, filters, ranges)
+
+        if not segments:
+            return []
+
+        ends = np.concatenate([values[-k:] if largest else values[:k] for values, _ in segments])
+        ends.sort()
+        cutoff = ends[-min(k, len(ends))] if largest else ends[min(k, len(ends)) - 1]
+
+        candidates = []
+
+        for values, rows in segments:
+            if largest:
+                start = np.searchsorted(values, cutoff, "left")
+                candidates.append((values[start:], rows[start:]))
+            else:
+                stop = np.searchsorted(values, cutoff, "right")
+                candidates.append((values[:stop], rows[:stop]))
+
+        values = np.concatenate([v for v, _ in candidates])
+        rows = np.concatenate([r for _, r in candidates])
+
+        # Ties keep row order, like a stable sort of the whole column
+        order = np.lexsort((rows, -values if largest else values))[:k]
+
+        return [(values[i], int(rows[i])) for i in order]
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# last_used only orders eviction, so hits are recorded in memory and
+# written in one batch every TOUCH_FLUSH_SECONDS or TOUCH_FLUSH_BATCH hits,
+# and before any eviction
+TOUCH_FLUSH_SECONDS = 30
+TOUCH_FLUSH_BATCH = 64
+
+
+class SQLiteStore:
+
+    # One SQLite file shared by every worker process on the host, in WAL
+    # mode: a single connection behind a lock, a thread of its own for
+    # async callers, and batched last_used updates. Subclasses create
+    # their table and set TOUCH_SQL.
+
+    # UPDATE for one hit: the new last_used, then the key passed to _touch
+    TOUCH_SQL = None
+
+    def __init__(self, path, thread_name):
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._touched = {}
+        self._flushed = time.monotonic()
+
+        # Every query takes the lock, so one thread is enough, and async
+        # callers don't queue behind other to_thread work
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+
+    async def call(self, method, *args):
+        # Runs a blocking method of this store on its thread, so waiting
+        # on another worker's write lock never stalls the event loop
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+    def _touch(self, key, now=None):
+
+        # Caller holds the lock; key is a tuple of TOUCH_SQL's WHERE values
+        self._touched[key] = time.time() if now is None else now
+
+        if len(self._touched) >= TOUCH_FLUSH_BATCH or time.monotonic() - self._flushed >= TOUCH_FLUSH_SECONDS:
+            self._flush_touches()
+            self._db.commit()
+
+    def _flush_touches(self):
+
+        if self._touched:
+            self._db.executemany(
+                self.TOUCH_SQL,
+                [(used, *key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+        self._flushed = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._db.commit()
+            self._db.close()
+
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,159 @@
+import logging
+import math
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+MODE_NORMAL = "normal"
+MODE_FALLBACK = "fallback"
+MODE_CACHE_ONLY = "cache_only"
+
+
+class TokenBudget:
+
+    # Per-minute (sliding window) and per-day (UTC) token budgets for agent
+    # runs. A limit of 0 disables that budget. When the remaining share of
+    # either budget drops to low_watermark, new runs degrade to `low_mode`
+    # (the fallback model, or cache-only); once a budget is spent, only
+    # cached answers are served until it refills.
+    #
+    # Usage is only known after a run, so concurrent runs admitted just
+    # before a budget runs out can overshoot it by one run each. Counts are
+    # per process.
+
+    def __init__(
+        self,
+        per_minute=0,
+        per_day=0,
+        low_watermark=0.2,
+        low_mode=MODE_FALLBACK,
+        fallback_model="",
+        clock=time.time,
+    ):
+
+        self.per_minute = max(0, per_minute)
+        self.per_day = max(0, per_day)
+        self.low_watermark = min(max(low_watermark, 0.0), 1.0)
+        self.fallback_model = fallback_model
+        self.clock = clock
+
+        # Without a fallback model there is nothing to degrade to
+        if low_mode == MODE_FALLBACK and not fallback_model:
+            low_mode = MODE_CACHE_ONLY
+        self.low_mode = low_mode
+
+        self._minute = deque()
+        self._minute_tokens = 0
+        self._day = None
+        self._day_tokens = 0
+
+        # ---------- Metrics ----------
+        self.totals = {}
+        self.runs = {}
+        self.degraded = 0
+        self.refused = 0
+
+    # --------------------------------------------------
+    # Windows
+    # --------------------------------------------------
+    def _expire(self, now):
+
+        while self._minute and self._minute[0][0] <= now - 60:
+            self._minute_tokens -= self._minute.popleft()[1]
+
+        day = int(now // 86400)
+        if day != self._day:
+            self._day = day
+            self._day_tokens = 0
+
+    def _remaining(self):
+
+        # Smallest remaining share over the configured budgets
+        shares = [1.0]
+
+        if self.per_minute:
+            shares.append(1 - self._minute_tokens / self.per_minute)
+        if self.per_day:
+            shares.append(1 - self._day_tokens / self.per_day)
+
+        return min(shares)
+
+    # --------------------------------------------------
+    # Routing
+    # --------------------------------------------------
+    def mode(self):
+
+        if not (self.per_minute or self.per_day):
+            return MODE_NORMAL
+
+        self._expire(self.clock())
+        remaining = self._remaining()
+
+        if remaining <= 0:
+            return MODE_CACHE_ONLY
+
+        if remaining <= self.low_watermark:
+            return self.low_mode
+
+        return MODE_NORMAL
+
+    def retry_after(self):
+
+        # Seconds until the exhausted budget(s) have room again
+        now = self.clock()
+        self._expire(now)
+        wait = 1.0
+
+        if self.per_day and self._day_tokens >= self.per_day:
+            wait = max(wait, (self._day + 1) * 86400 - now)
+
+        if self.per_minute and self._minute_tokens >= self.per_minute:
+            # Oldest runs fall out of the window until usage is under the limit
+            excess = self._minute_tokens - self.per_minute
+            for stamp, tokens in self._minute:
+                excess -= tokens
+                if excess < 0:
+                    wait = max(wait, stamp + 60 - now)
+                    break
+
+        return str(math.ceil(wait))
+
+    def record(self, model, tokens_input, tokens_output):
+
+        now = self.clock()
+        self._expire(now)
+
+        tokens = tokens_input + tokens_output
+
+        if tokens:
+            self._minute.append((now, tokens))
+            self._minute_tokens += tokens
+            self._day_tokens += tokens
+
+        totals = self.totals.setdefault(model, {"input": 0, "output": 0})
+        totals["input"] += tokens_input
+        totals["output"] += tokens_output
+        self.runs[model] = self.runs.get(model, 0) + 1
+
+    # --------------------------------------------------
+    # Stats
+    # --------------------------------------------------
+    def stats(self):
+
+        mode = self.mode()
+
+        return {
+            "mode": mode,
+            "per_minute": self.per_minute,
+            "per_day": self.per_day,
+            "minute_tokens": self._minute_tokens,
+            "day_tokens": self._day_tokens,
+            "low_mode": self.low_mode,
+            "fallback_model": self.fallback_model or None,
+            "degraded": self.degraded,
+            "refused": self.refused,
+            "runs": dict(self.runs),
+            "tokens": {model: dict(totals) for model, totals in self.totals.items()},
+        }
@@ -1,85 +1,168 @@
-import matplotlib.pyplot as plt
 import pandas as pd
-import io
-import base64
+import hashlib
+import logging
+
+from backend.services.chart_renderer import ChartRenderPool, CHART_MEDIA_TYPES
+from backend.services.chart_store import ChartStore
+from backend.services.single_flight import SingleFlight
+from backend.core.cache import LRUCache
+from backend.core.tracing import span
+from backend.core.exceptions import AppException
+from backend.core.config import (
+    CHART_EXECUTOR,
+    CHART_WORKERS,
+    CHART_QUEUE_SIZE,
+    CHART_TIMEOUT_SECONDS,
+    CHART_CACHE_MAX_ENTRIES,
+    CHART_CACHE_MAX_BYTES,
+    CHART_STORE_PATH,
+    CHART_STORE_MAX_ENTRIES,
+    CHART_STORE_MAX_BYTES,
+)
+
+
+logger = logging.getLogger(__name__)
 
 
 class VisualizationEngine:
 
-    def __init__(self, df):
+    def __init__(self, df, dataset_version="", dataset_dir=None, purge_store=True):
         self.df = df
+        self.dataset_version = dataset_version
+
+        # Per-process hot images in front of the store shared by all workers
+        self.cache = LRUCache(CHART_CACHE_MAX_ENTRIES, max_bytes=CHART_CACHE_MAX_BYTES)
+
+        # chart_id -> (spec, format) and rendered images, so any worker can
+        # serve (or re-render) a chart planned by another
+        self.store = ChartStore(
+            CHART_STORE_PATH,
+            dataset_version,
+            max_entries=CHART_STORE_MAX_ENTRIES,
+            max_bytes=CHART_STORE_MAX_BYTES,
+            purge=purge_store,
+        )
+
+        # Concurrent requests for the same uncached chart share one render
+        self.flight = SingleFlight("chart")
+        self.pool = ChartRenderPool(
+            df,
+            dataset_dir=dataset_dir,
+            executor=CHART_EXECUTOR,
+            workers=CHART_WORKERS,
+            queue_size=CHART_QUEUE_SIZE,
+            timeout=CHART_TIMEOUT_SECONDS,
+        )
+
+    def is_visual_request(self, intent):
+        return intent.is_visual
+
+    def plan(self, intent):
+
+        # Validation happens here, in-process; only valid specs reach the pool
+        plot_type = intent.chart_type or "hist"
+
+        detected_columns = list(intent.mentioned)
 
-    def is_visual_request(self, question: str):
+        if not detected_columns:
+            return "Specify a valid column.", None
 
-        q = question.lower()
+        if plot_type == "scatter" and len(detected_columns) < 2:
+            plot_type = "hist"
 
-        keywords = [
-            "show",
-            "plot",
-            "chart",
-            "graph",
-            "scatter",
-            "visualize",
-            "draw",
-            "display"
-        ]
+        if plot_type == "hist" and not pd.api.types.is_numeric_dtype(self.df[detected_columns[0]]):
+            return "Histogram requires numeric column.", None
 
-        return any(k in q for k in keywords)
+        spec = {
+            "plot_type": plot_type,
+            "columns": tuple(detected_columns[:2] if plot_type == "scatter" else detected_columns[:1]),
+            "filters": intent.filters,
+            "ranges": intent.ranges,
+        }
 
-    def generate(self, question: str):
+        return "Here is the requested visualization.", spec
 
-        q = question.lower()
+    def chart_key(self, spec, fmt="png"):
 
-        if "scatter" in q:
-            plot_type = "scatter"
-        elif "pie" in q:
-            plot_type = "pie"
-        elif "bar" in q:
-            plot_type = "bar"
-        else:
-            plot_type = "hist"
+        # Content address: same plot of the same data -> same key. Ranges
+        # only join the identity when present, so existing keys are stable.
+        identity = (
+            spec["plot_type"],
+            spec["columns"],
+            spec["filters"],
+            self.dataset_version,
+            fmt,
+        )
 
-        detected_columns = [
-            col for col in self.df.columns
-            if col.lower() in q
-        ]
+        if spec.get("ranges"):
+            identity += (spec["ranges"],)
 
-        if not detected_columns:
-            return "Specify a valid column.", None
+        identity = repr(identity)
 
-        fig = plt.figure()
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
 
-        try:
+    async def generate(self, intent, fmt="png"):
+
+        answer, spec = self.plan(intent)
 
-            if plot_type == "scatter" and len(detected_columns) >= 2:
-                x, y = detected_columns[:2]
-                plt.scatter(self.df[x], self.df[y])
-                plt.xlabel(x)
-                plt.ylabel(y)
+        if spec is None:
+            return answer, None
 
-            elif plot_type == "pie":
-                col = detected_columns[0]
-                self.df[col].value_counts().plot(kind="pie", autopct="%1.1f%%")
+        chart_id = self.chart_key(spec, fmt)
+        await self.store.call(self.store.put_spec, chart_id, spec, fmt)
 
-            elif plot_type == "bar":
-                col = detected_columns[0]
-                self.df[col].value_counts().plot(kind="bar")
+        try:
+            await self.render(chart_id)
 
-            else:
-                col = detected_columns[0]
-                if not pd.api.types.is_numeric_dtype(self.df[col]):
-                    return "Histogram requires numeric column.", None
-                self.df[col].dropna().hist()
+        except AppException:
+            raise
 
         except Exception:
-            plt.close(fig)
+            logger.exception("chart_failed")
             return "Failed to generate chart.", None
 
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format="png")
-        plt.close(fig)
-        buffer.seek(0)
+        return answer, {"id": chart_id, "format": fmt}
+
+    async def render(self, chart_id):
+
+        image = self.cache.get(chart_id)
+
+        if image is not None:
+            return image
+
+        return await self.flight.do(chart_id, lambda: self._render(chart_id))
+
+    async def _render(self, chart_id):
+
+        # Another worker may already have rendered it
+        image = await self.store.call(self.store.get_image, chart_id)
+
+        if image is None:
+            entry = await self.store.call(self.store.get_spec, chart_id)
+
+            if entry is None:
+                return None
+
+            with span("chart_render", format=entry[1]):
+                image = await self.pool.render(*entry)
+            await self.store.call(self.store.put_image, chart_id, image)
+
+        self.cache.put(chart_id, image)
+
+        return image
+
+    async def has_chart(self, chart_id):
+        return await self.store.call(self.store.get_spec, chart_id) is not None
+
+    async def get_chart(self, chart_id):
+
+        entry = await self.store.call(self.store.get_spec, chart_id)
+
+        if entry is None:
+            return None, None
 
-        image_base64 = base64.b64encode(buffer.read()).decode("utf-8")
+        return await self.render(chart_id), CHART_MEDIA_TYPES[entry[1]]
 
-        return "Here is the requested visualization.", image_base64
\ No newline at end of file
+    def shutdown(self):
+        self.pool.shutdown()
+        self.store.close()
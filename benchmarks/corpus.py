@@ -0,0 +1,148 @@
+import json
+import os
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED_PATH = os.path.join(ROOT, "benchmarks", "seed_questions.json")
+
+
+# ----------------------------------------------------------
+# Templates
+# ----------------------------------------------------------
+
+FILTERS = [
+    "", "male", "female", "first class", "second class", "third class",
+    "male first class", "female third class", "surviving", "non-surviving",
+]
+
+DETERMINISTIC = [
+    "How many {f} passengers were there?",
+    "How many {f} passengers survived?",
+    "What percentage of passengers were {f}?",
+    "What was the average age of {f} passengers?",
+    "What was the average fare of {f} passengers?",
+    "What was the maximum fare paid by {f} passengers?",
+    "What was the minimum age of {f} passengers?",
+    "Survival rate by class",
+    "Survival rate by sex",
+    "Which class had the highest survival rate?",
+    "Who was the oldest passenger?",
+    "How many passengers by class?",
+]
+
+# Analyst-style questions: spreads, quantiles, cross-tabs, correlations,
+# numeric ranges and ports
+ANALYTIC = [
+    "What is the median age of {f} passengers?",
+    "What is the median fare of {f} passengers?",
+    "What is the standard deviation of fare for {f} passengers?",
+    "What is the 90th percentile of fare for {f} passengers?",
+    "What is the upper quartile of age for {f} passengers?",
+    "How many {f} passengers were older than {n}?",
+    "How many {f} passengers were younger than {n}?",
+    "How many {f} passengers paid more than {n}?",
+    "What was the average fare of {f} passengers between {n} and {m} years old?",
+    "What was the survival rate of {f} passengers with fare between {n} and {m}?",
+    "What percentage of {f} passengers were under {n}?",
+    "What was the survival rate of {f} passengers?",
+    "How many {f} passengers embarked from {p}?",
+    "What was the survival rate of passengers from {p}?",
+    "What was the average fare by class for {f} passengers?",
+    "What was the median age by sex?",
+    "Survival rate by sex and class",
+    "How many passengers by sex and class?",
+    "Survival rate by class and port",
+    "Is fare correlated with survival?",
+    "What is the correlation between age and fare?",
+    "Is age correlated with survival for {f} passengers?",
+    "What were the top {k} fares paid by {f} passengers?",
+    "Who were the {k} oldest {f} passengers?",
+    "How many {f} passengers paid more than the median fare?",
+    "What was the median fare of {f} passengers older than {n}?",
+]
+
+PORTS = ["Cherbourg", "Queenstown", "Southampton"]
+
+CHARTS = [
+    "Show a histogram of age for {f} passengers",
+    "Histogram of fare for {f} passengers",
+    "Pie chart of embarked for {f} passengers",
+    "Bar chart of pclass for {f} passengers",
+    "Scatter plot of age vs fare for {f} passengers",
+]
+
+LLM = [
+    "Is fare correlated with survival for passengers over {n}?",
+    "Did families with more than {k} relatives aboard survive more often?",
+    "What does the data say about ticket prefixes and class?",
+    "Were passengers with cabins more likely to survive than those without?",
+    "Is there a relationship between title in the name and survival?",
+    "Did passengers who embarked at Cherbourg pay more than {n} on average?",
+]
+
+
+def _fill(template, rng):
+    fields = dict(
+        f=rng.choice(FILTERS),
+        n=rng.choice([20, 30, 40, 50, 60]),
+        k=rng.choice([1, 2, 3, 4]),
+    )
+
+    # Drawn only when used, so build_corpus output stays the same per seed
+    if "{m}" in template:
+        fields["m"] = rng.choice([70, 80, 100])
+    if "{p}" in template:
+        fields["p"] = rng.choice(PORTS)
+
+    text = template.format(**fields)
+    return " ".join(text.split())
+
+
+def seed_questions(path=SEED_PATH):
+
+    # Free-form user questions kept as a fixture: greetings, questions about
+    # the text columns and phrasings the templates don't cover
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_corpus(size=500, seed=7, mix=(0.6, 0.15, 0.15), path=SEED_PATH):
+
+    # mix = share of deterministic, chart and LLM questions; the seed
+    # questions fill the rest
+    rng = random.Random(seed)
+    seeds = seed_questions(path)
+
+    corpus = []
+
+    for _ in range(size):
+        roll = rng.random()
+
+        if roll < mix[0]:
+            corpus.append(_fill(rng.choice(DETERMINISTIC), rng))
+        elif roll < mix[0] + mix[1]:
+            corpus.append(_fill(rng.choice(CHARTS), rng))
+        elif roll < sum(mix):
+            corpus.append(_fill(rng.choice(LLM), rng))
+        else:
+            corpus.append(rng.choice(seeds))
+
+    return corpus
+
+
+def reference_corpus(per_template=8, seed=11, path=SEED_PATH):
+
+    # Fixed question set for measuring how often the LLM is still needed:
+    # every template a few times with seeded fills, plus the seed
+    # questions. Stable for a given seed, so rates compare across commits.
+    rng = random.Random(seed)
+    questions = []
+
+    for template in DETERMINISTIC + ANALYTIC + CHARTS + LLM:
+        for _ in range(per_template if "{" in template else 1):
+            questions.append(_fill(template, rng))
+
+    questions.extend(seed_questions(path))
+
+    return list(dict.fromkeys(questions))
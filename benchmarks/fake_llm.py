@@ -0,0 +1,55 @@
+import asyncio
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class FakeChatGroq(BaseChatModel):
+
+    # Deterministic local stand-in for ChatGroq. Every agent run takes two
+    # model calls, like a typical ReAct answer: one python_repl_ast action
+    # on the DataFrame (using the question's first number, if any), then a
+    # final answer that quotes the observation. Each call sleeps `latency`
+    # seconds to mimic the network round trip.
+
+    latency: float = 0.05
+
+    @property
+    def _llm_type(self):
+        return "fake-groq"
+
+    def _reply(self, messages):
+
+        prompt = messages[-1].content
+        question, _, scratchpad = prompt.rpartition("Question: ")[2].partition("\n")
+
+        if "Observation:" not in scratchpad:
+            numbers = re.findall(r"\d+", question)
+            code = (
+                f"df[df['Age'] > {numbers[0]}]['Fare'].mean()"
+                if numbers else "df['Survived'].mean()"
+            )
+            text = (
+                "Thought: I should look at the data.\n"
+                "Action: python_repl_ast\n"
+                f"Action Input: {code}"
+            )
+        else:
+            observation = scratchpad.rsplit("Observation:", 1)[1].split("\n", 1)[0].strip()
+            text = (
+                "Thought: I now know the final answer\n"
+                f"Final Answer: Based on the data, the answer is {observation}."
+            )
+
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
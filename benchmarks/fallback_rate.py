@@ -0,0 +1,120 @@
+# Routes the reference question corpus through the local layers (invalid
+# guard, deterministic engine, visualization) without calling any model,
+# and reports the share of questions that would still fall through to the
+# LLM. Exits with status 1 when that share grows against the stored
+# reference.
+#
+#     python -m benchmarks.fallback_rate                   # compare with reference
+#     python -m benchmarks.fallback_rate --update-reference
+#     python -m benchmarks.fallback_rate --show 40         # list fall-throughs
+
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFERENCE_PATH = os.path.join(ROOT, "benchmarks", "fallback_reference.json")
+
+# Only the local layers run; the key is never used
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import reference_corpus  # noqa: E402
+
+
+def classify(questions):
+
+    from backend.core.config import DATASET_CACHE_DIR, DATASET_PATH
+    from backend.core.dataset import load_dataset
+    from backend.services.deterministic_engine import DeterministicEngine
+    from backend.services.intent_parser import IntentParser
+
+    dataset = load_dataset(DATASET_PATH, DATASET_CACHE_DIR)
+    parser = IntentParser(dataset.frame, dataset.text_columns)
+    engine = DeterministicEngine(dataset.frame)
+
+    layers = {}
+
+    # Same order as TitanicAgentService._route_local
+    for question in questions:
+
+        intent = parser.parse(question)
+
+        if intent.is_invalid:
+            layer = "invalid"
+        elif intent.key is not None and engine.handle(intent):
+            layer = "deterministic"
+        elif intent.is_visual:
+            layer = "visualization"
+        else:
+            layer = "llm"
+
+        layers.setdefault(layer, []).append(question)
+
+    return layers
+
+
+def report(layers):
+
+    # Invalid questions never reach the model either way; they are left
+    # out of the rate so it only moves with answerable questions
+    answerable = sum(len(q) for layer, q in layers.items() if layer != "invalid")
+    fallback = len(layers.get("llm", []))
+
+    return {
+        "questions": sum(len(q) for q in layers.values()),
+        "layers": {layer: len(q) for layer, q in sorted(layers.items())},
+        "fallback_rate": round(fallback / answerable, 4) if answerable else 0.0,
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Measure the LLM fallback rate over the reference corpus.")
+    parser.add_argument("--per-template", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--reference", default=REFERENCE_PATH)
+    parser.add_argument("--update-reference", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="allowed absolute growth of the rate")
+    parser.add_argument("--show", type=int, default=15, help="fall-through questions to list")
+    args = parser.parse_args()
+
+    layers = classify(reference_corpus(args.per_template, args.seed))
+    result = report(layers)
+    result["config"] = {"per_template": args.per_template, "seed": args.seed}
+
+    print(f"{result['questions']} questions: " + ", ".join(f"{k} {v}" for k, v in result["layers"].items()))
+    print(f"fallback rate: {result['fallback_rate'] * 100:.2f}%")
+
+    for question in layers.get("llm", [])[:args.show]:
+        print(f"  llm: {question}")
+
+    if args.update_reference:
+        with open(args.reference, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nreference written to {args.reference}")
+        return
+
+    if not os.path.exists(args.reference):
+        print("\nno reference stored; run with --update-reference to record one")
+        return
+
+    with open(args.reference) as f:
+        reference = json.load(f)
+
+    if reference.get("config") != result["config"]:
+        print("\nwarning: corpus configuration differs from the reference's")
+
+    limit = reference["fallback_rate"] + args.tolerance
+
+    if result["fallback_rate"] > limit:
+        print(f"REGRESSION: fallback rate {result['fallback_rate']} > {limit:.4f} (reference {reference['fallback_rate']})")
+        sys.exit(1)
+
+    print(f"\nno regression against reference ({reference['fallback_rate'] * 100:.2f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Start-up budget check: imports backend.main in a fresh interpreter and
+# exits with status 1 when the import takes longer than the budget, when a
+# subsystem that must load lazily was imported on the way, or when the
+# first deterministic answer is not served straight away.
+#
+#     python benchmarks/import_budget.py [budget_ms]
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = 1500
+
+# Only the chart workers and the LLM layer may import these, on first use
+LAZY_MODULES = ("matplotlib", "langchain", "langchain_core", "langchain_groq", "langchain_experimental")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import backend.main
+imported = time.perf_counter()
+svc = backend.main.agent_service
+question = "how many passengers survived"
+result = svc._route_deterministic(question, svc.parser.parse(question))
+answered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_answer_ms": (answered - imported) * 1000,
+    "layer": result["layer"] if result else None,
+    "modules": sorted({m.split(".")[0] for m in sys.modules}),
+}))
+"""
+
+
+def measure():
+
+    env = dict(os.environ, WARMUP_ON_START="false")
+    env.setdefault("GROQ_API_KEY", "budget-check")
+
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+    report = measure()
+
+    leaked = [m for m in LAZY_MODULES if m in report["modules"]]
+
+    print(f"import backend.main: {report['import_ms']:.0f} ms (budget {budget:.0f} ms)")
+    print(f"first deterministic answer: {report['first_answer_ms']:.2f} ms ({report['layer']})")
+
+    failures = []
+
+    if report["import_ms"] > budget:
+        failures.append("import time over budget")
+
+    if leaked:
+        failures.append(f"imported eagerly: {', '.join(leaked)}")
+
+    if report["layer"] != "deterministic":
+        failures.append("deterministic layer did not answer")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# Replays a question corpus through TitanicAgentService.run and through
+# HTTP /chat, with a local stand-in for the Groq model, and reports
+# throughput, per-layer latency percentiles and memory. Exits with status 1
+# when a result regresses against the stored baseline.
+#
+#     python -m benchmarks.run                      # compare with baseline
+#     python -m benchmarks.run --update-baseline    # record a new baseline
+#     python -m benchmarks.run --mode http --llm-latency 0.2 --concurrency 16
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# Isolated, reproducible runs: no persistent caches, no background warmup,
+# no real model
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+os.environ.setdefault("LLM_CACHE_PATH", ":memory:")
+os.environ.setdefault("CHART_STORE_PATH", ":memory:")
+os.environ.setdefault("LLM_PLAN_PATH", ":memory:")
+os.environ.setdefault("WARMUP_ON_START", "false")
+
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import build_corpus  # noqa: E402
+
+
+# ----------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------
+
+def percentile(sorted_values, q):
+
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def rss_mb():
+
+    # Current resident set size (Linux); falls back to the peak elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(samples, elapsed):
+
+    layers = {}
+
+    for layer, seconds in samples:
+        layers.setdefault(layer, []).append(seconds * 1000)
+
+    report = {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "layers": {},
+    }
+
+    for layer, values in sorted(layers.items()):
+        values.sort()
+        report["layers"][layer] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+        }
+
+    return report
+
+
+async def replay(corpus, ask, concurrency):
+
+    samples = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(question):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                layer = await ask(question)
+            except Exception as exc:
+                layer = f"error:{getattr(exc, 'status_code', type(exc).__name__)}"
+            samples.append((layer, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in corpus))
+
+    return summarize(samples, time.perf_counter() - start)
+
+
+# ----------------------------------------------------------
+# Targets
+# ----------------------------------------------------------
+
+def build_service(llm_latency):
+
+    from backend.services.agent_service import TitanicAgentService
+    from backend.services.llm_engine import LLMEngine
+    from benchmarks.fake_llm import FakeChatGroq
+
+    service = TitanicAgentService()
+    service.llm_engine = LLMEngine(
+        service.dataset.full_frame,
+        llm=FakeChatGroq(latency=llm_latency),
+        sandbox=service.sandbox,
+    )
+
+    # Start-up costs are measured separately (import_budget.py)
+    service.warmup()
+
+    return service
+
+
+async def bench_service(corpus, args):
+
+    service = build_service(args.llm_latency)
+
+    async def ask(question):
+        result = await service.run(question, args.chart_format)
+        return result["layer"]
+
+    try:
+        return await replay(corpus, ask, args.concurrency)
+    finally:
+        service.shutdown()
+
+
+async def bench_http(corpus, args):
+
+    import httpx
+
+    if args.url:
+        transport, base_url, service = None, args.url, None
+    else:
+        # In-process ASGI: the full FastAPI stack without a socket
+        import backend.main as app_module
+        from backend.services.llm_engine import LLMEngine
+        from benchmarks.fake_llm import FakeChatGroq
+
+        service = app_module.agent_service
+        service.llm_engine = LLMEngine(
+            service.dataset.full_frame,
+            llm=FakeChatGroq(latency=args.llm_latency),
+            sandbox=service.sandbox,
+        )
+        service.warmup()
+
+        transport, base_url = httpx.ASGITransport(app=app_module.app), "http://bench"
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=120) as client:
+
+        async def ask(question):
+            response = await client.post(
+                "/chat",
+                json={"question": question, "chart_format": args.chart_format},
+            )
+            if response.status_code != 200:
+                return f"error:{response.status_code}"
+            return response.json().get("layer") or "unknown"
+
+        try:
+            return await replay(corpus, ask, args.concurrency)
+        finally:
+            if service is not None:
+                service.shutdown()
+
+
+# ----------------------------------------------------------
+# Baseline
+# ----------------------------------------------------------
+
+def compare(report, baseline, tolerance, slack_ms):
+
+    # A layer regresses when its p95 grows beyond tolerance (plus a small
+    # absolute slack, so microsecond layers don't flap); a run regresses
+    # when throughput drops or peak memory grows beyond tolerance
+    failures = []
+
+    for mode, current in report["modes"].items():
+
+        base = baseline.get("modes", {}).get(mode)
+        if base is None:
+            continue
+
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            failures.append(
+                f"{mode}: throughput {current['throughput_rps']} rps < baseline {base['throughput_rps']} rps"
+            )
+
+        for layer, stats in current["layers"].items():
+            ref = base["layers"].get(layer)
+            if ref is None:
+                continue
+
+            limit = ref["p95_ms"] * (1 + tolerance) + slack_ms
+            if stats["p95_ms"] > limit:
+                failures.append(
+                    f"{mode}/{layer}: p95 {stats['p95_ms']} ms > {limit:.3f} ms (baseline {ref['p95_ms']} ms)"
+                )
+
+    base_memory = baseline.get("memory", {}).get("peak_rss_mb")
+    if base_memory and report["memory"]["peak_rss_mb"] > base_memory * (1 + tolerance):
+        failures.append(
+            f"memory: peak RSS {report['memory']['peak_rss_mb']} MB > baseline {base_memory} MB"
+        )
+
+    return failures
+
+
+def print_report(report):
+
+    for mode, result in report["modes"].items():
+        print(f"\n[{mode}] {result['requests']} requests, {result['throughput_rps']} req/s")
+        print(f"  {'layer':<16}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+        for layer, stats in result["layers"].items():
+            print(
+                f"  {layer:<16}{stats['count']:>7}"
+                f"{stats['p50_ms']:>11.3f}{stats['p95_ms']:>11.3f}{stats['p99_ms']:>11.3f}"
+            )
+
+    memory = report["memory"]
+    print(f"\nmemory: rss {memory['rss_start_mb']} -> {memory['rss_end_mb']} MB, peak {memory['peak_rss_mb']} MB")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Replay the question corpus and check for regressions.")
+    parser.add_argument("--mode", choices=["service", "http", "both"], default="both")
+    parser.add_argument("--size", type=int, default=500, help="questions in the generated corpus")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake model call")
+    parser.add_argument("--chart-format", default="png")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=1.0, help="allowed absolute p95 regression")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    # Request logs are not part of what is measured here
+    logging.disable(logging.INFO)
+
+    corpus = build_corpus(args.size, args.seed)
+    rss_start = rss_mb()
+
+    modes = ["service", "http"] if args.mode == "both" else [args.mode]
+    report = {
+        "config": {
+            "size": args.size,
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "chart_format": args.chart_format,
+        },
+        "modes": {},
+    }
+
+    for mode in modes:
+        bench = bench_service if mode == "service" else bench_http
+        report["modes"][mode] = asyncio.run(bench(corpus, args))
+
+    report["memory"] = {
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nbaseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\nno baseline stored; run with --update-baseline to record one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if baseline.get("config") != report["config"]:
+        print("\nwarning: run configuration differs from the baseline's")
+
+    failures = compare(report, baseline, args.tolerance, args.slack_ms)
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+
+    if failures:
+        sys.exit(1)
+
+    print("\nno regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 import streamlit as st
 import requests
-import base64
-from PIL import Image
-import io
+import json
 
 API_URL = "https://titanic-backend-klbp.onrender.com/chat"
+BASE_URL = API_URL.rsplit("/chat", 1)[0]
+STREAM_URL = API_URL + "/stream"
+
+# WebP keeps chart downloads small; the backend also offers png, svg and spec
+CHART_FORMAT = "webp"
 
 st.set_page_config(
     page_title="Titanic AI",
@@ -191,21 +194,62 @@ if prompt := st.chat_input("Message Titanic AI..."):
 
     try:
         res = requests.post(
-            API_URL,
-            json={"question": prompt},
+            STREAM_URL,
+            json={"question": prompt, "chart_format": CHART_FORMAT},
+            stream=True,
             timeout=120
         )
 
+        data = None
+        error = None
+        partial = ""
+
+        # Server-Sent Events: agent steps and answer tokens arrive as they
+        # are produced, the "final" event carries the complete answer
+        for line in res.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+
+            event = json.loads(line[len("data:"):])
+
+            if event["event"] == "step":
+                thinking_placeholder.markdown(
+                    f"""
+                    <div class="typing-container">
+                        <div class="typing-bubble">Running <code>{event["tool"]}</code>…</div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            elif event["event"] == "token":
+                partial += event["text"]
+                thinking_placeholder.markdown(
+                    f"""
+                    <div class="assistant-container">
+                        <div class="assistant-bubble">{partial.strip()}</div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            elif event["event"] == "final":
+                data = event
+
+            elif event["event"] == "error":
+                error = event.get("error")
+
         thinking_placeholder.empty()
 
-        if res.status_code == 200:
-            data = res.json()
+        if res.status_code == 200 and data is not None:
             answer = data.get("answer", "No response")
             image = None
 
-            if data.get("chart"):
-                image_bytes = base64.b64decode(data["chart"])
-                image = Image.open(io.BytesIO(image_bytes))
+            # Charts arrive by reference and are fetched as raw bytes
+            if data.get("chart_url"):
+                chart_res = requests.get(BASE_URL + data["chart_url"], timeout=60)
+                if chart_res.status_code == 200:
+                    image = chart_res.content
 
             st.markdown(
                 f"""
@@ -226,7 +270,7 @@ if prompt := st.chat_input("Message Titanic AI..."):
             })
 
         else:
-            st.error("Server error. Please try again.")
+            st.error(error or "Server error. Please try again.")
 
     except requests.exceptions.Timeout:
         thinking_placeholder.empty()
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Config is read at import time: no model calls, no warmup, per-process
+# stores, thread-rendered charts, in-process sandbox, admin endpoints closed
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("WARMUP_ON_START", "false")
+os.environ.setdefault("LLM_CACHE_PATH", ":memory:")
+os.environ.setdefault("CHART_STORE_PATH", ":memory:")
+os.environ.setdefault("LLM_PLAN_PATH", ":memory:")
+os.environ.setdefault("CHART_EXECUTOR", "thread")
+os.environ.setdefault("CODE_SANDBOX", "inline")
+os.environ.pop("ADMIN_TOKEN", None)
+
+sys.path.insert(0, ROOT)
+
+from backend.core.config import DATASET_PATH  # noqa: E402
+from backend.core.dataset import load_dataset  # noqa: E402
+from backend.services.chunked_engine import ChunkedEngine  # noqa: E402
+from backend.services.deterministic_engine import DeterministicEngine  # noqa: E402
+from backend.services.intent_parser import IntentParser  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    return load_dataset(DATASET_PATH, str(tmp_path_factory.mktemp("columns")))
+
+
+@pytest.fixture(scope="session")
+def parser(dataset):
+    return IntentParser(dataset.frame, dataset.text_columns)
+
+
+@pytest.fixture(scope="session")
+def engine(dataset):
+    return DeterministicEngine(dataset.frame)
+
+
+@pytest.fixture(scope="session")
+def chunked(dataset):
+    # Small chunks so every answer merges partials from several of them
+    return ChunkedEngine(dataset, chunk_rows=300, workers=0)
+
+
+@pytest.fixture(scope="session")
+def ask(parser, engine):
+
+    # Question -> deterministic answer (None when it would go to the LLM)
+    def ask(question):
+        intent = parser.parse(question)
+        return engine.handle(intent) if intent.key is not None else None
+
+    return ask
+
+
+@pytest.fixture(scope="session")
+def client():
+
+    from backend.main import app
+
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,5 @@
+def test_admin_reload_closed_without_token(client):
+
+    # ADMIN_TOKEN is not set in tests
+    assert client.post("/admin/reload").status_code == 403
+    assert client.post("/admin/reload", headers={"X-Admin-Token": ""}).status_code == 403
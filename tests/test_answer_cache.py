@@ -0,0 +1,35 @@
+import pytest
+
+from backend.services.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def cache():
+    cache = AnswerCache(":memory:", "v1", "model", similarity=0.8, columns=["Name", "Age"])
+    yield cache
+    cache.close()
+
+
+def test_paraphrase_hit(cache):
+
+    cache.put("what is the most common title in passenger names aboard the titanic", "Mr")
+
+    assert cache.get("what is the most common title in passenger names aboard titanic") == "Mr"
+
+
+@pytest.mark.parametrize("stored, asked", [
+    (
+        "what is the most common title in passenger names aboard titanic ship",
+        "what is the least common title in passenger names aboard titanic ship",
+    ),
+    (
+        "which family names appear most frequently among the passengers",
+        "which family names appear least frequently among the passengers",
+    ),
+])
+def test_opposite_direction_is_a_miss(cache, stored, asked):
+
+    cache.put(stored, "stored answer")
+
+    assert cache.get(asked) is None
+
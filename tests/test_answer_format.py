@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("what percentage of passengers were male", "64.76% of passengers were male."),
+    ("what percentage of passengers survived", "38.38% of passengers survived."),
+    ("what percentage of first class women survived", "10.21% of passengers were female in 1st class and survived."),
+    ("percentage of passengers embarked from q who died", "5.27% of passengers embarked at Queenstown and died."),
+    ("what percentage of passengers are older than 60", "2.47% of passengers had Age > 60."),
+])
+def test_percentage_names_the_selection(ask, chunked, parser, question, answer):
+
+    assert ask(question) == answer
+    assert chunked.handle(parser.parse(question)) == answer
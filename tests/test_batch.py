@@ -0,0 +1,21 @@
+from backend.main import agent_service
+
+
+def test_batch_parses_each_question_once(client, monkeypatch):
+
+    parsed = []
+    parse = agent_service.parser.parse
+
+    def counting_parse(question):
+        parsed.append(question)
+        return parse(question)
+
+    monkeypatch.setattr(agent_service.parser, "parse", counting_parse)
+
+    # One deterministic answer and one chart, which leaves the first pass
+    questions = ["how many passengers survived", "show a histogram of age"]
+    response = client.post("/chat/batch", json={"questions": questions})
+
+    assert response.status_code == 200
+    assert [item["layer"] for item in response.json()["results"]] == ["deterministic", "visualization"]
+    assert sorted(parsed) == sorted(questions)
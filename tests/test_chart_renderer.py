@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.core.exceptions import AppException
+from backend.services.chart_renderer import ChartRenderPool
+
+
+def test_timed_out_render_keeps_its_slot_until_it_ends(dataset):
+
+    pool = ChartRenderPool(dataset.frame, executor="thread", workers=1, queue_size=0, timeout=0.1)
+    finish = threading.Event()
+
+    # A render stuck in its worker past the timeout
+    pool._submit = lambda spec, fmt: pool._get_executor().submit(finish.wait, 5)
+
+    async def render():
+        return await pool.render({}, "png")
+
+    try:
+        with pytest.raises(AppException) as timed_out:
+            asyncio.run(render())
+
+        assert timed_out.value.status_code == 504
+        assert pool.stats()["pending"] == 1
+
+        with pytest.raises(AppException) as busy:
+            asyncio.run(render())
+
+        assert busy.value.status_code == 503
+
+        finish.set()
+        pool._get_executor().submit(lambda: None).result()
+
+        assert pool.stats()["pending"] == 0
+
+    finally:
+        finish.set()
+        pool.shutdown()
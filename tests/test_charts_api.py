@@ -0,0 +1,9 @@
+def test_chart_conditional_request(client):
+
+    url = client.post("/chat", json={"question": "show a histogram of fare"}).json()["chart_url"]
+    etag = client.get(url).headers["etag"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # A matching ETag for a chart that does not exist is still a 404
+    assert client.get("/charts/deadbeef", headers={"If-None-Match": '"deadbeef"'}).status_code == 404
@@ -0,0 +1,43 @@
+import asyncio
+import multiprocessing.process
+import threading
+
+import pandas as pd
+
+from backend.services.code_sandbox import CodeSandbox
+
+
+def test_timeout_kills_the_worker_without_joining_on_the_loop(monkeypatch):
+
+    sandbox = CodeSandbox(frame=pd.DataFrame({"Age": [22.0, 38.0]}), workers=1, timeout=0.5, memory_mb=0)
+
+    joins = []
+    join = multiprocessing.process.BaseProcess.join
+
+    def recording_join(process, timeout=None):
+        joins.append(threading.current_thread().name)
+        return join(process, timeout)
+
+    monkeypatch.setattr(multiprocessing.process.BaseProcess, "join", recording_join)
+
+    async def run():
+        output = await sandbox.run("import time\ntime.sleep(30)")
+        busy = sandbox._busy or None
+        # Give the reaper thread its turn
+        await asyncio.sleep(0.2)
+        return output, busy, threading.current_thread().name
+
+    try:
+        output, busy, loop_thread = asyncio.run(run())
+
+        assert output == "TimeoutError: exceeded the 0.5 s time limit"
+        assert busy is None and sandbox.replaced == 1
+        assert joins and loop_thread not in joins
+
+        # A fresh worker replaces it (started here: a cold start alone
+        # could take longer than the 0.5 s limit)
+        sandbox.warmup()
+        assert asyncio.run(sandbox.run("df['Age'].max()")) == "38.0"
+
+    finally:
+        sandbox.shutdown()
@@ -0,0 +1,21 @@
+import sys
+
+import pytest
+
+from backend.core.dataset import load_dataset
+from backend.core.exceptions import AppException
+
+
+def test_parquet_without_pyarrow_names_the_dependency(tmp_path, monkeypatch):
+
+    source = tmp_path / "titanic.parquet"
+    source.write_bytes(b"PAR1")
+
+    # As if pyarrow were not installed
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+
+    with pytest.raises(AppException) as missing:
+        load_dataset(str(source), str(tmp_path / "columns"))
+
+    assert "pyarrow" in missing.value.message
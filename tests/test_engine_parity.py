@@ -0,0 +1,65 @@
+import itertools
+
+from benchmarks.corpus import reference_corpus
+
+
+# The chunked engine (out-of-core datasets) must word every answer exactly
+# like the in-memory engine; questions cover the cube, the sorted indexes
+# and the row-mask path
+HEADS = [
+    "how many", "what percentage of", "average fare of", "max age of", "min fare of",
+    "median age of", "standard deviation of fare for", "90th percentile of fare for",
+    "oldest", "youngest", "top 7 fares of", "bottom 4 ages of", "survival rate of",
+    "highest survival rate of", "how many by class", "median fare by sex for",
+    "average age by class for", "how many by sex and class", "survival rate by sex and class",
+    "correlation between age and fare for", "how many by port",
+]
+
+SUBJECTS = ["", "female", "third class women", "survivors", "embarked from q"]
+
+CONDITIONS = [
+    "", "younger than 5", "between 20 and 40 years old", "with fare below the median fare",
+    "with fare above 600", "with fare between 10 and 20 and older than 30",
+]
+
+
+def _mismatches(parser, engine, chunked, questions):
+
+    seen = set()
+    mismatches = []
+
+    for question in questions:
+        intent = parser.parse(question)
+
+        if intent.key is None or intent.key in seen:
+            continue
+
+        seen.add(intent.key)
+
+        expected = engine.handle(intent)
+        answer = chunked.handle(intent)
+
+        if answer != expected:
+            mismatches.append((question, expected, answer))
+
+    return seen, mismatches
+
+
+def test_grid_parity(parser, engine, chunked):
+
+    questions = [
+        f"{head} {subject} passengers {condition}"
+        for head, subject, condition in itertools.product(HEADS, SUBJECTS, CONDITIONS)
+    ]
+
+    seen, mismatches = _mismatches(parser, engine, chunked, questions)
+
+    assert len(seen) > 300
+    assert mismatches == []
+
+
+def test_reference_corpus_parity(parser, engine, chunked):
+
+    _, mismatches = _mismatches(parser, engine, chunked, reference_corpus())
+
+    assert mismatches == []
@@ -0,0 +1,12 @@
+from benchmarks.import_budget import DEFAULT_BUDGET_MS, LAZY_MODULES, measure
+
+
+def test_import_budget():
+
+    # backend.main in a fresh interpreter: fast to import, heavy
+    # subsystems left for first use, deterministic answers ready at once
+    report = measure()
+
+    assert report["import_ms"] <= DEFAULT_BUDGET_MS
+    assert not [m for m in LAZY_MODULES if m in report["modules"]]
+    assert report["layer"] == "deterministic"
@@ -0,0 +1,86 @@
+import pytest
+
+
+# ----------------------------------------------------------
+# Parsed Intents
+# ----------------------------------------------------------
+
+@pytest.mark.parametrize("question, operation, columns, filters, ranges, param", [
+    ("How many passengers survived?", "count", (), (("Survived", 1),), (), None),
+    ("What was the average age of male passengers?", "mean", ("Age",), (("Sex", "male"),), (), None),
+    ("Survival rate by class", "group_survival_rate", ("Pclass",), (), (), None),
+    ("How many passengers by class?", "grouped_count", ("Pclass",), (), (), None),
+    ("How many passengers by sex and class?", "crosstab_count", ("Sex", "Pclass"), (), (), None),
+    ("What is the upper quartile of age?", "percentile", ("Age",), (), (), 75.0),
+    ("first quartile of fare", "percentile", ("Fare",), (), (), 25.0),
+    # A bare condition is a count
+    ("fare between 10 and 50", "count", (), (), (("Fare", "<=", 50), ("Fare", ">=", 10)), None),
+    ("fare above median by class", "grouped_count", ("Pclass",), (), (("Fare", ">", "median"),), None),
+    # Port codes only after "from" / "embarked"
+    ("How many passengers embarked from S?", "count", (), (("Embarked", "S"),), (), None),
+    ("survival rate of passengers from Q", "survival_rate", (), (("Embarked", "Q"),), (), None),
+])
+def test_parsed_intent(parser, question, operation, columns, filters, ranges, param):
+
+    intent = parser.parse(question)
+
+    assert (intent.operation, intent.columns, intent.filters, intent.ranges, intent.param) == (
+        operation, columns, filters, ranges, param,
+    )
+
+
+@pytest.mark.parametrize("question", [
+    # Statistics grouped by two columns, text columns, rankings without a
+    # column and stray letters are left to the agent
+    "average fare by sex and class",
+    "names of passengers older than 60",
+    "bottom 3 younger than 18 passengers",
+    "passenger s fare",
+    "What was the most common title in passenger names?",
+])
+def test_left_to_llm(parser, question):
+
+    intent = parser.parse(question)
+
+    assert not intent.is_invalid
+    assert intent.key is None
+
+
+@pytest.mark.parametrize("question", ["hi", "asdfgh"])
+def test_invalid(parser, question):
+    assert parser.parse(question).is_invalid
+
+
+def test_paraphrases_share_a_key(parser):
+
+    keys = {
+        parser.parse(q).key
+        for q in ("How many female passengers were there?", "how many women were there", "number of females")
+    }
+
+    assert len(keys) == 1
+
+
+# ----------------------------------------------------------
+# Answers
+# ----------------------------------------------------------
+
+@pytest.mark.parametrize("question, answer", [
+    ("How many passengers survived?", "There were 342 passengers matching the criteria."),
+    ("What was the average age of male passengers?", "The average Age was 30.73."),
+    ("Which class had the highest survival rate?", "Class 1 had the highest survival rate at 62.96%."),
+    ("What is the median fare of first class passengers?", "The median Fare was 60.29."),
+    ("passengers older than 60", "There were 22 passengers matching the criteria."),
+    ("How many passengers embarked from S?", "There were 644 passengers matching the criteria."),
+    (
+        "fare above median by class",
+        "Passenger count by Pclass for Fare > 14.4542:\n1: 210\n3: 142\n2: 92",
+    ),
+    ("average fare by class", "Average Fare by Pclass:\n1: 84.15\n2: 20.66\n3: 13.68"),
+    (
+        "Is fare correlated with survival?",
+        "The correlation between Fare and Survived is 0.257, a weak positive relationship.",
+    ),
+])
+def test_answer(ask, question, answer):
+    assert ask(question) == answer
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.services.query_plans import QueryPlans, evaluate_plan
+
+QUESTION = "what is the average fare of passengers older than 30 who paid in cash"
+
+
+class _Recording:
+
+    # Stands in for the sqlite3 connection and notes which thread queried it
+    def __init__(self, db):
+        self.db = db
+        self.threads = set()
+
+    def __getattr__(self, name):
+        self.threads.add(threading.current_thread().name)
+        return getattr(self.db, name)
+
+
+@pytest.fixture
+def plans(dataset):
+    plans = QueryPlans(":memory:", "test", columns=dataset.frame.columns)
+    yield plans
+    plans.close()
+
+
+def test_learn_and_replay_query_off_the_event_loop(parser, dataset, plans):
+
+    frame = dataset.full_frame()
+
+    async def evaluate(code, slots, columns):
+        return evaluate_plan(code, slots, frame, columns)
+
+    observation = str(frame[frame["Age"] > 30]["Fare"].mean())
+    result = {
+        "code": "df[df['Age'] > 30]['Fare'].mean()",
+        "observation": observation,
+        "answer": f"Based on the data, the answer is {observation}.",
+    }
+
+    plans._db = _Recording(plans._db)
+
+    async def run():
+        learned = await plans.learn(parser.parse(QUESTION), result, evaluate)
+        answer = await plans.replay(parser.parse(QUESTION.replace("30", "50")), evaluate)
+        return learned, answer, threading.current_thread().name
+
+    learned, answer, loop_thread = asyncio.run(run())
+
+    assert learned
+    assert answer == f"Based on the data, the answer is {frame[frame['Age'] > 50]['Fare'].mean()}."
+    assert plans._db.threads and loop_thread not in plans._db.threads
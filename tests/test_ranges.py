@@ -0,0 +1,37 @@
+import pytest
+
+
+# Range conditions and ranked lists (sorted indexes, row-mask path)
+
+@pytest.mark.parametrize("question, operation, columns, ranges, param", [
+    ("top 3 fares", "top_k", ("Fare",), (), 3),
+    ("Who were the 2 oldest passengers?", "top_k", ("Age",), (), 2),
+    ("How many passengers were older than 60?", "count", (), (("Age", ">", 60),), None),
+    # A reference statistic in a condition does not choose the operation
+    ("max age of passengers with fare above the median", "max", ("Age",), (("Fare", ">", "median"),), None),
+    ("average fare of passengers older than the average", "mean", ("Fare",), (("Age", ">", "mean"),), None),
+])
+def test_parsed_range_intent(parser, question, operation, columns, ranges, param):
+
+    intent = parser.parse(question)
+
+    assert (intent.operation, intent.columns, intent.ranges, intent.param) == (operation, columns, ranges, param)
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("How many passengers were older than 60?", "There were 22 passengers matching the criteria."),
+    ("max age of passengers with fare above the median", "The maximum Age for Fare > 14.4542 was 80.0."),
+    ("average fare of passengers older than the average", "The average Fare for Age > 29.6991 was 41.08."),
+    ("Who were the 2 oldest passengers?", "Top 2 by Age:\n1. 80.0 (PassengerId 631)\n2. 74.0 (PassengerId 852)"),
+])
+def test_range_answer(ask, question, answer):
+    assert ask(question) == answer
+
+
+def test_top_k_is_capped(ask):
+
+    lines = ask("top 1000 fares").splitlines()
+
+    assert lines[0] == "Top 50 by Fare:"
+    assert lines[-1] == "(Only the first 50 of the 1000 requested are listed.)"
+    assert len(lines) == 52